@@ -0,0 +1,57 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark person lookups/sec made by many threads, one getPerson
+# request per lookup, and batched by PersonBatcher, against the local
+# stub server in ../tests
+
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubServer  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+from wt_batch import PersonBatcher  # noqa: E402
+
+threads = 32
+lookups = 2000
+latency = 0.02  # seconds of server time per request
+windows = (0.002, 0.01, 0.05)
+
+
+def bench(server, lookup):
+    server.reset()
+    keys = ["Stub-%d" % (i % server.tree.size + 1,) for i in range(lookups)]
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        people = list(pool.map(lookup, keys))
+    elapsed = time.time() - t0
+    assert all(p is not None for p in people)
+    return lookups / elapsed, sum(server.counts.values())
+
+
+def main():
+    with StubServer(delay=latency) as server:
+        apps = WT_Apps(url=server.url, pool_size=threads)
+        print("%d threads, %d lookups, %.1f ms server latency" % (threads, lookups, latency * 1000,))
+        print("%-22s %10s %10s %11s" % ("method", "lookups/s", "requests", "mean_batch"))
+
+        rps, count = bench(server, lambda key: apps.getPerson(key).json()[0]["person"])
+        print("%-22s %10.0f %10d %11.1f" % ("getPerson", rps, count, 1.0))
+
+        for window in windows:
+            with PersonBatcher(apps, window=window, max_batch=100) as batcher:
+                rps, count = bench(server, batcher.getPerson)
+                method = "batched, %g s window" % (window,)
+                print("%-22s %10.0f %10d %11.1f" % (method, rps, count, batcher.stats()["mean_batch"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark parsing biographies in one pass, against one regular
+# expression scan per kind, and the queries of a BioIndex
+
+from __future__ import print_function, unicode_literals
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubTree  # noqa: E402
+from wt_bio import BioIndex, _name, _unique, parse_bio  # noqa: E402
+
+count = 100000
+queries = 10000
+tree = StubTree(count // 1000, 1000)
+
+_category = re.compile(r"\[\[\s*Category\s*:([^\]|]*)")
+_template = re.compile(r"\{\{([^{}|]*)")
+_link = re.compile(r"\[\[([^\]|]*)(?:\|([^\]]*))?\]\]")
+_heading = re.compile(r"^(=+)\s*(.*?)\s*\1\s*$", re.M)
+_sources = re.compile(r"^== *Sources *==$(.*?)(?=^==|\Z)", re.M | re.S)
+_item = re.compile(r"^\*+\s*(.*)$", re.M)
+_ref = re.compile(r"<ref(?:\s[^>]*)?(?<!/)>(.*?)</ref\s*>", re.S)
+_comment = re.compile(r"<!--.*?-->", re.S)
+
+
+def rescan(text):
+    # the same results, with the regular expressions of each kind,
+    # each scanning the text
+    text = _comment.sub("", text)
+    categories = _unique([_name(c) for c in _category.findall(text)])
+    templates = _unique([_name(t) for t in _template.findall(text)])
+    links = [m for m in _link.findall(text) if not m[0].lstrip().startswith("Category")]
+    sources = _ref.findall(text) + [s for section in _sources.findall(text) for s in _item.findall(section)]
+    sections = [h for _, h in _heading.findall(text)]
+    return categories, templates, links, sources, sections
+
+
+def main():
+    bios = [tree.bio(pid) for pid in range(1, count + 1)]
+    size = sum(len(b) for b in bios)
+    print("%d biographies, %.1f MiB" % (count, size / 2.0 ** 20,))
+
+    for label, parse in (("one scan per kind", rescan), ("parse_bio", parse_bio)):
+        t0 = time.time()
+        for b in bios:
+            parse(b)
+        elapsed = time.time() - t0
+        print("%-20s %8.2f s %10.0f bios/s" % (label, elapsed, count / elapsed,))
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "bios.sqlite")
+        t0 = time.time()
+        index = BioIndex(path, batch_size=1000)
+        for pid, b in enumerate(bios, 1):
+            index.add(pid, b)
+        index.close()
+        print("indexed and stored in %.2f s" % (time.time() - t0,))
+
+        t0 = time.time()
+        index = BioIndex(path)
+        print("loaded %d profiles in %.2f s" % (len(index), time.time() - t0,))
+
+        for label, query in (
+                ("category, 1000 Ids", lambda: index.category("Stub Generation 3")),
+                ("category, all Ids", lambda: index.category("Stubshire")),
+                ("search, 200 Ids", lambda: index.search(["Stubshire", "Stub Generation 3"], ["Notables"])),
+        ):
+            t0 = time.time()
+            for _ in range(queries):
+                query()
+            print("%-20s %8.1f us/query" % (label, (time.time() - t0) / queries * 1e6,))
+        index.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
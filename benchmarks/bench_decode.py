@@ -0,0 +1,58 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark the JSON decoders available to wt_result.ResultDecoder,
+# and requests' Response.json(), on large recorded
+# getAncestors and getWatchlist payloads
+
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+from wt_result import ResultDecoder, available_decoders  # noqa: E402
+
+repeat = 5
+
+
+def record():
+    """record() returns the responses of a few large requests.
+    """
+
+    with StubServer(StubTree(12, 2048)) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        return [
+            ("getAncestors depth 10", apps.getAncestors("Stub-1", 10)),
+            ("getWatchlist 5000", apps.getWatchlist(limit=5000, getPerson=1)),
+        ]
+
+
+def main():
+    responses = record()
+    print("%-24s %-20s %10s %10s" % ("payload", "decoder", "MiB", "MB/s"))
+    for label, r in responses:
+        size = len(r.content)
+
+        def time_it(func):
+            t0 = time.time()
+            for _ in range(repeat):
+                func()
+            return size * repeat / (time.time() - t0) / 1e6
+
+        print("%-24s %-20s %10.1f %10.1f" % (label, "Response.json()", size / 2.0 ** 20, time_it(r.json)))
+        for name in available_decoders():
+            decoder = ResultDecoder(name)
+            mbs = time_it(lambda: decoder.result(r))
+            print("%-24s %-20s %10.1f %10.1f" % (label, name, size / 2.0 ** 20, mbs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark the memory used by decoded person dicts,
+# against compact Person records
+
+from __future__ import print_function, unicode_literals
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubTree  # noqa: E402
+from wt_person import Person  # noqa: E402
+
+count = 50000
+tree = StubTree(count // 1000, 1000)
+
+
+def responses():
+    # decode each person from JSON text, as a response would be
+    for pid in range(1, count + 1):
+        yield json.loads(json.dumps(tree.person(pid, logged_in=True)))
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.time()
+    records = build()
+    elapsed = time.time() - t0
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, elapsed, size
+
+
+def main():
+    print("%d people, %d fields each" % (count, len(tree.person(1, logged_in=True)),))
+    print("%-10s %10s %12s %14s" % ("records", "seconds", "MiB", "bytes/person"))
+
+    dicts, elapsed, size = measure(lambda: list(responses()))
+    print("%-10s %10.2f %12.1f %14.0f" % ("dict", elapsed, size / 2.0 ** 20, float(size) / count))
+    del dicts
+
+    persons, elapsed, size = measure(lambda: [Person(d) for d in responses()])
+    print("%-10s %10.2f %12.1f %14.0f" % ("Person", elapsed, size / 2.0 ** 20, float(size) / count))
+
+    t0 = time.time()
+    n = sum(1 for p in persons if p.IsLiving and p.BirthDate)
+    print("common fields of %d records read in %.2f s" % (n, time.time() - t0,))
+    t0 = time.time()
+    n = sum(1 for p in persons if p.Nicknames is not None)
+    print("rare field of %d records read in %.2f s" % (n, time.time() - t0,))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark requests/sec against connection pool size,
+# using one WT_Apps instance shared by a pool of threads,
+# against the local stub server in ../tests
+
+from __future__ import print_function, unicode_literals
+
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubServer  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+
+threads = 32
+requests_per_run = 1000
+latency = 0.002  # seconds of server time per request
+pool_sizes = (1, 2, 4, 8, 16, 32)
+
+# the connections column shows the churn behind "pool is full" warnings
+logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+
+
+def bench(server, pool_size, pool_block):
+    apps = WT_Apps(url=server.url, pool_size=pool_size, pool_block=pool_block)
+    server.reset()
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: apps.getProfile(i % server.tree.size + 1), range(requests_per_run)))
+    elapsed = time.time() - t0
+    return requests_per_run / elapsed, server.connections
+
+
+def main():
+    with StubServer(delay=latency) as server:
+        print("%d threads, %d requests, %.1f ms server latency" % (threads, requests_per_run, latency * 1000,))
+        print("%9s %10s %12s %12s" % ("pool_size", "pool_block", "requests/s", "connections"))
+        for pool_size in pool_sizes:
+            for pool_block in (False, True):
+                rps, connections = bench(server, pool_size, pool_block)
+                print("%9d %10s %12.0f %12d" % (pool_size, pool_block, rps, connections))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark the indexing throughput, the storage size, and the query
+# latency of wt_search.TextIndex, on a synthetic corpus of biographies
+
+from __future__ import print_function, unicode_literals
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubTree  # noqa: E402
+from wt_search import TextIndex  # noqa: E402
+
+count = 20000
+sentences = 20
+queries = 200
+tree = StubTree(count // 1000, 1000)
+rng = random.Random(1)
+
+# a vocabulary whose words are used with a Zipf like distribution
+vocabulary = ["w%d" % (i,) for i in range(20000)]
+weights = [1.0 / (i + 1) for i in range(len(vocabulary))]
+
+
+def corpus():
+    for pid in range(1, count + 1):
+        words = rng.choices(vocabulary, weights, k=sentences * 12)
+        text = "\n".join(" ".join(words[i:i + 12]) + "." for i in range(0, len(words), 12))
+        yield pid, tree.bio(pid) + text
+
+
+def main():
+    bios = list(corpus())
+    size = sum(len(text) for _, text in bios)
+    print("%d biographies, %.1f MiB" % (count, size / 2.0 ** 20,))
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "search.sqlite")
+        t0 = time.time()
+        with TextIndex(path) as index:
+            for pid, text in bios:
+                index.add(pid, text, name="Stub-%d" % (pid,))
+        elapsed = time.time() - t0
+        stats = index.stats()
+        print("indexed in %.2f s, %.0f bios/s, %.2f MB/s" % (elapsed, count / elapsed, size / elapsed / 1e6,))
+        disk = os.path.getsize(path)
+        print("%d terms, %d words, %.1f MiB on disk, %.1f bytes/word" % (
+            stats["terms"], stats["words"], disk / 2.0 ** 20, float(disk) / stats["words"],))
+
+        t0 = time.time()
+        with TextIndex(path) as index:
+            for pid, text in bios[:1000]:
+                index.add(pid, text + " w1 edited")
+        print("1000 changed bios updated in %.2f s" % (time.time() - t0,))
+
+        with TextIndex(path) as index:
+            for label, query in (
+                    ("rare word", "w15000"),
+                    ("common word", "w3"),
+                    ("two words", "w100 w200"),
+                    ("phrase", '"place 7"'),
+                    ("place and word", "stubshire w50"),
+            ):
+                t0 = time.time()
+                for _ in range(queries):
+                    index.search(query, limit=10)
+                print("%-16s %8d hits %10.2f ms/query" % (
+                    label, len(index.search(query)), (time.time() - t0) / queries * 1e3,))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark the scaling of wt_shard.ShardedCrawler from 1 to N
+# processes, on large getAncestors responses from local stub servers,
+# one server process per worker process, so that the servers are not
+# the bottleneck, against decoding in the calling process
+
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubProcess, STUB_USER, STUB_PASS  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+from wt_person import person_dicts  # noqa: E402
+from wt_result import ResultDecoder  # noqa: E402
+from wt_shard import ShardedCrawler  # noqa: E402
+
+keys = ["Stub-%d" % (pid,) for pid in range(1, 65)]
+depth = 9
+
+
+def summary(person):
+    # a typical post-processing of each record
+    return (person["Id"], person["Name"], person.get("BirthDate"), person.get("BirthLocation"),
+            person.get("Father"), person.get("Mother"), person.get("Gender") == "Male")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    counts = sorted(set([1, 2, 4, 8, 16, cpus]))
+    counts = [n for n in counts if n <= max(cpus, 2)]
+    print("%d CPUs, getAncestors depth %d of %d keys" % (cpus, depth, len(keys),))
+    with ExitStack() as stack:
+        servers = [stack.enter_context(StubProcess(generations=12, width=1024)) for _ in range(max(counts))]
+        apps = WT_Apps(url=servers[0].url, decoder=ResultDecoder())
+        apps.login(STUB_USER, STUB_PASS)
+
+        t0 = time.time()
+        records = 0
+        for key in keys:
+            records += len([summary(p) for p in person_dicts(apps.getAncestors(key, depth))])
+        base = time.time() - t0
+        print("%-14s %8d records %8.2f s %10.0f records/s" % ("in process", records, base, records / base,))
+
+        for n in counts:
+            with ShardedCrawler(apps, processes=n, transform=summary, urls=[s.url for s in servers[:n]]) as crawler:
+                list(crawler.records("getPerson", keys[:n]))  # start the processes
+                t0 = time.time()
+                records = sum(1 for _ in crawler.records("getAncestors", keys, depth=depth))
+                elapsed = time.time() - t0
+                stats = crawler.stats()
+            print("%-14s %8d records %8.2f s %10.0f records/s %6.2fx  %.1f MiB sent" % (
+                "%d processes" % (n,), records, elapsed, records / elapsed, base / elapsed, stats["bytes"] / 2.0 ** 20,))
+
+
+if __name__ == "__main__":
+    main()
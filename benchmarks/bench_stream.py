@@ -0,0 +1,62 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark the peak memory (RSS) of decoding a large getWatchlist
+# response at once, against streaming its records with
+# streamWatchlist(), from a stub server running in a child process
+
+from __future__ import print_function, unicode_literals
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubProcess  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+
+generations, width = 10, 2048  # 20480 watched profiles
+
+
+def whole(apps):
+    r = apps.getWatchlist(limit=generations * width, getPerson=1)
+    return sum(1 for e in r.json()[0]["watchlist"] if e["Name"])
+
+
+def stream(apps):
+    return sum(1 for e in apps.streamWatchlist(limit=generations * width, getPerson=1) if e["Name"])
+
+
+def run(url, method, conn):
+    # a fresh process for each method, so its peak RSS is its own
+    apps = WT_Apps(url=url)
+    apps.getHelp()  # import and connect before the baseline
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.time()
+    n = globals()[method](apps)
+    elapsed = time.time() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((n, elapsed, (peak - base) / 1024.0))  # ru_maxrss is in KiB on Linux
+
+
+def main():
+    with StubProcess(generations, width) as server:
+        print("%d profiles in one getWatchlist(getPerson=1) response" % (generations * width,))
+        print("%-24s %8s %10s %14s" % ("method", "entries", "seconds", "peak RSS MiB"))
+        for method in ("whole", "stream"):
+            parent, child = multiprocessing.Pipe()
+            p = multiprocessing.Process(target=run, args=(server.url, method, child))
+            p.start()
+            n, elapsed, rss = parent.recv()
+            p.join()
+            label = "getWatchlist().json()" if method == "whole" else "streamWatchlist()"
+            print("%-24s %8d %10.2f %14.1f" % (label, n, elapsed, rss))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark streaming a large watchlist with iterWatchlist(),
+# against fetching it in one getWatchlist() request,
+# from a stub server running in a child process
+
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import time
+import tracemalloc
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubProcess  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+
+generations, width = 10, 2048  # 20480 watched profiles
+latency = 0.1  # seconds of server time per page
+page_size = 250
+
+
+def measure(func):
+    tracemalloc.start()
+    t0 = time.time()
+    n = func()
+    elapsed = time.time() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n, elapsed, peak
+
+
+def main():
+    with StubProcess(generations, width, delay=latency) as server:
+        apps = WT_Apps(url=server.url, pool_size=8)
+        print("%d profiles, pages of %d, %.0f ms server latency" % (generations * width, page_size, latency * 1000,))
+        print("%-28s %8s %10s %12s" % ("method", "entries", "seconds", "peak MiB"))
+
+        def whole():
+            r = apps.getWatchlist(limit=generations * width)
+            return len(r.json()[0]["watchlist"])
+
+        n, elapsed, peak = measure(whole)
+        print("%-28s %8d %10.2f %12.1f" % ("getWatchlist(limit=all)", n, elapsed, peak / 2.0 ** 20))
+
+        for prefetch in (1, 2, 4, 8):
+            def stream():
+                return sum(1 for e in apps.iterWatchlist(page_size=page_size, prefetch=prefetch))
+
+            n, elapsed, peak = measure(stream)
+            print("%-28s %8d %10.2f %12.1f" % ("iterWatchlist(prefetch=%d)" % (prefetch,), n, elapsed, peak / 2.0 ** 20))
+
+
+if __name__ == "__main__":
+    main()
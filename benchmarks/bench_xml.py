@@ -0,0 +1,72 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# benchmark decoding equivalent json and xmlfm payloads,
+# whole and streamed, for speed and peak memory
+
+from __future__ import print_function, unicode_literals
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "tests"))
+sys.path.insert(0, os.path.join(here, ".."))
+
+from stub_server import StubProcess, STUB_USER, STUB_PASS  # noqa: E402
+from wt_apps import WT_Apps  # noqa: E402
+from wt_stream import RecordStream, XMLRecordStream, xml_loads  # noqa: E402
+
+generations, width = 10, 2048
+chunk_size = 65536
+
+
+def record(fmt):
+    """record() returns the bodies of a few large requests.
+    """
+
+    with StubProcess(generations, width) as server:
+        apps = WT_Apps(url=server.url, default_format=fmt)
+        apps.login(STUB_USER, STUB_PASS)
+        return [
+            ("getAncestors depth 10", apps.getAncestors("Stub-1", 10).content),
+            ("getWatchlist 10000", apps.getWatchlist(limit=10000, getPerson=1).content),
+        ]
+
+
+def chunks(body):
+    for i in range(0, len(body), chunk_size):
+        yield body[i:i + chunk_size]
+
+
+def measure(func):
+    tracemalloc.start()
+    t0 = time.time()
+    func()
+    elapsed = time.time() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    bodies = {"json": record("json"), "xmlfm": record("xmlfm")}
+    decoders = [
+        ("json", "whole", lambda body: json.loads(body)),
+        ("json", "stream", lambda body: sum(1 for p in RecordStream(chunks(body)))),
+        ("xmlfm", "whole", lambda body: xml_loads(body)),
+        ("xmlfm", "stream", lambda body: sum(1 for p in XMLRecordStream(chunks(body)))),
+    ]
+    print("%-24s %-8s %-8s %10s %10s %12s" % ("payload", "format", "mode", "MiB", "seconds", "peak MiB"))
+    for i, (label, body) in enumerate(bodies["json"]):
+        for fmt, mode, decode in decoders:
+            body = bodies[fmt][i][1]
+            elapsed, peak = measure(lambda: decode(body))
+            print("%-24s %-8s %-8s %10.1f %10.2f %12.1f" % (label, fmt, mode, len(body) / 2.0 ** 20, elapsed, peak / 2.0 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ from setuptools import setup  # , find_packages
 # To use a consistent encoding
 from codecs import open
 from os import path
+import sys
 
 here = path.abspath(path.dirname(__file__))
 
@@ -19,6 +20,10 @@ here = path.abspath(path.dirname(__file__))
 with open(path.join(here, 'README.md'), encoding='utf-8') as f:
     long_description = f.read()
 
+# wt_async uses asyncio and contextvars, which need Python 3.7+,
+# so it is only installed there, and wheels are built per version
+async_modules = ["wt_async"] if sys.version_info >= (3, 7) else []
+
 setup(
     name='pywikitree',
 
@@ -67,6 +72,7 @@ setup(
         'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
     ],
 
     # What does your project relate to?
@@ -78,13 +84,13 @@ setup(
 
     # Alternatively, if you want to distribute just a my_module.py, uncomment
     # this:
-    py_modules=["wt_apps"],
+    py_modules=["wt_apps", "wt_cache", "wt_singleflight", "wt_batch", "wt_scheduler", "wt_ratelimit", "wt_sync", "wt_crawl", "wt_graph", "wt_relationship", "wt_person", "wt_result", "wt_stream", "wt_pedigree", "wt_bio", "wt_search", "wt_jobs", "wt_shard"] + async_modules,
 
     # List run-time dependencies here.  These will be installed by pip when
     # your project is installed. For an analysis of "install_requires" vs pip's
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=['requests', 'simplejson'],
+    install_requires=['requests', 'futures; python_version < "3"'],
 
     # List additional groups of dependencies here (e.g. development
     # dependencies). You can install these using the following syntax,
@@ -93,6 +99,7 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage', 'flake8', 'pytest', 'readme-renderer'],
+        'fast': ['orjson; python_version >= "3.6"'],
     },
 
     # If there are data files included in your packages that need to be
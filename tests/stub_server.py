@@ -0,0 +1,563 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+stub_server.py provides a local stand-in for the WikiTree Apps API.
+
+It serves a synthetic, deterministic family tree over HTTP so that
+the client code can be tested and benchmarked without network access.
+
+The tree is made of `generations` generations of `width` people each.
+Person (g, j) has Id g*width + j + 1. Generation 0 is the youngest.
+The father of (g, j) is (g+1, 2j mod width) and the mother is
+(g+1, 2j+1 mod width), so pedigree collapse appears naturally after
+log2(width) generations. Every seventh person is private, and shows
+only a few fields to an anonymous session.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import multiprocessing
+import re
+import threading
+import time
+from collections import Counter
+from xml.sax.saxutils import escape, quoteattr
+
+try:  # for Python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+
+STUB_USER = "stub@example.com"
+STUB_PASS = "secret"
+
+_privacy_levels = {
+    'OPEN': 60,
+    'PRIVATE': 20,
+    'PUBLIC': 50,
+    'SEMIPRIVATE_BIO': 30,
+    'SEMIPRIVATE_BIOTREE': 40,
+    'SEMIPRIVATE_TREE': 35,
+    'UNLISTED': 10,
+}
+
+_private_fields = ("Id", "Name", "Privacy", "Touched", "IsPerson")
+
+
+_xml_name = re.compile(r"^[A-Za-z_][A-Za-z0-9_.-]*$")
+
+
+def _xml(value, tag, out, key=None, typed=True):
+    """_xml() appends the xmlfm encoding of value to the list out,
+    as described in wt_stream, without the type attributes unless
+    typed is True.
+    """
+
+    def start(t):
+        out.append('<%s%s%s>' % (tag, "" if key is None else " key=" + quoteattr(key),
+                                 ' type="%s"' % (t,) if typed and t else "",))
+
+    if isinstance(value, dict):
+        start("dict")
+        for k, v in value.items():
+            k = "%s" % (k,)
+            if _xml_name.match(k) and not k.lower().startswith("xml") and k != "item":
+                _xml(v, k, out, typed=typed)
+            else:
+                _xml(v, "item", out, k, typed)
+    elif isinstance(value, list):
+        start("list")
+        for v in value:
+            _xml(v, "item", out, typed=typed)
+    elif value is None:
+        start("null")
+    elif isinstance(value, bool):
+        start("bool")
+        out.append("true" if value else "false")
+    elif isinstance(value, int):
+        start("int")
+        out.append("%d" % (value,))
+    elif isinstance(value, float):
+        start("float")
+        out.append("%r" % (value,))
+    else:
+        start(None)
+        out.append(escape(value))
+    out.append("</%s>" % (tag,))
+
+
+def to_xml(value, typed=True):
+    """to_xml() returns the xmlfm encoding of a JSON-able result,
+    without the type attributes unless typed is True.
+    """
+
+    out = ['<?xml version="1.0" encoding="utf-8"?>\n']
+    _xml(value, "api", out, typed=typed)
+    return "".join(out).encode("utf-8")
+
+
+class StubTree(object):
+    """StubTree generates the people served by the stub server.
+    """
+
+    def __init__(self, generations=12, width=64):
+        self.generations = generations
+        self.width = width
+        self.size = generations * width
+        self._touched = {}
+        self._clock = 20170211033528
+        self._lock = threading.Lock()
+        self._parents = {}
+        self._children = {}
+
+    def _gj(self, pid):
+        return (pid - 1) // self.width, (pid - 1) % self.width
+
+    def _id(self, g, j):
+        return g * self.width + j + 1
+
+    def resolve(self, key):
+        """resolve() converts a "Stub-#" name or numeric id to an Id,
+        or None when the key is unknown.
+        """
+
+        key = "%s" % (key,)
+        if key.startswith("Stub-"):
+            key = key[5:]
+        try:
+            pid = int(key)
+        except ValueError:
+            return None
+        if 1 <= pid <= self.size:
+            return pid
+        return None
+
+    def touch(self, pid):
+        """touch() marks a person as edited now.
+        """
+
+        with self._lock:
+            self._clock += 1
+            self._touched[pid] = self._clock
+
+    def touched(self, pid):
+        return "%d" % (self._touched.get(pid, 20170211033528 - pid),)
+
+    def is_private(self, pid):
+        return pid % 7 == 0
+
+    def relink(self, pid, father, mother):
+        """relink() makes father and mother the parents of pid, such
+        as to collapse a pedigree across generations.
+        """
+
+        for parent in self.parents(pid):
+            self._children.get(parent, set()).discard(pid)
+        self._parents[pid] = (father, mother)
+        for parent in (father, mother):
+            if parent:
+                self._children.setdefault(parent, set()).add(pid)
+
+    def father(self, pid):
+        if pid in self._parents:
+            return self._parents[pid][0]
+        g, j = self._gj(pid)
+        if g + 1 >= self.generations:
+            return 0
+        return self._id(g + 1, (2 * j) % self.width)
+
+    def mother(self, pid):
+        if pid in self._parents:
+            return self._parents[pid][1]
+        g, j = self._gj(pid)
+        if g + 1 >= self.generations:
+            return 0
+        return self._id(g + 1, (2 * j + 1) % self.width)
+
+    def children(self, pid):
+        g, j = self._gj(pid)
+        children = set(self._children.get(pid, ()))
+        if g > 0:
+            half = self.width // 2
+            k = j // 2
+            for c in (self._id(g - 1, k), self._id(g - 1, (k + half) % self.width)):
+                if c not in self._parents or pid in self._parents[c]:
+                    children.add(c)
+        return sorted(children)
+
+    def spouses(self, pid):
+        g, j = self._gj(pid)
+        return [self._id(g, j ^ 1)]
+
+    def siblings(self, pid):
+        g, j = self._gj(pid)
+        if g + 1 >= self.generations:
+            return []
+        half = self.width // 2
+        return [self._id(g, (j + half) % self.width)]
+
+    def parents(self, pid):
+        return [p for p in (self.father(pid), self.mother(pid)) if p]
+
+    def person(self, pid, logged_in=False):
+        """person() returns the full field set of a person.
+        """
+
+        g, j = self._gj(pid)
+        first = ("Adam", "Beth")[j % 2] + "%d" % (j,)
+        last = "Stub%d" % (g,)
+        birth = 2000 - 25 * g
+        privacy = 20 if self.is_private(pid) else 60
+        p = {
+            'BirthDate': "%04d-01-%02d" % (birth, j % 28 + 1),
+            'BirthDateDecade': "%03d0s" % (birth // 10,),
+            'BirthLocation': "Place %d, Stubshire" % (j,),
+            'BirthNamePrivate': "%s %s" % (first, last),
+            'DeathDate': "%04d-12-31" % (birth + 70,) if g > 2 else "0000-00-00",
+            'DeathDateDecade': "%03d0s" % ((birth + 70) // 10,) if g > 2 else "unknown",
+            'DeathLocation': "Place %d, Stubshire" % (j + 1,) if g > 2 else "",
+            'Father': self.father(pid),
+            'FirstName': first,
+            'Gender': ("Male", "Female")[j % 2],
+            'Id': pid,
+            'IsLiving': 0 if g > 2 else 1,
+            'IsPerson': 1,
+            'LastNameAtBirth': last,
+            'LastNameCurrent': last,
+            'LastNameOther': '',
+            'LongNamePrivate': "%s %s" % (first, last),
+            'Manager': 1,
+            'MiddleName': '',
+            'Mother': self.mother(pid),
+            'Name': "Stub-%d" % (pid,),
+            'Nicknames': '',
+            'Photo': None,
+            'PhotoData': None,
+            'Prefix': '',
+            'Privacy': privacy,
+            'Privacy_IsAtLeastPublic': privacy >= 50,
+            'Privacy_IsOpen': privacy == 60,
+            'Privacy_IsPrivate': privacy == 20,
+            'Privacy_IsPublic': privacy == 50,
+            'Privacy_IsSemiPrivate': 30 <= privacy <= 40,
+            'Privacy_IsSemiPrivateBio': privacy == 30,
+            'RealName': first,
+            'ShortName': "%s %s" % (first, last),
+            'Suffix': '',
+            'Touched': self.touched(pid),
+        }
+        if privacy < 50 and not logged_in:
+            p = {k: p[k] for k in _private_fields}
+        return p
+
+    def bio(self, pid):
+        g, j = self._gj(pid)
+        father = self.father(pid)
+        lines = [
+            "[[Category: Stub Generation %d]] [[Category: Stubshire]]" % (g,),
+            "{{Notables}}" if j % 5 == 0 else "{{Stub}}",
+            "== Biography ==",
+            "Stub-%d was born in Place %d, Stubshire." % (pid, j,),
+        ]
+        if father:
+            lines.append("Son or daughter of [[Stub-%d|Father %d]]." % (father, father,))
+        lines += [
+            "",
+            "== Sources ==",
+            "<references />",
+            "* Parish register of Place %d, page %d." % (j, pid,),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.stub._connect()
+
+    def do_POST(self):
+        server = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8")
+        form = parse_qs(body, keep_blank_values=True)
+        action = (form.get("action") or [""])[0]
+        server._enter(action)
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            if server.slow:
+                keys = form.get("key", []) + [k for v in form.get("keys", []) for k in v.split(",")]
+                time.sleep(max([server.slow.get(server.tree.resolve(k), 0) for k in keys] or [0]))
+            status = server._next_failure()
+            if status:
+                payload = json.dumps({"error": "stub failure"}).encode("utf-8")
+                self._send(status, payload, {"Retry-After": "0"})
+                return
+            cookie = self.headers.get("Cookie") or ""
+            logged_in = "stub_session=user" in cookie
+            headers = {}
+            result = server.dispatch(action, form, logged_in, headers)
+            if (form.get("format") or [""])[0] == "xmlfm":
+                payload = to_xml(result)
+                headers["Content-Type"] = "text/xml; charset=utf-8"
+            else:
+                payload = json.dumps(result).encode("utf-8")
+            self._send(200, payload, headers)
+        finally:
+            server._leave()
+
+    def _send(self, status, payload, headers):
+        self.send_response(status)
+        if "Content-Type" not in headers:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", "%d" % (len(payload),))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if self.close_connection:
+            # as a real server does, so the client does not reuse it
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+
+class StubServer(object):
+    """StubServer runs the stub WikiTree API on a local port
+    in a background thread.
+    Use as a context manager, or call start() and stop().
+    The delay attribute adds latency to every request, slow maps
+    Ids to the extra latency of the requests for them, and
+    failures is a list of HTTP status codes returned, in order,
+    by the next requests. The connections attribute counts the
+    connections accepted.
+    """
+
+    def __init__(self, tree=None, delay=0.0):
+        self.tree = tree or StubTree()
+        self.delay = delay
+        self.slow = {}
+        self.failures = []
+        self.privacy_levels = dict(_privacy_levels)
+        self.counts = Counter()
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://%s:%d/api.php" % (host, port,)
+
+    @property
+    def requests(self):
+        return sum(self.counts.values())
+
+    def start(self):
+        self._httpd = _Server(("127.0.0.1", 0), _Handler)
+        self._httpd.stub = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.connections = 0
+            self.max_in_flight = self.in_flight
+
+    def _connect(self):
+        with self._lock:
+            self.connections += 1
+
+    def _enter(self, action):
+        with self._lock:
+            self.counts[action] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _next_failure(self):
+        with self._lock:
+            if self.failures:
+                return self.failures.pop(0)
+        return None
+
+    def dispatch(self, action, form, logged_in=False, headers=None):
+        """dispatch() computes the JSON-able result for an API action.
+        """
+
+        def arg(name, default=""):
+            return (form.get(name) or [default])[0]
+
+        tree = self.tree
+        if action == "help":
+            return {"help": "WikiTree API stub"}
+
+        if action == "login":
+            if arg("email") == STUB_USER and arg("password") == STUB_PASS:
+                if headers is not None:
+                    headers["Set-Cookie"] = "stub_session=user; Path=/"
+                return {"login": {"result": "Success", "token": "stub-token", "userid": 1, "username": "Stub-1"}}
+            return {"login": {"result": "Illegal", "wait": 1}}
+
+        if action == "getPrivacyLevels":
+            return [dict(self.privacy_levels)]
+
+        if action == "getWatchlist":
+            return [self._watchlist(form, logged_in)]
+
+        if action == "getRelatives":
+            keys = []
+            for v in form.get("keys", []):
+                keys.extend(k for k in v.split(",") if k)
+            items = []
+            for key in keys:
+                pid = tree.resolve(key)
+                if pid is None:
+                    continue
+                person = tree.person(pid, logged_in)
+                for flag, name, func in (
+                        ("getParents", "Parents", tree.parents),
+                        ("getSpouses", "Spouses", tree.spouses),
+                        ("getSiblings", "Siblings", tree.siblings),
+                        ("getChildren", "Children", tree.children)):
+                    if arg(flag, "0") not in ("", "0"):
+                        person[name] = {"%d" % (r,): tree.person(r, logged_in) for r in func(pid)}
+                items.append({"key": key, "person": person, "user_id": pid, "user_name": "Stub-%d" % (pid,)})
+            return [{"items": items, "status": 0}]
+
+        key = arg("key")
+        pid = tree.resolve(key)
+        if pid is None:
+            return [{"status": "Invalid page id", "user_name": key}]
+
+        if action == "getPerson":
+            person = tree.person(pid, logged_in)
+            fields = arg("fields")
+            if fields == "*":
+                for name, func in (
+                        ("Parents", tree.parents), ("Spouses", tree.spouses),
+                        ("Siblings", tree.siblings), ("Children", tree.children)):
+                    person[name] = {"%d" % (r,): tree.person(r, logged_in) for r in func(pid)}
+            elif fields:
+                wanted = set(f.strip() for f in fields.split(","))
+                person = {k: v for k, v in person.items() if k in wanted}
+            return [{"person": person, "status": 0, "user_name": key}]
+
+        if action == "getProfile":
+            return [{"profile": tree.person(pid, logged_in), "status": 0, "page_name": "Stub-%d" % (pid,)}]
+
+        if action == "getBio":
+            if tree.is_private(pid) and not logged_in:
+                return [{"status": "Permission denied", "page_name": "Stub-%d" % (pid,)}]
+            return [{"bio": tree.bio(pid), "page_name": "Stub-%d" % (pid,), "status": 0, "user_id": pid}]
+
+        if action == "getAncestors":
+            depth = int(arg("depth", "5") or 5)
+            ancestors = []
+            seen = set()
+            level = [pid]
+            for _ in range(depth + 1):
+                nxt = []
+                for a in level:
+                    if a in seen:
+                        continue
+                    seen.add(a)
+                    ancestors.append(tree.person(a, logged_in))
+                    nxt.extend(tree.parents(a))
+                level = nxt
+            return [{"ancestors": ancestors, "status": 0, "user_name": key}]
+
+        if action == "getPersonFSConnections":
+            if not logged_in:
+                return [{"status": "Permission denied", "user_name": key}]
+            return [{"connections": [], "status": 0, "user_name": key}]
+
+        return [{"status": "Illegal action", "action": action}]
+
+    def _watchlist(self, form, logged_in):
+        def arg(name, default=""):
+            return (form.get(name) or [default])[0]
+
+        tree = self.tree
+        ids = list(range(1, tree.size + 1))
+        order = arg("order", "user_id")
+        if order == "page_touched":
+            # most recently touched first
+            ids.sort(key=lambda pid: (int(tree.touched(pid)), pid), reverse=True)
+        elif order == "user_name":
+            ids.sort(key=lambda pid: "Stub-%d" % (pid,))
+        limit = int(arg("limit", "100") or 100)
+        offset = int(arg("offset", "0") or 0)
+        people = [tree.person(pid, logged_in) for pid in ids[offset:offset + limit]]
+        return {"watchlist": people, "watchlistCount": len(ids)}
+
+
+def _serve(conn, generations, width, delay):
+    server = StubServer(StubTree(generations, width), delay=delay).start()
+    conn.send(server.url)
+    conn.recv()  # wait for the parent to stop us
+    server.stop()
+
+
+class StubProcess(object):
+    """StubProcess runs a StubServer in a child process, so that
+    benchmarks measure the client alone.
+    Use as a context manager; the url attribute is the API URL.
+    """
+
+    def __init__(self, generations=12, width=64, delay=0.0):
+        self._args = (generations, width, delay)
+        self._conn = None
+        self._process = None
+        self.url = None
+
+    def __enter__(self):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(child,) + self._args)
+        self._process.daemon = True
+        self._process.start()
+        self.url = self._conn.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.send(None)
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
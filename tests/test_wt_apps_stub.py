@@ -0,0 +1,165 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree apps interface against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from stub_server import StubServer, STUB_USER, STUB_PASS, to_xml
+from wt_apps import WT_Apps
+from wt_cache import ResponseCache
+from wt_ratelimit import HIGH, LOW, RateLimiter
+
+
+def test_getRelatives_chunks():
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, chunk_size=10, max_workers=3)
+        apps._chunk_backoff = 0.01
+        keys = ["Stub-%d" % (i,) for i in range(95, 0, -1)]
+        server.reset()
+        server.failures = [503, 503]  # two chunks fail once
+        r = apps.getRelatives(keys, getParents=True)
+        items = r.json()[0]["items"]
+        assert [item["key"] for item in items] == keys
+        assert all("Parents" in item["person"] for item in items)
+        assert server.counts["getRelatives"] == 10 + 2
+
+        # small requests are not chunked
+        server.reset()
+        r = apps.getRelatives(keys[:10])
+        assert len(r.json()[0]["items"]) == 10
+        assert server.counts["getRelatives"] == 1
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="the context is copied with contextvars")
+def test_getRelatives_chunks_keep_context():
+    with StubServer() as server:
+        cache = ResponseCache()
+        limiter = RateLimiter(rate=1000)
+        apps = WT_Apps(url=server.url, chunk_size=10, max_workers=3, cache=cache, rate_limiter=limiter)
+        keys = ["Stub-%d" % (i,) for i in range(1, 51)]
+        apps.getRelatives(keys, getParents=True)
+        server.reset()
+
+        # the chunks are requested in the caller's bypass and priority
+        with cache.bypass(), limiter.priority(LOW):
+            apps.getRelatives(keys, getParents=True)
+        assert server.counts["getRelatives"] == 5
+        assert cache.stats()["bypasses"] == 5
+        assert limiter.stats()["classes"]["low"]["granted"] == 5
+
+
+def test_shared_instance_reuses_pooled_connections():
+    with StubServer(delay=0.005) as server:
+        apps = WT_Apps(url=server.url, pool_size=8)
+        server.reset()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            rs = list(pool.map(apps.getProfile, range(1, 161)))
+        assert [r.json()[0]["profile"]["Id"] for r in rs] == list(range(1, 161))
+        assert server.connections <= 8
+
+        # more threads than connections: wait for a pooled connection
+        apps = WT_Apps(url=server.url, pool_size=2, pool_block=True)
+        server.reset()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(apps.getProfile, range(1, 41)))
+        assert server.connections <= 2
+
+        # without keep-alive, every request opens a connection
+        apps = WT_Apps(url=server.url, keep_alive=False)
+        server.reset()
+        for i in range(1, 6):
+            apps.getProfile(i)
+        assert server.connections == 5
+
+
+def test_construction_is_network_free(tmp_path):
+    path = str(tmp_path / "privacy.json")
+    with StubServer() as server:
+        WT_Apps.setPrivacyCache(None)
+        apps = WT_Apps(url=server.url, privacy_cache=path)
+        other = WT_Apps(url=server.url)
+        assert WT_Apps.Privacy2Level("OPEN") == 60
+        assert WT_Apps.Level2Privacy(20) == "PRIVATE"
+        assert server.requests == 0
+        # the privacy cache of an instance is its own
+        assert WT_Apps._privacy_cache is None and other._privacy_cache is None
+
+        server.privacy_levels = {"OPEN": 61, "PRIVATE": 21}
+        apps.refreshPrivacyLevels()
+        assert server.counts["getPrivacyLevels"] == 1
+        assert WT_Apps.Privacy2Level("OPEN") == 61
+
+        # a new process would read the privacy cache file
+        WT_Apps.setPrivacyCache(path)
+        assert WT_Apps.Level2Privacy(21) == "PRIVATE"
+
+        # without a privacy cache file, the bundled defaults are used
+        WT_Apps.setPrivacyCache(None)
+        assert WT_Apps.Privacy2Level("OPEN") == 60
+        assert server.requests == 1
+
+
+def test_login_needs_a_success_response():
+    def response(content):
+        r = requests.models.Response()
+        r.status_code = 200
+        r._content = content
+        return r
+
+    apps = WT_Apps()
+    for content in (b"<html><body>Bad Gateway</body></html>", b"Bad Gateway", b'{"error": "busy"}',
+                    b'{"login": {"result": "Illegal"}}', to_xml({"login": {"result": "Illegal"}})):
+        apps._logged_in(STUB_USER, response(content))
+        assert apps.identity is None
+    apps._logged_in(STUB_USER, response(to_xml({"login": {"result": "Success"}})))
+    assert apps.identity == STUB_USER
+
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, default_format="xmlfm")
+        apps.login(STUB_USER, STUB_PASS + "x")
+        assert apps.identity is None
+        apps.login(STUB_USER, STUB_PASS)
+        assert apps.identity == STUB_USER
+
+
+def test_iterWatchlist():
+    with StubServer(delay=0.01) as server:
+        apps = WT_Apps(url=server.url)
+        server.reset()
+        entries = list(apps.iterWatchlist(page_size=50, prefetch=3, order="user_name", getPerson=True))
+        assert len(entries) == server.tree.size
+        assert len(set(e["Id"] for e in entries)) == server.tree.size
+        assert entries == sorted(entries, key=lambda e: e["Name"])
+        # 16 pages, and no page past the end once the size is known
+        assert server.counts["getWatchlist"] == 16
+
+        server.reset()
+        it = apps.iterWatchlist(page_size=10, offset=700)
+        assert [next(it)["Id"] for i in range(5)] == list(range(701, 706))
+        it.close()
+        assert server.counts["getWatchlist"] <= 2
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="the context is copied with contextvars")
+def test_iterWatchlist_keeps_context():
+    with StubServer() as server:
+        cache = ResponseCache()
+        limiter = RateLimiter(rate=1000)
+        apps = WT_Apps(url=server.url, cache=cache, rate_limiter=limiter)
+        list(apps.iterWatchlist(page_size=256))
+        pages = server.counts["getWatchlist"]
+        server.reset()
+
+        # the pages are prefetched in the caller's bypass and priority
+        with cache.bypass(), limiter.priority(HIGH):
+            assert len(list(apps.iterWatchlist(page_size=256))) == server.tree.size
+        assert server.counts["getWatchlist"] == pages
+        assert cache.stats()["bypasses"] == pages
+        assert limiter.stats()["classes"]["high"]["granted"] == pages
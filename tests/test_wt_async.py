@@ -0,0 +1,120 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the asyncio WikiTree apps interface against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import asyncio
+import time
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_async import AsyncWT_Apps
+from wt_result import Result, ResultDecoder
+
+
+def test_async_methods():
+    with StubServer() as server:
+        async def main():
+            async with AsyncWT_Apps(url=server.url) as apps:
+                r = await apps.getPerson("Stub-3", "*")
+                assert r.json()[0]["person"]["Id"] == 3
+                assert "Parents" in r.json()[0]["person"]
+                r = await apps.getBio("Stub-3")
+                assert "[[Category: Stub Generation 0]]" in r.json()[0]["bio"]
+                r = await apps.getAncestors("Stub-3", 2)
+                assert len(r.json()[0]["ancestors"]) == 7
+                r = await apps.getRelatives(["Stub-3", "Stub-4"], getParents=True)
+                assert len(r.json()[0]["items"]) == 2
+                r = await apps.getWatchlist(limit=5, getPerson=True)
+                assert len(r.json()[0]["watchlist"]) == 5
+                r = await apps.getPrivacyLevels()
+                assert r.json()[0]["OPEN"] == 60
+                r = await apps.login(STUB_USER, STUB_PASS)
+                assert r.json()["login"]["result"] == "Success"
+                await apps.logout()
+
+        asyncio.run(main())
+
+
+def test_async_bounded_concurrency():
+    with StubServer(delay=0.05) as server:
+        async def main():
+            async with AsyncWT_Apps(url=server.url, max_concurrency=5) as apps:
+                server.reset()
+                t0 = time.time()
+                rs = await asyncio.gather(*[apps.getPerson("Stub-%d" % (i,)) for i in range(1, 21)])
+                elapsed = time.time() - t0
+                assert [r.json()[0]["person"]["Id"] for r in rs] == list(range(1, 21))
+                assert apps.max_in_flight == 5
+                assert server.max_in_flight <= 5
+                # 20 requests of 50ms, 5 at a time, is about 4 round trips
+                assert elapsed < 20 * 0.05
+
+        asyncio.run(main())
+
+
+def test_async_streams():
+    with StubServer(StubTree(8, 64), delay=0.05) as server:
+        async def main():
+            async with AsyncWT_Apps(url=server.url) as apps:
+                await apps.login(STUB_USER, STUB_PASS)
+                expected = (await apps.getAncestors("Stub-1", 6)).json()[0]["ancestors"]
+                assert [a async for a in apps.streamAncestors("Stub-1", 6)] == expected
+
+                stream = apps.streamWatchlist(limit=300, getPerson=1)
+                # the event loop runs while the stream waits for the server
+                ticks = 0
+
+                async def tick():
+                    nonlocal ticks
+                    while True:
+                        await asyncio.sleep(0.005)
+                        ticks += 1
+
+                ticker = asyncio.ensure_future(tick())
+                entries = [e["Id"] async for e in stream]
+                ticker.cancel()
+                assert entries == list(range(1, 301))
+                assert stream.meta[0]["watchlistCount"] == 512
+                assert ticks >= 5
+
+                keys = ["Stub-%d" % (i,) for i in range(1, 151)]
+                async with apps.streamRelatives(keys, getParents=True) as stream:
+                    first = await stream.__anext__()
+                assert first["key"] == "Stub-1"
+
+        asyncio.run(main())
+
+
+def test_async_getRelatives_chunks():
+    with StubServer() as server:
+        async def main():
+            async with AsyncWT_Apps(url=server.url, chunk_size=7) as apps:
+                keys = ["Stub-%d" % (i,) for i in range(1, 51)]
+                server.reset()
+                r = await apps.getRelatives(keys, getChildren=True)
+                assert [item["key"] for item in r.json()[0]["items"]] == keys
+                assert server.counts["getRelatives"] == 8
+
+        asyncio.run(main())
+
+
+def test_async_iterWatchlist():
+    with StubServer() as server:
+        async def main():
+            async with AsyncWT_Apps(url=server.url) as apps:
+                ids = [e["Id"] async for e in apps.iterWatchlist(page_size=100, prefetch=4)]
+                assert ids == list(range(1, server.tree.size + 1))
+
+        asyncio.run(main())
+
+
+def test_async_results():
+    with StubServer() as server:
+        async def main():
+            async with AsyncWT_Apps(url=server.url, decoder=ResultDecoder()) as apps:
+                return await apps.getPerson("Stub-5")
+
+        r = asyncio.run(main())
+        assert isinstance(r, Result) and r.json()[0]["person"]["Id"] == 5
@@ -0,0 +1,70 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test batching of person lookups against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from stub_server import StubServer
+from wt_apps import WT_Apps
+from wt_batch import PersonBatcher
+
+
+def test_lookups_are_batched():
+    with StubServer(delay=0.01) as server:
+        apps = WT_Apps(url=server.url)
+        server.reset()
+        with PersonBatcher(apps, window=0.05, max_batch=20) as batcher:
+            keys = ["Stub-%d" % (i,) for i in range(1, 61)] + ["Stub-1", "5", "Nobody-1"]
+            with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+                people = list(pool.map(batcher.getPerson, keys))
+
+            assert [p["Id"] for p in people[:60]] == list(range(1, 61))
+            assert people[60]["Id"] == 1
+            assert people[61]["Id"] == 5
+            assert people[62] is None
+
+            stats = batcher.stats()
+            assert stats["lookups"] == 63
+            assert stats["batches"] == server.counts["getRelatives"]
+            assert stats["batches"] < 10
+            assert stats["requests_saved"] == 63 - stats["batches"]
+
+
+def test_get_people_and_errors():
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url)
+        with PersonBatcher(apps, max_batch=5) as batcher:
+            people = batcher.getPeople(["Stub-2", "Stub-3"])
+            assert people["Stub-2"]["Name"] == "Stub-2"
+            server.failures = [500]
+            f = batcher.submit("Stub-4")
+            assert f.exception() is not None
+
+
+def test_close_while_submitting():
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url)
+        for _ in range(5):
+            batcher = PersonBatcher(apps, window=0.001)
+
+            def submit(i):
+                if i == 50:
+                    batcher.close()
+                try:
+                    return batcher.submit("Stub-%d" % (i % 30 + 1,))
+                except RuntimeError:
+                    return None
+
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                futures = [f for f in pool.map(submit, range(100)) if f is not None]
+            # every lookup accepted is answered
+            assert all(f.result(5)["Id"] for f in futures)
+
+        with PersonBatcher(apps) as batcher:
+            with pytest.raises(ValueError):
+                batcher.getPerson("Stub-1", "Id,Name")
@@ -0,0 +1,66 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree biography parser and index against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_bio import BioIndex, parse_bio
+
+BIO = """[[Category: Prime Ministers of the United Kingdom]] [[Category:Blenheim_Palace|Churchill]]
+{{Notables}} {{ died young }}
+<!-- [[Category: Not This One]] -->
+== Biography ==
+Winston was the son of [[Spencer-1|Randolph]] and [[Jerome-2]].<ref>Oxford DNB, [[Space:Churchill]]</ref>
+He is cited again.<ref name="dnb" />{{Wikidata|Q8016}}
+== Sources ==
+<references />
+* ''The Times'', 1965.
+* [https://example.org Obituary]
+"""
+
+
+def test_parse_bio():
+    bio = parse_bio(BIO)
+    assert bio.categories == ["Prime Ministers of the United Kingdom", "Blenheim Palace"]
+    assert bio.templates == ["Notables", "Died young", "Wikidata"]
+    assert bio.links == [("Spencer-1", "Randolph"), ("Jerome-2", None), ("Space:Churchill", None)]
+    assert bio.sources == ["Oxford DNB, [[Space:Churchill]]", "''The Times'', 1965.", "[https://example.org Obituary]"]
+    assert bio.sections == ["Biography", "Sources"]
+    assert parse_bio("") == parse_bio(None) == ([], [], [], [], [])
+
+
+def test_bio_index(tmpdir):
+    tree = StubTree(4, 16)
+    path = str(tmpdir.join("bios.sqlite"))
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        with BioIndex(path, batch_size=10) as index:
+            for pid in range(1, 41):
+                assert index.add_response(apps.getBio("Stub-%d" % (pid,))) == 1
+            bio = parse_bio(tree.bio(5))
+            assert bio.sources == ["Parish register of Place 4, page 5."]
+            assert bio.links == [("Stub-%d" % (tree.father(5),), "Father %d" % (tree.father(5),))]
+
+            assert index.category("Stub Generation 1") == frozenset(range(17, 33))
+            assert index.category("stub_Generation  1") == index.category("Stub Generation 1")
+            assert index.template("Notables") == frozenset(p for p in range(1, 41) if (p - 1) % 16 % 5 == 0)
+            assert index.search(categories=["Stubshire", "Stub Generation 2"], templates=["Notables"]) == frozenset([33, 38])
+            assert index.terms("template") == {"Notables": 10, "Stub": 30}
+            assert index.name(33) == "Stub-33" and len(index) == 40
+            assert index.stats()["flushes"] == 4
+
+            # an edited bio replaces the postings of the profile
+            index.add(33, "[[Category: Edited]]", name="Stub-33")
+            index.remove(38)
+            assert index.search(categories=["Stub Generation 2"], templates=["Notables"]) == frozenset()
+            assert index.category("Edited") == frozenset([33])
+
+    with BioIndex(path) as index:
+        assert len(index) == 39 and 38 not in index
+        assert index.category("Edited") == frozenset([33])
+        assert index.category("Stub Generation 2") == frozenset(range(34, 41)) - frozenset([38])
+        assert index.terms("template") == {"Notables": 8, "Stub": 30}
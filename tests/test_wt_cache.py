@@ -0,0 +1,179 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree apps response caches against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from stub_server import StubServer, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_cache import ResponseCache, SQLiteCache, request_key
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hits_and_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, ttls={"getBio": 10}, clock=clock)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        r1 = apps.getPerson("Stub-5", "Name,Id")
+        r2 = apps.getPerson("Stub-5", "Id, Name")  # same fields, other order
+        assert r1 is r2
+        apps.getBio("Stub-5")
+        apps.getBio("Stub-5")
+        assert server.counts["getPerson"] == 1
+        assert server.counts["getBio"] == 1
+        assert cache.hits == 2
+
+        clock.now += 30  # getBio expired, getPerson not
+        apps.getPerson("Stub-5", "Name,Id")
+        apps.getBio("Stub-5")
+        assert server.counts["getPerson"] == 1
+        assert server.counts["getBio"] == 2
+
+
+def test_cache_keeps_key_order():
+    cache = ResponseCache()
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        r1 = apps.getRelatives(["Stub-3", "Stub-4"], getParents=True)
+        r2 = apps.getRelatives("Stub-3, Stub-4", getParents=True)  # same keys, other spacing
+        assert r1 is r2
+        r3 = apps.getRelatives(["Stub-4", "Stub-3"], getParents=True)
+        assert [item["key"] for item in r3.json()[0]["items"]] == ["Stub-4", "Stub-3"]
+        apps.getRelatives(["Stub-4", "Stub-3", "Stub-4"], getParents=True)
+        assert server.counts["getRelatives"] == 3
+
+
+def test_cache_lru_and_bypass():
+    cache = ResponseCache(maxsize=2)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        apps.getProfile("Stub-1")
+        apps.getProfile("Stub-2")
+        apps.getProfile("Stub-1")  # Stub-2 is now least recently used
+        apps.getProfile("Stub-3")
+        assert cache.evictions == 1
+        apps.getProfile("Stub-1")
+        assert server.counts["getProfile"] == 3
+        apps.getProfile("Stub-2")
+        assert server.counts["getProfile"] == 4
+
+        with cache.bypass():
+            apps.getProfile("Stub-2")
+        assert server.counts["getProfile"] == 5
+        assert cache.stats()["bypasses"] == 1
+
+
+def test_cache_partitioned_by_login():
+    cache = ResponseCache()
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        anonymous = apps.getPerson("Stub-7").json()[0]["person"]
+        assert "FirstName" not in anonymous  # Stub-7 is private
+
+        apps.login(STUB_USER, STUB_PASS)
+        logged_in = apps.getPerson("Stub-7").json()[0]["person"]
+        assert "FirstName" in logged_in
+
+        apps.logout()
+        assert apps.getPerson("Stub-7").json()[0]["person"] == anonymous
+        assert server.counts["getPerson"] == 2
+
+
+def test_sqlite_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with StubServer() as server:
+        cache = SQLiteCache(path, batch_size=10)
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        for i in range(1, 26):
+            apps.getPerson("Stub-%d" % (i,))
+        assert cache.stats()["flushes"] == 2  # writes are batched
+        cache.close()
+
+        cache = SQLiteCache(path)
+        apps = WT_Apps(url=server.url, cache=cache)
+        r = apps.getPerson("Stub-25")
+        assert r.json()[0]["person"]["Id"] == 25
+        assert server.counts["getPerson"] == 25
+        assert len(cache) == 25
+        cache.close()
+
+
+def test_sqlite_cache_touched_revalidation(tmp_path):
+    clock = FakeClock()
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), ttl=60, clock=clock)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        apps.getPerson("Stub-1")
+        apps.getPerson("Stub-2")
+        apps.getBio("Stub-2")
+        apps.getAncestors("Stub-3", 2)
+
+        clock.now += 120
+        server.tree.touch(2)
+
+        # unchanged profile: one Touched request, no refetch
+        apps.getPerson("Stub-1")
+        assert server.counts["getPerson"] == 2
+        assert server.counts["getRelatives"] == 1
+        # changed profile: refetched
+        r = apps.getPerson("Stub-2")
+        assert server.counts["getPerson"] == 3
+        assert r.json()[0]["person"]["Touched"] == server.tree.touched(2)
+        assert cache.revalidated == 1 and cache.changed == 1
+
+        # the bio of Stub-2 is stale, the ancestors of Stub-3 are not
+        renewed, removed = cache.refresh(apps.getTouched)
+        assert (renewed, removed) == (1, 1)
+        apps.getAncestors("Stub-3", 2)
+        assert server.counts["getAncestors"] == 1
+        apps.getBio("Stub-2")
+        assert server.counts["getBio"] == 2
+        cache.close()
+
+
+def test_sqlite_cache_revalidation_counts_and_failures(tmp_path):
+    clock = FakeClock()
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), ttl=60, clock=clock)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, cache=cache)
+        server.reset()
+        apps.getPerson("Stub-1")
+        apps.getPerson("Stub-2")
+        apps.getPerson("Stub-3")
+        clock.now += 120
+
+        # each lookup counts once: revalidated is a hit
+        apps.getPerson("Stub-1")
+        assert (cache.hits, cache.misses) == (1, 3)
+        assert cache.stats()["hit_rate"] == 0.25
+
+        # a failed Touched request falls back to a normal fetch
+        def fail(ids):
+            raise RuntimeError("Touched unavailable")
+        apps._touched, touched = fail, apps._touched
+        assert apps.getPerson("Stub-2").json()[0]["person"]["Id"] == 2
+        apps._touched = touched
+        assert server.counts["getPerson"] == 4
+        assert (cache.hits, cache.misses, cache.changed) == (1, 4, 0)
+
+        # an action no longer cached is not renewed
+        cache.ttls["getPerson"] = None
+        key = request_key({"action": "getPerson", "format": "json", "key": "Stub-3", "fields": ""})
+        assert cache.revalidate(key, apps.getTouched) is None
+        assert cache.refresh(apps.getTouched) == (0, 1)
+        cache.close()
@@ -0,0 +1,147 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree crawlers against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_crawl import AncestorCrawler, DescendantCrawler
+
+
+def ancestors(tree, pid, max_depth=None):
+    found = {pid: 0}
+    level = [pid]
+    depth = 0
+    while level and (max_depth is None or depth < max_depth):
+        depth += 1
+        level = [p for a in level for p in tree.parents(a) if p not in found]
+        for p in level:
+            found[p] = depth
+    return found
+
+
+def descendants(tree, pid, max_depth=None):
+    found = {pid: 0}
+    level = [pid]
+    depth = 0
+    while level and (max_depth is None or depth < max_depth):
+        depth += 1
+        level = [c for a in level for c in tree.children(a) if c not in found]
+        level = sorted(set(level))
+        for c in level:
+            found[c] = depth
+    return found
+
+
+def test_ancestor_crawl_dedup():
+    tree = StubTree(12, 16)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        crawler = AncestorCrawler(apps, step=3, max_workers=4)
+        server.reset()
+        result = dict((p["Id"], g) for g, p in crawler.crawl("Stub-1"))
+        assert result == ancestors(tree, 1)
+        stats = crawler.stats()
+        assert stats["people"] == len(result)
+        assert stats["stopped"] is None and stats["errors"] == 0
+        assert stats["requests"] == server.counts["getAncestors"]
+        # each frontier ancestor is expanded once, despite pedigree collapse
+        assert stats["requests"] < len(result)
+
+
+def test_ancestor_crawl_budgets():
+    tree = StubTree(12, 16)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        crawler = AncestorCrawler(apps, step=5)
+
+        result = dict((p["Id"], g) for g, p in crawler.crawl("Stub-1", max_depth=7))
+        assert result == ancestors(tree, 1, 7)
+        assert crawler.stopped == "depth"
+
+        assert len(list(crawler.crawl("Stub-1", max_people=10))) == 10
+        assert crawler.stopped == "count"
+
+        server.delay = 0.2
+        assert list(crawler.crawl("Stub-1", max_time=0.1)) == []
+        assert crawler.stopped == "time"
+
+
+def test_descendant_crawl():
+    tree = StubTree(8, 32)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        crawler = DescendantCrawler(apps, batch_size=10, max_workers=3)
+        server.reset()
+        root = 7 * 32 + 5
+        result = {}
+        for g, p in crawler.crawl("Stub-%d" % (root,)):
+            assert p["Id"] not in result and "Children" not in p
+            result[p["Id"]] = g
+        assert result == descendants(tree, root)
+        stats = crawler.stats()
+        assert stats["stopped"] is None and stats["duplicates"] > 0
+        assert stats["requests"] == server.counts["getRelatives"]
+        # everyone is expanded, in full batches of 10 but at most
+        # one partial batch per generation
+        assert len(result) // 10 < stats["requests"] <= len(result) // 10 + 8
+
+        result = dict((p["Id"], g) for g, p in crawler.crawl([root, root - 1], max_depth=3))
+        expected = descendants(tree, root, 3)
+        expected.update(descendants(tree, root - 1, 3))
+        assert set(result) == set(expected)
+        assert crawler.stopped == "depth"
+
+        assert len(list(crawler.crawl(root, max_people=25))) == 25
+        assert crawler.stopped == "count"
+
+
+def test_ancestor_crawl_cross_generation_collapse():
+    # 70, at (4, 5), is a great-great-grandparent of 1, and is made the
+    # father of 33, at (2, 0), so it is a great-grandparent as well
+    tree = StubTree(12, 16)
+    tree.relink(33, 70, tree.mother(33))
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        crawler = AncestorCrawler(apps, step=1, max_workers=4)
+        # the shorter line arrives last
+        server.slow[33] = 0.5
+        for max_depth in (None, 4):
+            result = {}
+            for g, p in crawler.crawl("Stub-1", max_depth=max_depth):
+                assert g < result.get(p["Id"], g + 1)
+                result[p["Id"]] = g
+            assert result[70] == 3
+            assert result == ancestors(tree, 1, max_depth)
+            assert crawler.stats()["revisited"] > 0
+
+
+def test_descendant_crawl_cross_generation_collapse():
+    # 133 is a great-grandchild of the root through 211 and 170, and
+    # is made a child of 195, a child of the root, as well
+    tree = StubTree(8, 32)
+    root = 7 * 32 + 5
+    tree.relink(133, 195, tree.mother(133))
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        crawler = DescendantCrawler(apps, batch_size=1, max_workers=4)
+        # the shorter line arrives last
+        server.slow[195] = 0.5
+        for max_depth in (None, 2):
+            result = {}
+            for g, p in crawler.crawl(root, max_depth=max_depth):
+                assert p["Id"] not in result
+                result[p["Id"]] = g
+            assert result[133] == 2
+            assert result == descendants(tree, root, max_depth)
+
+        # a root which descends from another root
+        server.slow = {211: 0.5}
+        result = dict((p["Id"], g) for g, p in crawler.crawl([root, 211], max_depth=2))
+        assert (result[211], result[170], result[186]) == (0, 1, 1)
+        assert crawler.stats()["revisited"] == 1
@@ -0,0 +1,60 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree family graph against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_graph import FamilyGraph, CHILDREN, PARENTS, SPOUSES
+
+
+def test_graph_from_responses():
+    tree = StubTree(6, 16)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        graph = FamilyGraph()
+        graph.add(apps.getAncestors("Stub-3", 10))
+        server.reset()
+
+        assert graph.parents("Stub-3") == tree.parents(3)
+        assert graph.father(3) == tree.father(3) and graph.mother("3") == tree.mother(3)
+        expected, level = {}, [3]
+        for g in range(1, 6):
+            level = sorted(set(p for a in level for p in tree.parents(a)))
+            expected.update((p, g) for p in level)
+        assert graph.ancestors(3) == expected
+        assert graph.ancestors(3, depth=2) == dict((p, g) for p, g in expected.items() if g <= 2)
+        top = 5 * 16 + 5
+        assert graph.generations("Stub-3", top) == 5
+        assert graph.generations(top, "Stub-3") == -5
+        assert graph.generations(3, 4) is None
+        assert graph.known(3, PARENTS) and not graph.known(3, CHILDREN)
+
+        keys = ["Stub-%d" % (i,) for i in range(17, 33)]
+        graph.add(apps.getRelatives(keys, getChildren=True, getSpouses=True))
+        for pid in range(17, 33):
+            assert sorted(graph.children(pid)) == tree.children(pid)
+            assert graph.spouses(pid) == tree.spouses(pid)
+            assert graph.known(pid, CHILDREN | SPOUSES)
+        assert 3 in graph.descendants(top)
+        assert server.counts["getRelatives"] == 1
+
+
+def test_graph_private_children_and_changes():
+    graph = FamilyGraph()
+    # anonymous: private children do not show their parents
+    graph.add([{"items": [{"person": {"Id": 10, "Name": "A-10", "Gender": "Female", "Father": 0, "Mother": 0,
+                                      "Children": {"11": {"Id": 11, "Name": "A-11"},
+                                                   "12": {"Id": 12, "Father": 13, "Mother": 10}}}}]}])
+    assert graph.mother(11) == 10 and graph.father(11) is None
+    assert sorted(graph.children("A-10")) == [11, 12]
+    assert graph.siblings(11) == [12]
+
+    # a later response corrects a parent
+    graph.add_person({"Id": 12, "Father": 14, "Mother": 10})
+    assert graph.children(13) == []
+    assert graph.children(14) == [12]
+    assert len(graph) == 5 and 15 not in graph
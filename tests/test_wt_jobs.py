@@ -0,0 +1,96 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the durable WikiTree job queue against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import pytest
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_jobs import JobQueue, JobRunner
+from wt_person import person_dicts
+
+
+def test_job_queue_resume(tmpdir):
+    tree = StubTree(4, 16)
+    path = str(tmpdir.join("jobs.sqlite"))
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+
+        queue = JobQueue(path)
+        assert queue.add("getBio", ["Stub-%d" % (pid,) for pid in range(1, 41)]) == 40
+        assert queue.add("getBio", "Stub-1") == 0
+        assert queue.add("getAncestors", "Stub-1", depth=2) == 1
+        with pytest.raises(ValueError):
+            queue.add("login", "Stub-1")
+        reports = []
+        runner = JobRunner(apps, queue, workers=4, checkpoint_jobs=5, report=reports.append)
+        assert runner.run(max_jobs=20) == "count"
+        assert queue.counts() == {"pending": 21, "running": 0, "done": 20, "failed": 0}
+        assert reports[-1]["done"] == 20 and reports[-1]["pending"] == 21 and len(reports) >= 4
+
+        # the process dies with jobs running, and results not checkpointed
+        jobs = queue.claim(3)
+        queue.checkpoint()
+        queue.done(jobs[0], {"lost": True})
+        queue._db.close()
+
+        queue = JobQueue(path)
+        assert queue.resumed == 3
+        assert queue.counts() == {"pending": 21, "running": 0, "done": 20, "failed": 0}
+        server.reset()
+        runner = JobRunner(apps, queue, workers=4)
+        assert runner.run() == "done"
+        assert server.counts["getBio"] + server.counts["getAncestors"] == 21
+        assert runner.stats()["completed"] == 21 and runner.stats()["pending"] == 0
+
+        results = list(queue.results("getBio"))
+        assert sorted(int(job.key[5:]) for job, _ in results) == list(range(1, 41))
+        for job, payload in results:
+            assert payload[0]["bio"] == tree.bio(int(job.key[5:]))
+        assert [job.key for job, _ in queue.results("getBio", batch=7)] == [job.key for job, _ in results]
+        assert len(list(queue.results(batch=1))) == 41
+        ancestors = queue.result("getAncestors", "Stub-1", depth=2)
+        assert len(ancestors[0]["ancestors"]) == 7
+        assert queue.result("getAncestors", "Stub-1") is None
+        queue.close()
+
+
+def test_job_runner_retry_and_follow(tmpdir):
+    tree = StubTree(6, 4)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+
+        def follow(job, payload):
+            for person in person_dicts(payload):
+                for parent in (person.get("Father"), person.get("Mother")):
+                    if parent:
+                        yield "getPerson", parent, {}
+
+        with JobQueue(str(tmpdir.join("jobs.sqlite"))) as queue:
+            queue.add("getPerson", 1)
+            server.failures = [503, 503]
+            runner = JobRunner(apps, queue, workers=2, backoff=0.01, follow=follow)
+            assert runner.run() == "done"
+            done = dict((int(job.key), payload) for job, payload in queue.results())
+            expected = set([1])
+            level = [1]
+            while level:
+                level = [p for pid in level for p in (tree.father(pid), tree.mother(pid)) if p]
+                expected.update(level)
+            assert set(done) == expected
+            assert runner.retries == 2 and runner.failed == 0
+
+            queue.add("getPerson", "Stub-2")
+            server.failures = [500] * 3
+            runner = JobRunner(apps, queue, workers=1, max_retries=2, backoff=0.01)
+            assert runner.run() == "done"
+            failures = queue.failures()
+            assert [(job.key, job.attempts) for job, _ in failures] == [("Stub-2", 3)]
+            assert "500" in failures[0][1]
+            assert queue.retry_failed() == 1 and runner.run() == "done"
+            assert queue.counts()["failed"] == 0 and queue.result("getPerson", "Stub-2") is not None
@@ -0,0 +1,78 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree Ahnentafel pedigrees against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_graph import FamilyGraph
+from wt_pedigree import Pedigree
+
+
+def ahnentafel(tree, pid, generations):
+    slots = [0, pid]
+    for n in range(2, 2 ** (generations + 1)):
+        child = slots[n // 2]
+        slots.append((tree.father(child) if n % 2 == 0 else tree.mother(child)) if child else 0)
+    return slots
+
+
+def test_pedigree_from_ancestors():
+    tree = StubTree(8, 16)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        r = apps.getAncestors("Stub-1", 10)
+        pedigree = Pedigree(r)
+        assert pedigree.generations == 7  # the top generation has no parents
+        assert pedigree.ids.tolist() == ahnentafel(tree, 1, 7)
+        assert pedigree[1] == 1 and pedigree[2] == tree.father(1) and pedigree[3] == tree.mother(1)
+        assert len(pedigree) == 2 ** 8 - 1 and pedigree[len(pedigree)] == pedigree.ids[-1]
+        assert pedigree[0] is None and pedigree[len(pedigree) + 1] is None
+        assert pedigree.person(5)["Id"] == tree.mother(tree.father(1))
+        assert Pedigree.generation(1) == 0 and Pedigree.generation(5) == 2
+        assert len(pedigree.fan(3)) == 8
+
+        # 16 people per generation: collapse starts at generation 5
+        implex = pedigree.implex()
+        assert [g["distinct"] for g in implex] == [1, 2, 4, 8, 16, 16, 16, 16]
+        assert implex[4]["collapse"] == 0.0 and implex[5]["collapse"] == 0.5
+        for pid, slots in pedigree.collapse.items():
+            assert len(slots) > 1 and all(pedigree[n] == pid for n in slots)
+        assert len(pedigree.collapse) == 16 * 3
+        assert pedigree.slots("Stub-%d" % (pedigree[40],)) == list(pedigree.collapse[pedigree[40]])
+        assert pedigree.slots("%d" % (pedigree[40],)) == pedigree.slots(pedigree[40])
+        assert pedigree.slots("Stub-0") == [] and pedigree.cycles == []
+        assert pedigree.slots(None) == [] and pedigree.slots(["Stub-1"]) == []
+
+        limited = Pedigree(r.json()[0]["ancestors"], subject="Stub-1", generations=3)
+        assert limited.ids.tolist() == ahnentafel(tree, 1, 3) and limited.collapse == {}
+
+        graph = FamilyGraph()
+        graph.add(r)
+        assert Pedigree.from_graph(graph, "Stub-1").ids == pedigree.ids
+
+
+def test_pedigree_cycle():
+    # 1 is the father of 2, who is the father of 3, who is the father of 1
+    graph = FamilyGraph()
+    for pid, father in ((1, 3), (2, 1), (3, 2)):
+        graph.add_person({"Id": pid, "Name": "Stub-%d" % (pid,), "Father": father, "Mother": 10 + pid})
+    pedigree = Pedigree.from_graph(graph, "Stub-1")
+    assert pedigree.ids.tolist() == [0, 1, 3, 11, 2, 13, 0, 0, 0, 12] + [0] * 6
+    assert pedigree.generations == 3 and pedigree.cycles == [8]
+
+    # without parents, the generations are capped
+    graph = FamilyGraph()
+    for pid in range(1, Pedigree.max_generations + 10):
+        graph.add_person({"Id": pid, "Name": "Stub-%d" % (pid,), "Father": pid + 1})
+    pedigree = Pedigree.from_graph(graph, "Stub-1", generations=4)
+    assert pedigree.fan(4)[0] == 5 and pedigree.generations == 4
+    try:
+        Pedigree.from_graph(graph, "Stub-1", generations=Pedigree.max_generations + 1)
+    except ValueError:
+        pass
+    else:
+        assert False, "generations are capped"
@@ -0,0 +1,64 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the compact WikiTree person records against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import pickle
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_person import Person, people
+
+
+def test_person_fields():
+    tree = StubTree(4, 8)
+    d = tree.person(9, logged_in=True)
+    d["Nicknames"] = "Nick"
+    p = Person(d)
+    assert p.Id == 9 and p.Name == "Stub-9" and p.Privacy == 60
+    assert p.IsLiving is True and p.Privacy_IsOpen is True and p.Privacy_IsPrivate is False
+    assert p.Nicknames == "Nick" and p["LongNamePrivate"] == d["LongNamePrivate"]
+    assert p.get("NoSuchField", 1) == 1 and "NoSuchField" not in p
+    assert "IsRedirect" not in p and p.IsRedirect is None
+    assert p._rare_names is Person(tree.person(10, logged_in=True))._rare_names
+
+    # a typo is an error, a field the API did not return is None
+    assert p.Bio is None and hasattr(p, "Bio")
+    try:
+        p.FirstNmae
+    except AttributeError:
+        pass
+    else:
+        assert False, "unknown field names raise AttributeError"
+    assert not hasattr(p, "FirstNmae")
+
+    expected = dict((k, v) for k, v in d.items() if v is not None or k in ("Photo", "PhotoData"))
+    expected["IsLiving"] = expected["IsPerson"] = True
+    assert p.to_dict() == expected
+    assert pickle.loads(pickle.dumps(p)) == p
+    try:
+        p.Name = "Stub-1"
+    except AttributeError:
+        pass
+    else:
+        assert False, "Person is read only"
+
+    private = Person(tree.person(7))
+    assert private.FirstName is None and private.keys() == ["Id", "Name", "Privacy", "Touched", "IsPerson"]
+
+
+def test_people_from_responses():
+    with StubServer(StubTree(6, 16)) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        ancestors = people(apps.getAncestors("Stub-1", 3))
+        assert [p.Id for p in ancestors][:3] == [1, 17, 18]
+
+        person, = people(apps.getPerson("Stub-20", "*"))
+        assert sorted(c.Id for c in person.relatives("Children")) == server.tree.children(20)
+        assert [p.Id for p in person.relatives("Parents")] == server.tree.parents(20)
+
+        items = people(apps.getRelatives(["Stub-2", "Stub-3"]))
+        assert [p.Name for p in items] == ["Stub-2", "Stub-3"]
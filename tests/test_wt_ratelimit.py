@@ -0,0 +1,74 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the rate limiter against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import threading
+import time
+
+from stub_server import StubServer
+from wt_apps import WT_Apps
+from wt_ratelimit import HIGH, LOW, RateLimiter
+from wt_scheduler import RequestScheduler
+
+
+def test_rate_is_limited():
+    limiter = RateLimiter(rate=50, burst=5)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, rate_limiter=limiter)
+        t0 = time.time()
+        for i in range(1, 31):
+            apps.getProfile(i)
+        elapsed = time.time() - t0
+        # 5 in the initial burst, the other 25 at 50 per second
+        assert elapsed >= 0.4
+        assert limiter.stats()["classes"]["high"]["granted"] >= 30
+
+
+def test_high_priority_jumps_the_queue():
+    limiter = RateLimiter(rate=20, burst=1)
+    order = []
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, rate_limiter=limiter)
+
+        def bulk(i):
+            apps.getAncestors("Stub-%d" % (i,), 1)
+            order.append("low")
+
+        threads = [threading.Thread(target=bulk, args=(i,)) for i in range(1, 11)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        assert limiter.queue_depth(LOW) > 5
+
+        apps.getPerson("Stub-1")
+        order.append("high")
+        for t in threads:
+            t.join()
+
+        # the interactive request waited for at most one token
+        assert order.index("high") <= 3
+        stats = limiter.stats()
+        assert stats["classes"]["high"]["max_wait"] < stats["classes"]["low"]["max_wait"]
+
+        # the priority class can be overridden
+        with limiter.priority(LOW):
+            assert limiter.priority_for("getPerson") == LOW
+        assert limiter.priority_for("getPerson") == HIGH
+
+
+def test_token_wait_is_not_latency():
+    limiter = RateLimiter(rate=20, burst=1)
+    scheduler = RequestScheduler(max_concurrency=8)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, rate_limiter=limiter, scheduler=scheduler)
+        threads = [threading.Thread(target=apps.getProfile, args=(i,)) for i in range(1, 21)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # about 50 ms waiting per token, but a fast server
+        assert limiter.stats()["classes"]["high"]["max_wait"] > 0.5
+        assert scheduler.latency < 0.05
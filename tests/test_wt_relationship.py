@@ -0,0 +1,59 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree relationship finder against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+from collections import deque
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_relationship import RelationshipFinder
+
+
+def distance(tree, a, b):
+    dist = {a: 0}
+    queue = deque([a])
+    while queue:
+        p = queue.popleft()
+        for r in tree.parents(p) + tree.children(p):
+            if r not in dist:
+                dist[r] = dist[p] + 1
+                queue.append(r)
+    return dist.get(b)
+
+
+def test_find_relationship():
+    tree = StubTree(8, 32)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        finder = RelationshipFinder(apps, batch_size=20)
+        server.reset()
+        r = finder.find("Stub-1", "Stub-20")
+        assert r.path[0] == 1 and r.path[-1] == 20
+        assert len(r.path) - 1 == distance(tree, 1, 20)
+        for a, b, step in zip(r.path, r.path[1:], r.steps):
+            assert b in (tree.parents(a) if step == "parent" else tree.children(a))
+        assert r.calls == server.counts["getRelatives"] == finder.calls
+
+        # the graph is reused: no more calls
+        r2 = finder.find(20, 1)
+        assert r2.calls == 0 and len(r2.path) == len(r.path)
+
+        assert finder.find("Stub-1", "Stub-1").path == [1]
+        assert finder.find("Stub-1", "Stub-20", max_depth=2) is None
+
+
+def test_find_relationship_budget_and_spouses():
+    tree = StubTree(8, 32)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        finder = RelationshipFinder(apps, batch_size=20)
+        assert finder.find("Stub-1", "Stub-20", max_calls=2) is None
+
+        finder = RelationshipFinder(apps, spouses=True)
+        r = finder.find(2 * 32 + 1, 2 * 32 + 2)
+        assert r.path == [65, 66] and r.steps == ["spouse"]
@@ -0,0 +1,85 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the parse-once WikiTree apps results against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from stub_server import StubServer, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_cache import ResponseCache, SQLiteCache
+from wt_result import Result, ResultDecoder, available_decoders
+from wt_singleflight import SingleFlight
+
+
+@pytest.mark.parametrize("name", available_decoders())
+def test_results_decoded_once(name):
+    calls = []
+    decoder = ResultDecoder(name)
+    loads = decoder.loads
+
+    def counting_loads(content):
+        calls.append(len(content))
+        return loads(content)
+
+    decoder.loads = counting_loads
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, decoder=decoder)
+        r = apps.getAncestors("Stub-3", 3)
+        assert isinstance(r, Result)
+        assert r.status == 0 and r.ok and r.action == "getAncestors"
+        assert r.json() is r.json() is r.payload
+        assert r.size == calls[0] and isinstance(r.elapsed, datetime.timedelta)
+        assert r.elapsed > datetime.timedelta(0)
+        assert len(calls) == 1
+        assert decoder.stats()["decoder"] == name
+
+        assert apps.login(STUB_USER, STUB_PASS).json()["login"]["result"] == "Success"
+        assert apps.identity == STUB_USER
+
+
+def test_results_shared_by_cache_and_waiters(tmp_path):
+    decoder = ResultDecoder("json")
+    with StubServer(delay=0.2) as server:
+        apps = WT_Apps(url=server.url, decoder=decoder, cache=ResponseCache(), singleflight=SingleFlight())
+        server.reset()
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            rs = list(pool.map(lambda i: apps.getPerson("Stub-4"), range(5)))
+        rs.append(apps.getPerson("Stub-4"))
+        assert server.counts["getPerson"] == 1
+        assert all(r is rs[0] for r in rs)
+        assert decoder.stats()["decoded"] == 1
+
+        # the SQLite cache decodes the stored body once per lookup
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite"))
+        apps = WT_Apps(url=server.url, decoder=decoder, cache=cache)
+        r = apps.getPerson("Stub-4")
+        assert decoder.stats()["decoded"] == 2
+        assert apps.getPerson("Stub-4").json() == r.json()
+        assert decoder.stats()["decoded"] == 3
+        cache.close()
+
+
+def test_results_chunks():
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, chunk_size=10, decoder=ResultDecoder("json"))
+        keys = ["Stub-%d" % (i,) for i in range(1, 26)]
+        r = apps.getRelatives(keys)
+        assert isinstance(r, Result) and r.status == 0
+        assert [item["key"] for item in r.json()[0]["items"]] == keys
+        assert r.decode_time > 0 and r.size > 0
+
+
+def test_decoder_choice():
+    assert ResultDecoder().name == available_decoders()[0]
+    assert ResultDecoder(json.loads).loads is json.loads
+    with pytest.raises(ValueError):
+        ResultDecoder("yaml")
+    with pytest.raises(ValueError):
+        WT_Apps(default_format="xmlfm", decoder=ResultDecoder())
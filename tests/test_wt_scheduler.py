@@ -0,0 +1,90 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the request scheduler against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import pytest
+import requests
+
+from stub_server import StubServer
+from wt_apps import WT_Apps
+from wt_scheduler import CircuitOpenError, RequestScheduler
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_transient_errors_are_retried():
+    sleeps = []
+    scheduler = RequestScheduler(max_retries=3, sleep=sleeps.append)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, scheduler=scheduler)
+        server.reset()
+        server.failures = [503, 429]
+        r = apps.getPerson("Stub-1")
+        assert r.json()[0]["person"]["Id"] == 1
+        assert server.counts["getPerson"] == 3
+        assert scheduler.retries == 2
+        assert sleeps == [0.0, 0.0]  # the stub sends Retry-After: 0
+
+        # errors which are not transient are not retried
+        server.failures = [404]
+        with pytest.raises(requests.HTTPError):
+            apps.getPerson("Stub-1")
+        assert server.counts["getPerson"] == 4
+
+        # login is not idempotent
+        server.failures = [503]
+        with pytest.raises(requests.HTTPError):
+            apps.login("nobody@example.com", "x")
+
+
+def test_concurrency_adapts():
+    scheduler = RequestScheduler(max_retries=0, min_concurrency=1, max_concurrency=8, concurrency=4,
+                                 latency_tolerance=1000, failure_threshold=100)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, scheduler=scheduler)
+        for i in range(1, 40):
+            apps.getProfile(i)
+        assert scheduler.limit == 8
+        server.failures = [503]
+        with pytest.raises(requests.HTTPError):
+            apps.getProfile(1)
+        assert scheduler.limit == 4
+
+
+def test_circuit_breaker():
+    clock = FakeClock()
+    scheduler = RequestScheduler(max_retries=0, failure_threshold=3, reset_timeout=30, clock=clock)
+    with StubServer() as server:
+        apps = WT_Apps(url=server.url, scheduler=scheduler)
+        server.reset()
+        server.failures = [500] * 5
+        for i in range(3):
+            with pytest.raises(requests.HTTPError):
+                apps.getProfile(1)
+        assert scheduler.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            apps.getProfile(1)
+        assert server.counts["getProfile"] == 3
+
+        clock.now += 31
+        assert scheduler.state == "half-open"
+        with pytest.raises(requests.HTTPError):  # the probe fails
+            apps.getProfile(1)
+        assert scheduler.state == "open"
+
+        clock.now += 31
+        server.failures = []
+        apps.getProfile(1)  # the probe succeeds
+        assert scheduler.state == "closed"
+        stats = scheduler.stats()
+        assert stats["rejected"] == 1 and stats["failures"] == 4
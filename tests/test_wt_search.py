@@ -0,0 +1,87 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree biography full-text index against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import pytest
+
+import wt_search
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_search import TextIndex, _decode, _encode, tokenize
+
+
+def test_encoding():
+    numbers = [0, 1, 127, 128, 300, 16384, 2 ** 31]
+    assert _decode(_encode(numbers)) == numbers
+    assert len(_encode(range(100))) == 100
+    assert tokenize("Born in [[Stub-2|Father 2]], Stubshire.") == ["born", "in", "stub", "2", "father", "2", "stubshire"]
+
+
+def test_text_index(tmpdir):
+    tree = StubTree(4, 16)
+    path = str(tmpdir.join("search.sqlite"))
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        with TextIndex(path, batch_size=16) as index:
+            for pid in range(1, 65):
+                assert index.add_response(apps.getBio("Stub-%d" % (pid,))) == 1
+            assert index.add_response(apps.getBio("Stub-5")) == 0  # unchanged
+            assert len(index) == 64
+
+            hits = index.search("place 4")
+            assert set(h.id for h in hits) == set(p for p in range(1, 65) if (p - 1) % 16 == 4 or p == 4)
+            assert sorted(h.id for h in index.search('"place 4"')) == [5, 21, 37, 53]
+            assert [h[:2] for h in index.search('"Place 4, page 21"')] == [(21, "Stub-21")]
+            assert index.search('"page 4 place"') == []
+            assert index.search("nowhere") == [] and index.search("  ") == []
+
+            # shorter biographies rank first
+            hits = index.search("stubshire", limit=3)
+            assert len(hits) == 3 and all(tree.father(h.id) == 0 for h in hits)
+            assert hits[0].score >= hits[1].score >= hits[2].score > 0
+
+            index.add(21, "Moved to [[Elsewhere]].", name="Stub-21")
+            index.remove(37)
+            assert sorted(h.id for h in index.search('"place 4"')) == [5, 53]
+            assert [h.id for h in index.search("elsewhere")] == [21]
+            assert index.stats()["unchanged"] == 1 and index.stats()["removed"] == 1
+
+    with TextIndex(path) as index:
+        assert len(index) == 63
+        assert sorted(h.id for h in index.search('"place 4"')) == [5, 53]
+        assert [(h.id, h.name) for h in index.search("moved elsewhere")] == [(21, "Stub-21")]
+        assert index.add(53, tree.bio(53)) is False
+
+        # one row of postings per word, with the same results
+        index.add(53, "Only this.")
+        index.compact()
+        assert index._db.execute("SELECT COUNT(*) FROM text_postings").fetchone()[0] == len(index._term_ids)
+        assert sorted(h.id for h in index.search('"place 4"')) == [5]
+        assert [h.id for h in index.search("only")] == [53] and len(index) == 63
+
+
+def test_text_index_rollback(monkeypatch):
+    index = TextIndex()
+    index.add(1, "First profile.", "Stub-1")
+    index.flush()
+
+    def fail(postings):
+        raise RuntimeError("disk full")
+    with monkeypatch.context() as m:
+        m.setattr(wt_search, "_pack", fail)
+        index.add(2, "Second profile.", "Stub-2")
+        with pytest.raises(RuntimeError):
+            index.flush()
+    assert sorted(index._term_ids) == ["first", "profile"] and list(index._docs) == [1]
+
+    # the terms of the rolled back block get new ids
+    index.add(3, "Third profile.", "Stub-3")
+    index.flush()
+    assert [h.id for h in index.search("second")] == [2]
+    assert [h.id for h in index.search("third")] == [3]
+    assert [h.id for h in index.search("first")] == [1] and len(index) == 3
+    index.close()
@@ -0,0 +1,102 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the multi-process WikiTree crawler against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import time
+
+import pytest
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_cache import ResponseCache
+from wt_ratelimit import LOW, RateLimiter
+from wt_scheduler import RequestScheduler
+from wt_shard import ShardedCrawler, _settings, _worker_apps, shard_of
+
+
+def summary(person):
+    # records of even Ids only, as (Id, Name, Father)
+    if person["Id"] % 2:
+        return None
+    return person["Id"], person["Name"], person.get("Father")
+
+
+def test_shard_of():
+    assert shard_of("Stub-1", 4) == shard_of("Stub-1", 4)
+    assert set(shard_of("Stub-%d" % (pid,), 4) for pid in range(100)) == set(range(4))
+
+
+def test_sharded_crawler():
+    tree = StubTree(6, 16)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        keys = ["Stub-%d" % (pid,) for pid in range(1, 33)]
+
+        with ShardedCrawler(apps, processes=3, threads=2, batch_size=7) as crawler:
+            people = list(crawler.records("getPerson", keys))
+            assert sorted(p["Id"] for p in people) == list(range(1, 33))
+            # the workers are logged in, so private profiles are complete
+            assert all("BirthDate" in p for p in people)
+            stats = crawler.stats()
+            assert stats["processes"] == 3 and stats["requests"] == 32 and stats["records"] == 32
+            assert stats["batches"] >= 5
+
+            ancestors = list(crawler.records("getAncestors", keys[:4], depth=2))
+            expected = []
+            for pid in range(1, 5):
+                level = [pid]
+                for _ in range(3):
+                    expected += level
+                    level = [p for q in level for p in (tree.father(q), tree.mother(q)) if p]
+            assert sorted(p["Id"] for p in ancestors) == sorted(expected)
+
+            relatives = list(crawler.records("getRelatives", keys + ["Stub-0"], getParents=1))
+            assert sorted(p["Id"] for p in relatives) == list(range(1, 33))
+
+            watchlist = list(crawler.watchlist(page_size=10))
+            assert sorted(p["Id"] for p in watchlist) == list(range(1, tree.size + 1))
+            assert crawler.stats()["requests"] == (tree.size + 9) // 10
+
+            # an abandoned stream stops the processes, which restart
+            stream = crawler.records("getPerson", keys)
+            next(stream)
+            stream.close()
+            assert len(list(crawler.records("getPerson", keys))) == 32
+
+            server.failures = [500]
+            assert len(list(crawler.records("getPerson", keys[:6]))) == 5
+            assert len(crawler.errors) == 1 and "500" in crawler.errors[0][1]
+
+            with pytest.raises(ValueError):
+                crawler.records("getBio", keys)
+
+        with ShardedCrawler(apps, processes=2, transform=summary) as crawler:
+            records = sorted(crawler.records("getPerson", keys))
+            assert records == [(pid, "Stub-%d" % (pid,), tree.father(pid)) for pid in range(2, 33, 2)]
+
+
+def test_sharded_crawler_budget():
+    limiter = RateLimiter(rate=20, burst=2)
+    limiter.action_priorities = {"getPerson": LOW}
+    apps = WT_Apps(rate_limiter=limiter, scheduler=RequestScheduler(max_concurrency=6), cache=ResponseCache(maxsize=10),
+                   chunk_size=25)
+    config = dict(_settings(apps, 4), url="http://localhost/", cookies={}, identity=None)
+    worker = _worker_apps(config, 2)
+    assert (worker._rate_limiter.rate, worker._rate_limiter.burst) == (5.0, 1.0)
+    assert worker._rate_limiter.action_priorities == {"getPerson": LOW}
+    assert worker._scheduler.max_concurrency == 1 and worker._scheduler.min_concurrency == 1
+    assert worker._cache.maxsize == 10 and len(worker._cache) == 0 and worker._chunk_size == 25
+
+    tree = StubTree(6, 16)
+    with StubServer(tree) as server:
+        apps = WT_Apps(url=server.url, rate_limiter=RateLimiter(rate=20, burst=2))
+        keys = ["Stub-%d" % (pid,) for pid in range(1, 33)]
+        with ShardedCrawler(apps, processes=2, threads=4) as crawler:
+            t0 = time.time()
+            assert len(list(crawler.records("getPerson", keys))) == 32
+            # 20 requests per second for the processes together
+            assert time.time() - t0 >= 1.3
@@ -0,0 +1,90 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test single flight request deduplication against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import threading
+import time
+
+import pytest
+import requests
+
+from stub_server import StubServer
+from wt_apps import WT_Apps
+from wt_singleflight import SingleFlight
+
+
+def _together(n, func):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_identical_requests_share_one_call():
+    flight = SingleFlight()
+    with StubServer(delay=0.2) as server:
+        apps = WT_Apps(url=server.url, singleflight=flight)
+        server.reset()
+        results = _together(8, lambda: apps.getAncestors("Stub-9", depth=3))
+        assert server.counts["getAncestors"] == 1
+        assert all(r is results[0] for r in results)
+        assert flight.coalesced == 7 and flight.in_flight == 0
+
+        # different requests are not coalesced
+        _together(4, lambda: apps.getAncestors("Stub-9", 2))
+        assert server.counts["getAncestors"] == 2
+
+        # nor are requests which are no longer in flight
+        apps.getAncestors("Stub-9", 3)
+        assert server.counts["getAncestors"] == 3
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    with StubServer(delay=0.2) as server:
+        apps = WT_Apps(url=server.url, singleflight=flight)
+        server.failures = [503]
+        results = _together(4, lambda: apps.getPerson("Stub-1"))
+        assert all(isinstance(r, requests.HTTPError) for r in results)
+        assert server.counts["getPerson"] == 1
+
+
+def test_interrupts_are_shared():
+    flight = SingleFlight()
+    started = threading.Event()
+    outcome = []
+
+    def interrupted():
+        started.set()
+        time.sleep(0.2)
+        raise KeyboardInterrupt()
+
+    def waiter():
+        started.wait()
+        try:
+            outcome.append(flight.do("key", lambda: "not called"))
+        except BaseException as e:
+            outcome.append(e)
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    with pytest.raises(KeyboardInterrupt):
+        flight.do("key", interrupted)
+    t.join()
+    assert isinstance(outcome[0], KeyboardInterrupt)
+    assert flight.coalesced == 1 and flight.in_flight == 0
@@ -0,0 +1,126 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the streaming WikiTree apps response parser
+
+from __future__ import print_function, unicode_literals
+
+import json
+
+import pytest
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS, to_xml
+from wt_apps import WT_Apps
+from wt_result import Result, ResultDecoder
+from wt_stream import RecordStream, XMLRecordStream, xml_loads
+
+
+def chunked(body, size):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_record_stream_chunks(size):
+    people = [{"Id": i, "Name": "Brontë-%d" % (i,), "Touched": 20170211033528 + i} for i in range(50)]
+    body = [{"watchlist": people, "watchlistCount": 12345, "status": 0},
+            {"status": 0, "items": [], "user_name": "Émile"}]
+    stream = RecordStream(chunked(body, size))
+    assert list(stream) == people
+    assert stream.meta == [{"watchlist": 50, "watchlistCount": 12345, "status": 0},
+                           {"status": 0, "items": 0, "user_name": "Émile"}]
+    assert stream.records == 50
+
+    stream = RecordStream(chunked({"login": {"result": "Success"}}, size))
+    assert list(stream) == [] and stream.meta == [{"login": {"result": "Success"}}]
+
+
+def test_record_stream_invalid():
+    with pytest.raises(ValueError):
+        list(RecordStream([b'[{"ancestors": [{"Id": 1}, {"Id": ']))
+    with pytest.raises(ValueError):
+        list(RecordStream([b'{"a" 1}']))
+
+
+def test_stream_methods():
+    with StubServer(StubTree(8, 64)) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        apps._stream_chunk_size = 1000
+
+        expected = apps.getAncestors("Stub-1", 6).json()[0]["ancestors"]
+        stream = apps.streamAncestors("Stub-1", 6)
+        assert list(stream) == expected
+        assert stream.meta[0]["status"] == 0
+
+        stream = apps.streamWatchlist(limit=300, getPerson=1)
+        assert [e["Id"] for e in stream] == list(range(1, 301))
+        assert stream.meta[0]["watchlistCount"] == 512
+
+        keys = ["Stub-%d" % (i,) for i in range(1, 151)]
+        with apps.streamRelatives(keys, getParents=True) as stream:
+            first = next(stream)
+        assert first["key"] == "Stub-1" and "Parents" in first["person"]
+        assert server.counts["getRelatives"] == 1
+
+        # the connection was released, and is reused
+        assert apps.getPerson("Stub-2").json()[0]["person"]["Id"] == 2
+
+
+@pytest.mark.parametrize("size", [1, 100, 65536])
+def test_xml_record_stream(size):
+    people = [{"Id": i, "Name": "Brontë-%d" % (i,), "Photo": None, "IsLiving": i % 2 == 0,
+               "Parents": {"%d" % (i + 1,): {"Id": i + 1, "Name": "<&>"}}, "Score": 0.5, "Nicknames": ""}
+              for i in range(20)]
+    body = [{"ancestors": people, "status": 0, "user_name": "Stub-1"}, {"items": [], "status": "Illegal"}]
+    data = to_xml(body)
+    assert xml_loads(data) == body
+    stream = XMLRecordStream([data[i:i + size] for i in range(0, len(data), size)])
+    assert list(stream) == people
+    assert stream.meta == [{"ancestors": 20, "status": 0, "user_name": "Stub-1"},
+                           {"items": 0, "status": "Illegal"}]
+
+    stream = XMLRecordStream([to_xml({"login": {"result": "Success"}})])
+    assert list(stream) == [] and stream.meta == [{"login": {"result": "Success"}}]
+
+
+def test_xml_untyped():
+    people = [{"Id": i, "Name": "Brontë-%d" % (i,), "Photo": None, "IsLiving": i % 2 == 0,
+               "Parents": {"%d" % (i + 1,): {"Id": i + 1, "Name": "<&>"}}, "Spouses": [{"Id": 7}, {"Id": 8}]}
+              for i in range(5)]
+    body = [{"ancestors": people, "status": 0}, {"items": [], "status": "Illegal"}]
+    data = to_xml(body, typed=False)
+    assert b"type=" not in data
+
+    # the structure is restored, the values are strings
+    strings = [{"Id": "%d" % (i,), "Name": "Brontë-%d" % (i,), "Photo": "", "IsLiving": ("false", "true")[i % 2 == 0],
+                "Parents": {"%d" % (i + 1,): {"Id": "%d" % (i + 1,), "Name": "<&>"}}, "Spouses": [{"Id": "7"}, {"Id": "8"}]}
+               for i in range(5)]
+    assert xml_loads(data) == [{"ancestors": strings, "status": "0"}, {"items": "", "status": "Illegal"}]
+    stream = XMLRecordStream([data[i:i + 100] for i in range(0, len(data), 100)])
+    assert list(stream) == strings
+    assert stream.meta == [{"ancestors": 5, "status": "0"}, {"items": 0, "status": "Illegal"}]
+
+    stream = XMLRecordStream([to_xml({"login": {"result": "Success"}}, typed=False)])
+    assert list(stream) == [] and stream.meta == [{"login": {"result": "Success"}}]
+
+
+def test_xml_same_as_json():
+    with StubServer(StubTree(6, 32)) as server:
+        apps = WT_Apps(url=server.url)
+        xml_apps = WT_Apps(url=server.url, default_format="xmlfm")
+        for a in (apps, xml_apps):
+            a.login(STUB_USER, STUB_PASS)
+
+        assert list(xml_apps.streamAncestors("Stub-3", 4)) == apps.getAncestors("Stub-3", 4).json()[0]["ancestors"]
+        stream = xml_apps.streamWatchlist(limit=50, getPerson=1)
+        assert list(stream) == list(apps.streamWatchlist(limit=50, getPerson=1))
+        assert stream.meta[0]["watchlistCount"] == 192
+        keys = ["Stub-%d" % (i,) for i in range(1, 40)]
+        expected = apps.getRelatives(keys, getParents=True, getChildren=True).json()
+        assert list(xml_apps.streamRelatives(keys, getParents=True, getChildren=True)) == expected[0]["items"]
+
+        xml_apps = WT_Apps(url=server.url, default_format="xmlfm", decoder=ResultDecoder("xml"))
+        assert xml_apps.login(STUB_USER, STUB_PASS).json()["login"]["result"] == "Success"
+        r = xml_apps.getPerson("Stub-9", "*")
+        assert isinstance(r, Result) and r.json() == apps.getPerson("Stub-9", "*").json()
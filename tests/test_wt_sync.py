@@ -0,0 +1,72 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+# test the WikiTree watchlist sync against the local stub server
+
+from __future__ import print_function, unicode_literals
+
+import json
+
+from stub_server import StubServer, StubTree, STUB_USER, STUB_PASS
+from wt_apps import WT_Apps
+from wt_sync import WatchlistSync
+
+
+def test_sync_yields_only_changes(tmp_path):
+    path = str(tmp_path / "sync.json")
+    with StubServer(StubTree(4, 16)) as server:
+        apps = WT_Apps(url=server.url)
+        apps.login(STUB_USER, STUB_PASS)
+        sync = WatchlistSync(apps, path, page_size=10)
+
+        # first sync: the whole watchlist
+        server.reset()
+        assert len(list(sync.changes())) == 64
+        assert server.counts["getWatchlist"] == 7
+        assert sync.mark() == server.tree.touched(1)
+
+        # nothing changed: stop on the first page
+        server.reset()
+        assert list(sync.changes()) == []
+        assert server.counts["getWatchlist"] == 1
+
+        for pid in (5, 40, 63):
+            server.tree.touch(pid)
+        server.reset()
+        assert sorted(e["Id"] for e in sync.changes()) == [5, 40, 63]
+        assert server.counts["getWatchlist"] == 1
+        assert sync.mark() == server.tree.touched(63)
+        with open(path) as f:
+            assert list(json.load(f)) == [STUB_USER]
+
+
+def test_sync_interrupted_and_same_second(tmp_path):
+    path = str(tmp_path / "sync.json")
+    with StubServer(StubTree(4, 16)) as server:
+        apps = WT_Apps(url=server.url)
+        sync = WatchlistSync(apps, path, page_size=10)
+        list(sync.changes())
+        assert sync.user == "anonymous"
+
+        server.tree.touch(9)
+        changes = sync.changes()
+        assert next(changes)["Id"] == 9
+        changes.close()  # interrupted: the mark is not advanced
+        assert [e["Id"] for e in sync.changes()] == [9]
+
+        # a profile touched in the same second as the mark
+        server.tree._touched[10] = server.tree._touched[9]
+        assert [e["Id"] for e in sync.changes()] == [10]
+        assert list(sync.changes()) == []
+
+
+def test_sync_ascending_order(tmp_path):
+    path = str(tmp_path / "sync.json")
+    with StubServer(StubTree(4, 16)) as server:
+        apps = WT_Apps(url=server.url)
+        sync = WatchlistSync(apps, path, page_size=10, descending=False)
+        list(sync.changes())
+        server.tree.touch(12)
+        server.reset()
+        assert [e["Id"] for e in sync.changes()] == [12]
+        assert server.counts["getWatchlist"] == 7  # whole list walked
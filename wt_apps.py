@@ -22,10 +22,32 @@ from __future__ import print_function, unicode_literals
 
 __version__ = "0.1.3"
 
+import functools
+import json
 import logging
+import os
 import pprint
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from simplejson.scanner import JSONDecodeError
+from requests.packages.urllib3.connection import HTTPConnection
+
+from wt_result import Result
+from wt_stream import RecordStream, XMLRecordStream, xml_loads
+
+try:  # for Python 3.7+
+    import contextvars
+except ImportError:
+    contextvars = None
+
+try:  # requests 2.27+ wraps the error of the JSON library it uses
+    from requests.exceptions import JSONDecodeError
+except ImportError:
+    JSONDecodeError = ValueError
 
 # Enabling debugging at http.client level (requests->urllib3->http.client)
 # you will see the REQUEST, including HEADERS and DATA, and RESPONSE with HEADERS but without DATA.
@@ -45,9 +67,52 @@ logging.basicConfig()
 
 _pp = pprint.PrettyPrinter(indent=2, width=120, depth=4)
 
+# the errors after which a chunk of a large request is retried
+_retried = (requests.HTTPError, requests.ConnectionError, requests.Timeout)
+
+
+def _submit(pool, func, *args):
+    """_submit() submits func(*args) to a thread pool, in a copy of
+    the calling thread's context, so that cache bypass and rate
+    limiter priority classes apply to it as well.
+    """
+
+    if contextvars is not None:
+        return pool.submit(contextvars.copy_context().run, func, *args)
+
+    return pool.submit(func, *args)
+
+
+class _PoolAdapter(requests.adapters.HTTPAdapter):
+    """_PoolAdapter is an HTTPAdapter which can enable TCP keep-alive
+    probes, so idle pooled connections are not silently dropped.
+    """
+
+    __attrs__ = requests.adapters.HTTPAdapter.__attrs__ + ["_keep_alive"]
+
+    def __init__(self, keep_alive=True, **kwargs):
+        self._keep_alive = keep_alive
+        super(_PoolAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._keep_alive:
+            kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super(_PoolAdapter, self).init_poolmanager(*args, **kwargs)
+
 
 class WT_Apps(object):
     """WikiTree Apps interface
+
+    A WT_Apps instance may be shared by many threads.
+    getHelp(), getPerson(), getPrivacyLevels(), getBio(),
+    getWatchlist(), getProfile(), getAncestors(), getRelatives(),
+    getTouched() and getPersonFSConnections() are safe to call
+    concurrently. They share one session, whose connections are
+    kept alive and reused from a pool of pool_size connections.
+    login() and logout() change the session seen by every thread,
+    so call them while no other requests are in flight.
     """
 
     _url = "https://api.wikitree.com/api.php"
@@ -55,11 +120,38 @@ class WT_Apps(object):
     _format = _default_format
     _session = None
     _verbosity = 0
+    _cache = None
+    _singleflight = None
+    _scheduler = None
+    _rate_limiter = None
+    _identity = None
+    _chunk_size = 100
+    _max_workers = 4
+    _chunk_retries = 2
+    _chunk_backoff = 0.5
+    _pool_size = 10
+    _pool_block = False
+    _keep_alive = True
+    _decoder = None
 
     # class members
     __privacy_init = False
     __Privacy2Levels = {}
     __Levels2Privacy = {}
+    _privacy_cache = None
+    _privacy_lock = threading.RLock()
+
+    # the privacy levels returned by getPrivacyLevels,
+    # used until they are refreshed from the API
+    _default_privacy_levels = {
+        'OPEN': 60,
+        'PRIVATE': 20,
+        'PUBLIC': 50,
+        'SEMIPRIVATE_BIO': 30,
+        'SEMIPRIVATE_BIOTREE': 40,
+        'SEMIPRIVATE_TREE': 35,
+        'UNLISTED': 10,
+    }
 
     @classmethod
     def Privacy2Level(cls, privacy):
@@ -68,7 +160,7 @@ class WT_Apps(object):
         """
 
         if not cls.__privacy_init:
-            raise RuntimeError("Privacy data not initialized.")
+            cls._init_privacy()
 
         return cls.__Privacy2Levels.get(privacy, 0)
 
@@ -79,20 +171,102 @@ class WT_Apps(object):
         """
 
         if not cls.__privacy_init:
-            raise RuntimeError("Privacy data not initialized.")
+            cls._init_privacy()
 
         return cls.__Levels2Privacy.get(level, "No description")
 
+    @classmethod
+    def setPrivacyCache(cls, path):
+        """setPrivacyCache() sets the path of the JSON file holding a
+        copy of the privacy levels, which Privacy2Level() and
+        Level2Privacy() read lazily, and which refreshPrivacyLevels()
+        writes, unless the instance has a privacy_cache of its own.
+        The privacy levels are read from it on their next use.
+        Without it, bundled default privacy levels are used.
+        """
+
+        with cls._privacy_lock:
+            cls._privacy_cache = path
+            cls.__privacy_init = False
+
+    @classmethod
+    def _init_privacy(cls):
+        """_init_privacy() is a private method to load the privacy
+        levels used by Privacy2Level() and Level2Privacy(), without
+        any network request. They are read from the privacy cache
+        file, if there is one, otherwise the bundled defaults are used.
+        """
+
+        with cls._privacy_lock:
+            if cls.__privacy_init:
+                return
+
+            levels = None
+            path = cls._privacy_cache
+            if path and os.path.exists(path):
+                try:
+                    with open(path) as f:
+                        levels = json.load(f)
+                except (IOError, ValueError) as e:
+                    print("WARNING: privacy cache ignored:", e)
+
+            cls._set_privacy_levels(levels or cls._default_privacy_levels)
+
+    @classmethod
+    def _set_privacy_levels(cls, levels):
+        """_set_privacy_levels() is a private method to install
+        a dict of privacy level names and numbers.
+        """
+
+        # make sure to work with class data, not instance data
+        with cls._privacy_lock:
+            cls.__Privacy2Levels = dict(levels)
+            cls.__Levels2Privacy = {v: k for k, v in cls.__Privacy2Levels.items()}
+            cls.__privacy_init = True
+
     __formats = ("json", "xmlfm")
 
-    def __init__(self, url=None, default_format=None, verbosity=0):
+    def __init__(self, url=None, default_format=None, verbosity=0, cache=None, singleflight=None,
+                 chunk_size=None, max_workers=None, pool_size=None, pool_block=None, keep_alive=None,
+                 scheduler=None, rate_limiter=None, privacy_cache=None, decoder=None):
         """__init__() initializes a WikiTree Apps interface instance.
         You may override the default WikiTree Apps URL.
         You can specify the default data format to be returned,
         either "json" or "xmlfm". "json" is the default.
         You can adjust the verbosity, default is 0.
+        You can provide a response cache, such as a
+        wt_cache.ResponseCache, default is no caching.
+        You can provide a wt_singleflight.SingleFlight, so that
+        identical concurrent requests share one network call.
+        chunk_size is the maximum number of keys sent in one
+        getRelatives request, default is 100, and max_workers is the
+        number of chunks requested concurrently, default is 4.
+        pool_size is the number of connections kept in the session
+        connection pool, default is 10. Size it to the number of
+        threads sharing the instance. When pool_block is True,
+        threads wait for a pooled connection instead of opening extra
+        connections which are discarded after use, default is False.
+        keep_alive enables HTTP and TCP keep-alive, default is True.
+        You can provide a wt_scheduler.RequestScheduler, to retry
+        failed requests, adapt the number of concurrent requests,
+        and stop requesting while the API is unhealthy.
+        You can provide a wt_ratelimit.RateLimiter, to limit the
+        request rate, serving waiting requests by priority class.
+        privacy_cache is the path of a JSON file, where
+        refreshPrivacyLevels() of this instance saves the privacy
+        levels, default is the file set by setPrivacyCache(), which
+        Privacy2Level() and Level2Privacy() read, as they are shared
+        by every instance.
+        You can provide a wt_result.ResultDecoder, so that the API
+        methods decode each response once, and return a
+        wt_result.Result instead of the requests.Response. The
+        decoder must support the format; ResultDecoder("xml")
+        decodes the xmlfm format.
+        Construction makes no network request.
         """
 
+        self._session_lock = threading.Lock()
+
         if url:
             self._url = url
 
@@ -106,10 +280,50 @@ class WT_Apps(object):
         if verbosity:
             self._verbosity = int(verbosity)
 
+        if cache is not None:
+            self._cache = cache
+
+        if singleflight is not None:
+            self._singleflight = singleflight
+
+        if chunk_size:
+            self._chunk_size = int(chunk_size)
+
+        if max_workers:
+            self._max_workers = int(max_workers)
+
+        if pool_size:
+            self._pool_size = int(pool_size)
+
+        if pool_block is not None:
+            self._pool_block = bool(pool_block)
+
+        if keep_alive is not None:
+            self._keep_alive = bool(keep_alive)
+
+        if scheduler is not None:
+            self._scheduler = scheduler
+
+        if rate_limiter is not None:
+            self._rate_limiter = rate_limiter
+
+        if decoder is not None:
+            if self._format not in getattr(decoder, "formats", ("json",)):
+                raise ValueError("decoder does not support the format: " + repr(self._format))
+            self._decoder = decoder
+
+        if privacy_cache is not None:
+            self._privacy_cache = privacy_cache
+
         self._init_session()
 
-        if not type(self).__privacy_init:
-            self.getPrivacyLevels(_initialize=True)
+    @property
+    def identity(self):
+        """identity is the email address used to log in,
+        or None for an anonymous guest.
+        """
+
+        return self._identity
 
     def _init_session(self):
         """_init_session() is a private method to perfom command
@@ -119,7 +333,7 @@ class WT_Apps(object):
         performed on this session.
         """
 
-        s = self._session = requests.Session()
+        s = requests.Session()
 
         s.headers['Accept-charset'] = "utf-8"
 
@@ -131,11 +345,63 @@ class WT_Apps(object):
         else:
             raise ValueError("Invalid format: " + repr(self._format))
 
+        if not self._keep_alive:
+            s.headers['Connection'] = "close"
+
+        adapter = _PoolAdapter(keep_alive=self._keep_alive, pool_connections=1,
+                               pool_maxsize=self._pool_size, pool_block=self._pool_block)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+
+        # publish the session only once it is fully configured
+        self._session = s
+
+    def _get_session(self):
+        """_get_session() is a private method which returns the
+        session, creating it if there is none. Only one thread
+        creates the session.
+        """
+
+        s = self._session
+        if s is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._init_session()
+                s = self._session
+        return s
+
+    def _load_privacy_levels(self, r):
+        """_load_privacy_levels() is a private method to install
+        the privacy levels from a JSON getPrivacyLevels response,
+        and save them in the privacy cache file, if there is one.
+        """
+
+        try:
+            levels = r.json()[0].copy()
+        except JSONDecodeError as e:
+            print("Exception(ignored):", e)
+            return
+        except Exception as e:
+            print("Exception:", e)
+            raise
+
+        type(self)._set_privacy_levels(levels)
+
+        path = self._privacy_cache
+        if path:
+            try:
+                with open(path, "w") as f:
+                    json.dump(levels, f, indent=2, sort_keys=True)
+            except IOError as e:
+                print("WARNING: privacy cache not written:", e)
+
     def _req(self, data, headers={}):
         """_req() is a private method to perform the
         https request to the WikiTree Apps API.
-        It constructs and posts the request,
-        and checks the status of the result.
+        It returns the cached response when there is one,
+        otherwise it posts the request and caches the result.
+        Identical requests in flight at the same time share one post
+        when single flight is enabled.
         """
 
         if self._verbosity > 1:
@@ -143,10 +409,83 @@ class WT_Apps(object):
             print("data:", end=' ')
             _pp.pprint(data)
 
-        if self._session is None:
-            self._init_session()
+        cache = self._cache
+        key = None if cache is None else cache.key(data, self._identity)
+
+        if key is not None:
+            r = cache.get(key)
+
+            if r is None and hasattr(cache, "revalidate"):
+                r = cache.revalidate(key, self._touched)
+
+            if r is not None:
+                return self._result(r, data)
+
+        flight = self._singleflight
+        flight_key = None if flight is None else flight.key(data, self._identity)
+
+        if flight_key is None:
+            return self._fetch(data, headers, key)
+
+        return flight.do(flight_key, self._fetch, data, headers, key)
+
+    def _result(self, r, data):
+        """_result() is a private method to decode the response,
+        when there is a result decoder, unless it is a Result already.
+        """
+
+        decoder = self._decoder
+        if decoder is None or isinstance(r, Result):
+            return r
+
+        return decoder.result(r, data.get("action"))
+
+    def _fetch(self, data, headers, key):
+        """_fetch() is a private method to post the request, decode
+        it once, when there is a result decoder, and cache the result
+        under key, unless key is None. The cache and the single flight
+        waiters share the Result.
+        """
+
+        r = self._post(data, headers)
+        result = self._result(r, data)
+
+        if key is not None:
+            self._cache.put(key, r, None if result is r else result)
 
-        r = self._session.post(self._url, data=data)
+        return result
+
+    def _post(self, data, headers={}, stream=False):
+        """_post() is a private method to post the request
+        to the WikiTree Apps API, and check the status of the result.
+        The request is run by the scheduler, if there is one.
+        When stream is True, the body is not read.
+        """
+
+        scheduler = self._scheduler
+        if scheduler is not None:
+            # the rate limiter wait is not part of the request latency
+            return scheduler.call(data.get("action"), self._send, data, stream,
+                                  wait=functools.partial(self._throttle, data))
+
+        self._throttle(data)
+
+        return self._send(data, stream)
+
+    def _throttle(self, data):
+        """_throttle() is a private method which waits until the rate
+        limiter, if there is one, allows the request.
+        """
+
+        limiter = self._rate_limiter
+        if limiter is not None:
+            limiter.acquire(limiter.priority_for(data.get("action")))
+
+    def _send(self, data, stream=False):
+        """_send() is a private method to send one request.
+        """
+
+        r = self._get_session().post(self._url, data=data, stream=stream)
 
         if r.status_code != requests.codes.ok:
             print("url:", self._url)
@@ -156,6 +495,26 @@ class WT_Apps(object):
 
         return r
 
+    _stream_chunk_size = 65536
+
+    def _stream(self, data):
+        """_stream() is a private method to post a request, and
+        return a RecordStream over its body, which is read as the
+        records are consumed. Streamed requests are not cached.
+        """
+
+        if self._verbosity > 1:
+            print("url:", self._url)
+            print("data:", end=' ')
+            _pp.pprint(data)
+
+        r = self._post(data, stream=True)
+
+        if self._format == "xmlfm":
+            return XMLRecordStream(r.iter_content(self._stream_chunk_size), r)
+
+        return RecordStream(r.iter_content(self._stream_chunk_size), r)
+
     def getHelp(self):
         """getHelp()
         """
@@ -176,6 +535,27 @@ class WT_Apps(object):
 
         r = self._req(data)
 
+        return self._logged_in(email, r)
+
+    def _logged_in(self, email, r):
+        """_logged_in() is a private method to record the identity
+        of the logged in user, which partitions cached responses.
+        A response which cannot be decoded, such as an error page,
+        is a failed login. It returns the login response.
+        """
+
+        try:
+            try:
+                j = r.json()
+            except JSONDecodeError:
+                # an xmlfm response, without a result decoder;
+                # ElementTree.ParseError is a SyntaxError
+                j = xml_loads(r.content)
+            if j["login"]["result"] == "Success":
+                self._identity = email
+        except (SyntaxError, ValueError, KeyError, TypeError):
+            print("WARNING: login response not understood, not logged in")
+
         return r
 
     def logout(self):
@@ -187,7 +567,9 @@ class WT_Apps(object):
         login credentials. You will be an anonymous guest.
         """
 
-        self._session = None
+        with self._session_lock:
+            self._session = None
+            self._identity = None
 
     def getPerson(self, key, fields=None):
         """getPerson() gets a person from the WikiTree api.
@@ -208,14 +590,14 @@ class WT_Apps(object):
     def getPrivacyLevels(self, _initialize=False, **kwargs):
         """getPrivacyLevels() retrieves the name and number of the
         WikiTree privacy levels.
-        The _initialize parameter is used during class instance
-        initialization to retrieve privacy levels used by the
-        Privacy2Level() and Level2Privacy() class methods.
+        When the _initialize parameter is True, the privacy levels
+        used by the Privacy2Level() and Level2Privacy() class methods
+        are replaced by the retrieved ones.
         """
 
         data = {"action": "getPrivacyLevels", "format": self._format}
 
-        for k, v in kwargs:
+        for k, v in list(kwargs.items()):
             if k not in self.__privacyLevelsOptions:
                 print("WARNING: invalid parameter to getPrivacyLevels:", repr(k))
                 del kwargs[k]
@@ -229,19 +611,22 @@ class WT_Apps(object):
         r = self._req(data)
 
         if _initialize:
-            try:
-                # make sure to work with class data, not instance data
-                type(self).__Privacy2Levels = {}
-                type(self).__Levels2Privacy = ()
-                j = r.json()
-                type(self).__Privacy2Levels = j[0].copy()
-                type(self).__Levels2Privacy = {v: k for k, v in type(self).__Privacy2Levels.items()}
-                type(self).__privacy_init = True
-            except JSONDecodeError as e:
-                print("Exception(ignored):", e)
-            except Exception as e:
-                print("Exception:", e)
-                raise
+            self._load_privacy_levels(r)
+
+        return r
+
+    def refreshPrivacyLevels(self):
+        """refreshPrivacyLevels() retrieves the privacy levels from the
+        API, bypassing any cache, and installs them for the
+        Privacy2Level() and Level2Privacy() class methods.
+        They are saved in the privacy cache file, if there is one.
+        """
+
+        data = {"action": "getPrivacyLevels", "format": "json"}
+
+        r = self._post(data)
+
+        self._load_privacy_levels(r)
 
         return r
 
@@ -253,7 +638,7 @@ class WT_Apps(object):
 
         data = {"action": "getBio", "format": self._format, "key": key}
 
-        for k, v in kwargs:
+        for k, v in list(kwargs.items()):
             if k not in self.__bioOptions:
                 print("WARNING: invalid paramter to getBio:", repr(k))
                 del kwargs[k]
@@ -283,6 +668,27 @@ class WT_Apps(object):
         the watchlist, order it, and page through it.
         """
 
+        data = self._watchlistData(kwargs)
+
+        r = self._req(data)
+
+        return r
+
+    def streamWatchlist(self, **kwargs):
+        """streamWatchlist() returns a wt_stream.RecordStream, which
+        yields the entries of one getWatchlist request one at a time,
+        as the response body is read, so a large limit does not need
+        a large amount of memory.
+        The watchlistCount is in the meta of the stream.
+        """
+
+        return self._stream(self._watchlistData(kwargs))
+
+    def _watchlistData(self, kwargs):
+        """_watchlistData() is a private method to validate the
+        getWatchlist parameters, and return the request data.
+        """
+
         data = {"action": "getWatchlist", "format": self._format}
 
         for k, v in list(kwargs.items()):
@@ -302,9 +708,77 @@ class WT_Apps(object):
         if len(kwargs) > 0:
             data.update(kwargs)
 
-        r = self._req(data)
+        return data
 
-        return r
+    def _watchlistPages(self, page_size, kwargs):
+        """_watchlistPages() is a private method to validate the
+        iterWatchlist parameters. It returns the request data for
+        the page at offset 0, and the offset of the first page.
+        """
+
+        if self._format != "json":
+            raise ValueError("iterWatchlist() requires the json format")
+
+        if page_size < 1:
+            raise ValueError("Invalid page_size: " + repr(page_size))
+
+        kwargs = dict(kwargs)
+        kwargs.pop("limit", None)
+        offset = int(kwargs.pop("offset", 0) or 0)
+
+        data = self._watchlistData(kwargs)
+        data["limit"] = page_size
+
+        return data, offset
+
+    def _watchlistPage(self, r):
+        """_watchlistPage() is a private method which returns the
+        entries of a watchlist page, and the watchlist size.
+        """
+
+        j = r.json()[0]
+
+        return j.get("watchlist") or [], j.get("watchlistCount")
+
+    def iterWatchlist(self, page_size=100, prefetch=2, **kwargs):
+        """iterWatchlist() is a generator which yields the entries
+        of your WikiTree watchlist, across all of its pages.
+        The options are those of getWatchlist(), except limit;
+        offset is the offset of the first entry.
+        Up to prefetch pages of page_size entries are requested in
+        the background while the current page is processed, so
+        memory use is bounded whatever the size of the watchlist.
+        """
+
+        data, offset = self._watchlistPages(page_size, kwargs)
+        prefetch = max(1, int(prefetch))
+
+        def page(offset):
+            d = dict(data)
+            d["offset"] = offset
+            return self._watchlistPage(self._req(d))
+
+        pool = ThreadPoolExecutor(max_workers=prefetch)
+        pages = deque()
+        total = None
+        try:
+            while True:
+                while len(pages) < prefetch and (total is None or offset < total):
+                    pages.append(_submit(pool, page, offset))
+                    offset += page_size
+                if not pages:
+                    return
+                entries, count = pages.popleft().result()
+                if count is not None:
+                    total = count
+                for entry in entries:
+                    yield entry
+                if len(entries) < page_size:
+                    return
+        finally:
+            for f in pages:
+                f.cancel()
+            pool.shutdown(wait=False)
 
     def getProfile(self, key):
         """getProfile() retrieves a WikiTree profile.
@@ -324,6 +798,17 @@ class WT_Apps(object):
         Default depth is 5.
         """
 
+        data = self._ancestorsData(key, depth)
+
+        r = self._req(data)
+
+        return r
+
+    def _ancestorsData(self, key, depth):
+        """_ancestorsData() is a private method to return
+        the getAncestors request data.
+        """
+
         data = {"action": "getAncestors", "format": self._format, "key": key, "depth": 5}
 
         if depth:
@@ -332,23 +817,60 @@ class WT_Apps(object):
         # fields is not recognized for ancestors
         # data["fields"] = "Name,LongName"
 
-        r = self._req(data)
+        return data
 
-        return r
+    def streamAncestors(self, key, depth=None):
+        """streamAncestors() returns a wt_stream.RecordStream, which
+        yields the ancestors of a WikiTree person one at a time, as
+        the response body is read, so memory use stays low however
+        large the response is.
+        """
+
+        return self._stream(self._ancestorsData(key, depth))
 
     __relativeChoices = ('getParents', 'getSpouses', 'getSiblings', 'getChildren',)
 
     def getRelatives(self, keys, **kwargs):
         """getRelatives() retrieves the relatives of a WikiTree person.
+        When there are more than chunk_size keys, and the format is
+        "json", the keys are split into chunks which are requested
+        concurrently, and retried separately on failure. The items of
+        the chunks are merged, in the order of the keys, into one
+        response.
+        """
+
+        keys, data = self._relativesData(keys, kwargs)
+
+        if len(keys) <= self._chunk_size or self._format != "json":
+            r = self._req(data)
+            return r
+
+        chunks = []
+        for i in range(0, len(keys), self._chunk_size):
+            chunk = dict(data)
+            chunk["keys"] = ",".join(keys[i:i + self._chunk_size])
+            chunks.append(chunk)
+
+        r = self._req_chunks(chunks, keys)
+
+        return r
+
+    def _relativesData(self, keys, kwargs):
+        """_relativesData() is a private method to validate the
+        getRelatives parameters. It returns the list of keys,
+        and the request data.
         """
 
         # for ease of use, convert a single key into a list of keys
         if not isinstance(keys, (list, tuple, set, frozenset,)):
             keys = [keys]
 
-        data = {"action": "getRelatives", "format": self._format, "keys": keys}
+        keys = ["%s" % (k,) for k in keys]
 
-        for k in kwargs.keys():
+        # the API expects a comma separated list of keys
+        data = {"action": "getRelatives", "format": self._format, "keys": ",".join(keys)}
+
+        for k in list(kwargs.keys()):
             if k not in self.__relativeChoices:
                 print("WARNING: invalid parameter to getRelatives:", k)
                 del kwargs[k]
@@ -358,9 +880,117 @@ class WT_Apps(object):
         if len(kwargs) > 0:
             data.update(kwargs)
 
-        r = self._req(data)
+        return keys, data
 
-        return r
+    def streamRelatives(self, keys, **kwargs):
+        """streamRelatives() returns a wt_stream.RecordStream, which
+        yields the items of a getRelatives request one at a time,
+        as the response body is read. All keys are sent in one
+        request.
+        """
+
+        keys, data = self._relativesData(keys, kwargs)
+
+        return self._stream(data)
+
+    def _req_chunks(self, chunks, keys):
+        """_req_chunks() is a private method to request the chunks
+        of a large getRelatives request concurrently, and merge them.
+        """
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            rs = [f.result() for f in [_submit(pool, self._req_retry, chunk) for chunk in chunks]]
+
+        return self._merge_items(rs, keys)
+
+    def _req_retry(self, data):
+        """_req_retry() is a private method to perform a request,
+        retrying with exponential backoff on failure.
+        """
+
+        attempt = 0
+        while True:
+            try:
+                return self._req(data)
+            except _retried as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def _retry_delay(self, attempt, e):
+        """_retry_delay() is a private method which returns the
+        seconds to wait before retrying a chunk whose attempt failed
+        with the error e, or None when it must not be retried.
+        """
+
+        if attempt >= self._chunk_retries:
+            return None
+
+        print("WARNING: retrying chunk after error:", e)
+
+        return self._chunk_backoff * 2 ** attempt
+
+    def _merge_items(self, rs, keys):
+        """_merge_items() is a private method to merge the items of
+        several getRelatives responses into one response, with the
+        items in the order of keys.
+        """
+
+        order = {}
+        for i, k in enumerate(keys):
+            order.setdefault(k, i)
+
+        items = []
+        for r in rs:
+            for j in r.json():
+                items.extend(j.get("items") or [])
+        items.sort(key=lambda item: order.get("%s" % (item.get("key"),), len(keys)))
+
+        if self._decoder is not None:
+            return self._decoder.combine(rs, [{"items": items, "status": 0}])
+
+        merged = requests.models.Response()
+        merged.status_code = requests.codes.ok
+        merged.url = rs[0].url
+        merged.encoding = "utf-8"
+        merged.headers = requests.structures.CaseInsensitiveDict(rs[0].headers)
+        merged.headers.pop("Content-Length", None)
+        merged.elapsed = max(r.elapsed for r in rs)
+        merged._content = json.dumps([{"items": items, "status": 0}]).encode("utf-8")
+
+        return merged
+
+    def getTouched(self, keys):
+        """getTouched() retrieves the Touched timestamps of one or
+        more WikiTree profiles, using a single request which
+        bypasses any cache.
+        Returns a dict mapping each profile Id to its Touched timestamp.
+        """
+
+        return self._touched(keys)
+
+    def _touched(self, keys):
+        """_touched() is a private method to retrieve Touched
+        timestamps. See getTouched().
+        """
+
+        if not isinstance(keys, (list, tuple, set, frozenset,)):
+            keys = [keys]
+
+        data = {"action": "getRelatives", "format": "json", "keys": ",".join("%s" % (k,) for k in keys)}
+
+        r = self._post(data)
+
+        touched = {}
+        for j in r.json():
+            for item in j.get("items") or []:
+                person = item.get("person") or {}
+                if "Id" in person:
+                    touched[person["Id"]] = person.get("Touched")
+
+        return touched
 
     def getPersonFSConnections(self, key):
         """getPersonFSConnections() retrieves the links between
@@ -0,0 +1,332 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_async.py provides an asyncio interface to the WikiTree APPS API.
+
+This module requires Python 3.7 or later.
+
+AsyncWT_Apps has the same methods as WT_Apps, but each API method
+returns an awaitable instead of blocking on the HTTPS round trip,
+so many requests can be kept in flight from a single process:
+
+    async with AsyncWT_Apps(max_concurrency=20) as apps:
+        rs = await asyncio.gather(*[apps.getPerson(k) for k in keys])
+        async for entry in apps.streamWatchlist(getPerson=1):
+            print(entry["Name"])
+
+The streaming methods return an AsyncRecordStream, whose records are
+read on the worker threads, so the event loop never blocks.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import asyncio
+import contextvars
+import functools
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from wt_apps import WT_Apps, _retried
+
+
+class AsyncRecordStream(object):
+    """AsyncRecordStream is an asynchronous iterator over the records
+    of a wt_stream.RecordStream, whose request is sent, and whose body
+    is read, on the worker threads of an AsyncWT_Apps:
+
+        async for person in apps.streamWatchlist(getPerson=1):
+            print(person["Name"])
+    """
+
+    # the number of records read at a time from the worker threads
+    batch_size = 100
+
+    def __init__(self, apps, open_stream):
+        """__init__() initializes a stream, which calls open_stream()
+        on a worker thread of apps to open the RecordStream.
+        """
+
+        self._apps = apps
+        self._open = open_stream
+        self._stream = None
+        self._records = deque()
+
+    @property
+    def meta(self):
+        """meta is the meta of the RecordStream, see wt_stream.
+        """
+
+        return [] if self._stream is None else self._stream.meta
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._records:
+            if self._stream is None:
+                self._stream = await self._apps._run(self._open)
+            self._records.extend(await self._apps._run(
+                list, itertools.islice(self._stream, self.batch_size)))
+            if not self._records:
+                raise StopAsyncIteration
+        return self._records.popleft()
+
+    async def close(self):
+        """close() stops reading, and releases the connection.
+        """
+
+        if self._stream is not None:
+            self._stream.close()
+        self._records.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncWT_Apps(WT_Apps):
+    """WikiTree Apps asyncio interface
+    """
+
+    _default_concurrency = 10
+
+    def __init__(self, url=None, default_format=None, verbosity=0, max_concurrency=None, **kwargs):
+        """__init__() initializes an asyncio WikiTree Apps interface instance.
+        The url, default_format and verbosity parameters, and the
+        other keyword parameters, are the same as for WT_Apps.
+        max_concurrency is the maximum number of requests in flight
+        at any time, default is 10. All requests share one session,
+        whose connection pool is sized to max_concurrency, so every
+        request in flight reuses a kept-alive connection.
+        """
+
+        if max_concurrency is None:
+            max_concurrency = self._default_concurrency
+        self._max_concurrency = int(max_concurrency)
+        if self._max_concurrency < 1:
+            raise ValueError("Invalid max_concurrency: " + repr(max_concurrency))
+
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._max_in_flight = 0
+
+        kwargs.setdefault("pool_size", self._max_concurrency)
+
+        super(AsyncWT_Apps, self).__init__(url=url, default_format=default_format, verbosity=verbosity, **kwargs)
+
+    @property
+    def max_concurrency(self):
+        """max_concurrency is the maximum number of requests in flight.
+        """
+
+        return self._max_concurrency
+
+    @property
+    def in_flight(self):
+        """in_flight is the number of requests currently in flight.
+        """
+
+        return self._in_flight
+
+    @property
+    def max_in_flight(self):
+        """max_in_flight is the largest number of requests
+        which have been in flight at the same time.
+        """
+
+        return self._max_in_flight
+
+    def _limit(self):
+        """_limit() is a private method returning the semaphore
+        which bounds the number of requests in flight.
+        A semaphore is bound to an event loop, so a new one is
+        created when the instance is used from a different loop.
+        """
+
+        loop = asyncio.get_event_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        """_run() is a private coroutine which runs the blocking
+        func(*args, **kwargs) on the worker thread pool, once a
+        concurrency slot is available, in a copy of the calling
+        task's context, so cache bypass and priority classes apply.
+        """
+
+        loop = asyncio.get_event_loop()
+        ctx = contextvars.copy_context()
+        async with self._limit():
+            with self._lock:
+                self._in_flight += 1
+                self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(ctx.run, func, *args, **kwargs))
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    async def _req(self, data, headers={}):
+        """_req() is a private coroutine to perform the
+        https request to the WikiTree Apps API.
+        See _run().
+        """
+
+        return await self._run(WT_Apps._req, self, data, headers)
+
+    async def _req_chunks(self, chunks, keys):
+        """_req_chunks() is a private coroutine to request the chunks
+        of a large getRelatives request concurrently, and merge them.
+        """
+
+        rs = await asyncio.gather(*[self._req_retry(chunk) for chunk in chunks])
+
+        return self._merge_items(rs, keys)
+
+    async def _req_retry(self, data):
+        """_req_retry() is a private coroutine to perform a request,
+        retrying as WT_Apps._req_retry() does, without blocking the
+        event loop between the attempts.
+        """
+
+        attempt = 0
+        while True:
+            try:
+                return await self._req(data)
+            except _retried as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def streamWatchlist(self, **kwargs):
+        """streamWatchlist() returns an AsyncRecordStream, which
+        yields the entries of one getWatchlist request one at a time.
+        See WT_Apps.streamWatchlist().
+        """
+
+        return AsyncRecordStream(self, functools.partial(WT_Apps.streamWatchlist, self, **kwargs))
+
+    def streamAncestors(self, key, depth=None):
+        """streamAncestors() returns an AsyncRecordStream, which
+        yields the ancestors of a WikiTree person one at a time.
+        See WT_Apps.streamAncestors().
+        """
+
+        return AsyncRecordStream(self, functools.partial(WT_Apps.streamAncestors, self, key, depth))
+
+    def streamRelatives(self, keys, **kwargs):
+        """streamRelatives() returns an AsyncRecordStream, which
+        yields the items of a getRelatives request one at a time.
+        See WT_Apps.streamRelatives().
+        """
+
+        return AsyncRecordStream(self, functools.partial(WT_Apps.streamRelatives, self, keys, **kwargs))
+
+    async def iterWatchlist(self, page_size=100, prefetch=2, **kwargs):
+        """iterWatchlist() is an asynchronous generator which yields
+        the entries of your WikiTree watchlist, across all of its pages.
+        See WT_Apps.iterWatchlist().
+        """
+
+        data, offset = self._watchlistPages(page_size, kwargs)
+        prefetch = max(1, int(prefetch))
+
+        async def page(offset):
+            d = dict(data)
+            d["offset"] = offset
+            return self._watchlistPage(await self._req(d))
+
+        pages = deque()
+        total = None
+        try:
+            while True:
+                while len(pages) < prefetch and (total is None or offset < total):
+                    pages.append(asyncio.ensure_future(page(offset)))
+                    offset += page_size
+                if not pages:
+                    return
+                entries, count = await pages.popleft()
+                if count is not None:
+                    total = count
+                for entry in entries:
+                    yield entry
+                if len(entries) < page_size:
+                    return
+        finally:
+            for f in pages:
+                f.cancel()
+
+    async def getPrivacyLevels(self, _initialize=False, **kwargs):
+        """getPrivacyLevels() retrieves the name and number of the
+        WikiTree privacy levels.
+        See WT_Apps.getPrivacyLevels().
+        """
+
+        if _initialize:
+            kwargs["format"] = "json"  # force JSON request
+
+        r = await super(AsyncWT_Apps, self).getPrivacyLevels(**kwargs)
+
+        if _initialize:
+            self._load_privacy_levels(r)
+
+        return r
+
+    async def _logged_in(self, email, r):
+        """_logged_in() is a private coroutine to record the identity
+        of the logged in user, once the login request completes.
+        """
+
+        return WT_Apps._logged_in(self, email, await r)
+
+    async def refreshPrivacyLevels(self):
+        """refreshPrivacyLevels() retrieves and installs the privacy levels.
+        See WT_Apps.refreshPrivacyLevels().
+        """
+
+        return await self._run(WT_Apps.refreshPrivacyLevels, self)
+
+    async def getTouched(self, keys):
+        """getTouched() retrieves the Touched timestamps of one or
+        more WikiTree profiles.
+        See WT_Apps.getTouched().
+        """
+
+        return await self._run(self._touched, keys)
+
+    async def logout(self):
+        """logout() logs you out of WikiTree.
+        See WT_Apps.logout().
+        """
+
+        super(AsyncWT_Apps, self).logout()
+
+    async def close(self):
+        """close() waits for the requests in flight, then releases
+        the worker threads and the session connections.
+        """
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
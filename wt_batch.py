@@ -0,0 +1,185 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_batch.py provides automatic batching of single person lookups
+to the WikiTree APPS API.
+
+getPerson() and getProfile() take a single key, so looking up
+thousands of people costs thousands of round trips. PersonBatcher
+collects the lookups made by many threads over a short window, and
+sends them as one multi-key getRelatives request:
+
+    batcher = PersonBatcher(apps, window=0.02, max_batch=100)
+    person = batcher.getPerson("Churchill-4")  # from any thread
+    ...
+    print(batcher.stats())
+    batcher.close()
+
+See benchmarks/bench_batch.py for the throughput of batched lookups.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import threading
+import time
+from concurrent.futures import Future
+
+try:  # for Python 3
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class PersonBatcher(object):
+    """PersonBatcher coalesces individual person lookups into
+    multi-key requests, made by a background thread.
+    """
+
+    def __init__(self, apps, window=0.01, max_batch=100):
+        """__init__() initializes a person batcher for a WT_Apps
+        instance.
+        window is the number of seconds to wait for more lookups
+        after the first lookup of a batch arrives, and max_batch is
+        the maximum number of distinct keys in one request.
+        """
+
+        if max_batch < 1:
+            raise ValueError("Invalid max_batch: " + repr(max_batch))
+        self.apps = apps
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.lookups = 0
+        self.batches = 0
+        self.keys_sent = 0
+        self._thread = threading.Thread(target=self._run, name="PersonBatcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, key):
+        """submit() queues a lookup of the person with key, either
+        the LNAB-# or numeric profile id, and returns a Future whose
+        result is the person dict, or None if the key is unknown.
+        """
+
+        f = Future()
+        with self._lock:
+            # checked under the lock, so no lookup follows the sentinel
+            if self._closed:
+                raise RuntimeError("PersonBatcher is closed.")
+            self.lookups += 1
+            self._queue.put(("%s" % (key,), f))
+        return f
+
+    def getPerson(self, key, fields=None, timeout=None):
+        """getPerson() looks up a person, waiting for the batch
+        which contains it. See submit().
+        The person dict has the fields returned by getRelatives, so
+        fields cannot be chosen: use WT_Apps.getPerson() for them.
+        """
+
+        if fields:
+            raise ValueError("PersonBatcher does not support fields: " + repr(fields))
+
+        return self.submit(key).result(timeout)
+
+    def getPeople(self, keys, timeout=None):
+        """getPeople() looks up several people, and returns a dict
+        mapping each key to its person dict, or None.
+        """
+
+        futures = [(key, self.submit(key)) for key in keys]
+        return {key: f.result(timeout) for key, f in futures}
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            keys = {item[0]}
+            deadline = time.time() + self.window
+            stop = False
+            while len(keys) < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                keys.add(item[0])
+            self._send(batch)
+            if stop:
+                return
+
+    def _send(self, batch):
+        """_send() makes one multi-key request for a batch of lookups,
+        and resolves their futures.
+        """
+
+        keys = []
+        for key, f in batch:
+            if key not in keys:
+                keys.append(key)
+
+        with self._lock:
+            self.batches += 1
+            self.keys_sent += len(keys)
+
+        try:
+            r = self.apps.getRelatives(keys)
+            people = {}
+            for j in r.json():
+                for item in j.get("items") or []:
+                    person = item.get("person")
+                    for k in (item.get("key"), item.get("user_name"), item.get("user_id")):
+                        if k is not None:
+                            people["%s" % (k,)] = person
+        except Exception as e:
+            for key, f in batch:
+                f.set_exception(e)
+            return
+
+        for key, f in batch:
+            f.set_result(people.get(key))
+
+    def close(self):
+        """close() sends the lookups already queued, then stops
+        the background thread.
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        """stats() returns a dict of the batching counters.
+        requests_saved is the number of round trips avoided
+        compared with one request per lookup.
+        """
+
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "batches": self.batches,
+                "keys_sent": self.keys_sent,
+                "mean_batch": float(self.keys_sent) / self.batches if self.batches else 0.0,
+                "requests_saved": self.lookups - self.batches,
+            }
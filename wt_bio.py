@@ -0,0 +1,365 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_bio.py parses the wikitext of WikiTree biographies, and indexes
+the profiles downloaded by their categories and templates.
+
+    bio = parse_bio(apps.getBio("Churchill-4").json()[0]["bio"])
+    bio.categories, bio.templates, bio.links, bio.sources
+
+    index = BioIndex("bios.sqlite")
+    index.add_response(apps.getBio("Churchill-4"))
+    index.category("Prime Ministers of the United Kingdom")  # Ids
+    index.search(categories=["Blenheim Palace"], templates=["Notables"])
+    index.close()
+
+parse_bio() scans the text once, with one regular expression
+matching every construct of interest, instead of one scan per kind.
+The index is held in memory as a set of Ids per category and per
+template, so that a query is a dict lookup. When it has a path, it is
+stored in a sqlite database, and adding a profile again, such as when
+its biography has changed, only rewrites the rows of that profile.
+See benchmarks/bench_bio.py for the parsing and query speeds.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+
+# categories and templates are unique, in order of appearance, links
+# are (target, label) pairs, label None if there is none, sources are
+# the text of the <ref> elements, and of the list items of the
+# Sources section, and sections the headings.
+Bio = namedtuple("Bio", ("categories", "templates", "links", "sources", "sections"))
+
+# the lookahead skips quickly to the characters which can start a token
+_tokens = re.compile(r"""(?=[\[{<=*])(?:
+    \[\[[ \t]*Category[ \t]*:(?P<category>[^\]|]*)(?:\|[^\]]*)?\]\]
+  | \[\[(?P<link>[^\]|]*)(?:\|(?P<label>[^\]]*))?\]\]
+  | \{\{(?P<template>[^{}|]*)(?:\|[^{}]*)?\}\}
+  | ^(?P<level>=+)[ \t]*(?P<heading>.*?)[ \t]*(?P=level)[ \t]*$
+  | (?P<ref><ref(?:[ \t][^>]*)?(?<!/)>)
+  | (?P<unref></ref[ \t]*>)
+  | ^(?P<item>\*+)[ \t]*
+  | (?P<comment><!--.*?-->)
+)""", re.VERBOSE | re.MULTILINE | re.DOTALL | re.IGNORECASE)
+
+_tags = re.compile(r"<[^>]*>")
+
+# the names seen, as written and as normalized, since a few of them are
+# repeated across many biographies
+_names = {}
+_names_max = 100000
+
+
+def _name(name):
+    """_name() returns a category or template name as WikiTree uses
+    it, with single spaces, and the first letter in upper case.
+    """
+
+    normal = _names.get(name)
+    if normal is None:
+        normal = " ".join(name.replace("_", " ").split())
+        normal = normal[:1].upper() + normal[1:]
+        if len(_names) >= _names_max:
+            _names.clear()
+        _names[name] = normal
+    return normal
+
+
+def _unique(names):
+    seen = set()
+    return [n for n in names if n and not (n in seen or seen.add(n))]
+
+
+def parse_bio(text):
+    """parse_bio() returns the Bio of the wikitext of a biography.
+    Templates nested in another template are found, but not the
+    outer one, and comments are skipped.
+    """
+
+    categories, templates, links, sources, sections = [], [], [], [], []
+    in_sources = False
+    ref = None
+    for m in _tokens.finditer(text or ""):
+        kind = m.lastgroup
+        if kind == "category":
+            categories.append(_name(m.group("category")))
+        elif kind == "link" or kind == "label":
+            links.append((m.group("link").strip(), None if m.group("label") is None else m.group("label").strip()))
+        elif kind == "template":
+            templates.append(_name(m.group("template")))
+        elif kind == "heading":
+            heading = m.group("heading")
+            sections.append(heading)
+            in_sources = heading.lower() == "sources"
+        elif kind == "ref":
+            ref = m.end()
+        elif kind == "unref":
+            if ref is not None:
+                source = _tags.sub("", text[ref:m.start()]).strip()
+                if source:
+                    sources.append(source)
+            ref = None
+        elif kind == "item" and in_sources:
+            end = text.find("\n", m.end())
+            source = text[m.end():] if end < 0 else text[m.end():end]
+            if source.strip():
+                sources.append(source.strip())
+    return Bio(_unique(categories), _unique(templates), links, sources, sections)
+
+
+def bios(response):
+    """bios() is a generator which yields the (Id, Name, wikitext) of
+    the biographies of a getBio response, either a requests.Response,
+    or its decoded JSON, skipping results with no bio, such as those
+    of private profiles.
+    """
+
+    j = response.json() if hasattr(response, "json") else response
+    if isinstance(j, dict):
+        j = [j]
+    for result in j or []:
+        if isinstance(result, dict) and result.get("bio") is not None and result.get("user_id"):
+            yield int(result["user_id"]), result.get("page_name"), result["bio"]
+
+
+class BioIndex(object):
+    """BioIndex is an inverted index from the categories and templates
+    of biographies to the Ids of the profiles. It is thread safe.
+    """
+
+    kinds = ("category", "template")
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS bio_profiles (
+            id INTEGER PRIMARY KEY,
+            name TEXT
+        );
+        CREATE TABLE IF NOT EXISTS bio_terms (
+            kind TEXT,
+            term TEXT,
+            id INTEGER,
+            PRIMARY KEY (kind, term, id)
+        );
+        CREATE INDEX IF NOT EXISTS bio_terms_id ON bio_terms (id);
+    """
+
+    def __init__(self, path=None, batch_size=100):
+        """__init__() opens, or creates, an index stored in a sqlite
+        database at path, or kept in memory only if path is None.
+        Changes are committed in one transaction when batch_size
+        profiles have changed, and by flush() and close().
+        """
+
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._terms = dict((kind, {}) for kind in self.kinds)
+        self._frozen = {}
+        self._profiles = {}
+        self._pending = {}
+        self.added = 0
+        self.removed = 0
+        self.flushes = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(self._schema)
+            self._load()
+
+    def _load(self):
+        for pid, name in self._db.execute("SELECT id, name FROM bio_profiles"):
+            self._profiles[pid] = (name, {})
+        for kind, term, pid in self._db.execute("SELECT kind, term, id FROM bio_terms"):
+            self._terms[kind].setdefault(term, set()).add(pid)
+            self._profiles[pid][1].setdefault(kind, []).append(term)
+
+    def _unlink(self, pid):
+        """_unlink() removes the postings of a profile from memory.
+        """
+
+        name, terms = self._profiles.pop(pid, (None, {}))
+        for kind, names in terms.items():
+            index = self._terms[kind]
+            for term in names:
+                self._frozen.pop((kind, term), None)
+                ids = index.get(term)
+                if ids is not None:
+                    ids.discard(pid)
+                    if not ids:
+                        del index[term]
+
+    def add(self, pid, bio, name=None):
+        """add() indexes, or indexes again, the profile with the
+        numeric Id pid, whose biography bio is wikitext or a Bio.
+        name is the LNAB-# of the profile, if known.
+        Returns the Bio.
+        """
+
+        if not isinstance(bio, Bio):
+            bio = parse_bio(bio)
+        pid = int(pid)
+        terms = {"category": bio.categories, "template": bio.templates}
+        with self._lock:
+            self._unlink(pid)
+            self._profiles[pid] = (name, terms)
+            for kind, names in terms.items():
+                index = self._terms[kind]
+                for term in names:
+                    self._frozen.pop((kind, term), None)
+                    index.setdefault(term, set()).add(pid)
+            self.added += 1
+            self._changed(pid)
+        return bio
+
+    def add_response(self, response):
+        """add_response() indexes the biographies of a getBio response,
+        see bios(), and returns the number of profiles indexed.
+        """
+
+        count = 0
+        for pid, name, text in bios(response):
+            self.add(pid, text, name=name)
+            count += 1
+        return count
+
+    def remove(self, pid):
+        """remove() removes a profile from the index.
+        """
+
+        pid = int(pid)
+        with self._lock:
+            if pid in self._profiles:
+                self._unlink(pid)
+                self.removed += 1
+                self._changed(pid)
+
+    def _changed(self, pid):
+        self._pending[pid] = True
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """flush() commits the pending changes in one transaction.
+        """
+
+        with self._lock:
+            if self._db is None or not self._pending:
+                self._pending.clear()
+                return
+            with self._db:
+                for pid in self._pending:
+                    self._db.execute("DELETE FROM bio_terms WHERE id = ?", (pid,))
+                    if pid not in self._profiles:
+                        self._db.execute("DELETE FROM bio_profiles WHERE id = ?", (pid,))
+                        continue
+                    name, terms = self._profiles[pid]
+                    self._db.execute("INSERT OR REPLACE INTO bio_profiles (id, name) VALUES (?, ?)", (pid, name))
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO bio_terms (kind, term, id) VALUES (?, ?, ?)",
+                        [(kind, term, pid) for kind, names in terms.items() for term in names])
+            self._pending.clear()
+            self.flushes += 1
+
+    def close(self):
+        """close() commits the pending changes, and closes the database.
+        """
+
+        with self._lock:
+            self.flush()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def category(self, name):
+        """category() returns the set of the Ids of the profiles in
+        the category name.
+        """
+
+        return self._lookup("category", name)
+
+    def template(self, name):
+        """template() returns the set of the Ids of the profiles using
+        the template name, such as "Notables".
+        """
+
+        return self._lookup("template", name)
+
+    def _lookup(self, kind, name):
+        """_lookup() returns a frozen copy of the set of Ids of a term,
+        which is kept until the term changes, so that a large
+        category is only copied once.
+        """
+
+        key = (kind, _name(name))
+        with self._lock:
+            ids = self._frozen.get(key)
+            if ids is None:
+                ids = self._frozen[key] = frozenset(self._terms[kind].get(key[1], ()))
+            return ids
+
+    def search(self, categories=(), templates=()):
+        """search() returns the set of the Ids of the profiles in all
+        of categories, and using all of templates.
+        """
+
+        with self._lock:
+            sets = [self._terms["category"].get(_name(n), ()) for n in categories]
+            sets += [self._terms["template"].get(_name(n), ()) for n in templates]
+            if not sets:
+                return frozenset()
+            sets.sort(key=len)
+            result = set(sets[0])
+            for s in sets[1:]:
+                result.intersection_update(s)
+                if not result:
+                    break
+            return frozenset(result)
+
+    def terms(self, kind="category"):
+        """terms() returns a dict of the categories, or templates, and
+        the number of profiles of each.
+        """
+
+        with self._lock:
+            return dict((term, len(ids)) for term, ids in self._terms[kind].items())
+
+    def name(self, pid):
+        """name() returns the LNAB-# of the profile with Id pid, or
+        None.
+        """
+
+        with self._lock:
+            return self._profiles.get(int(pid), (None,))[0]
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __contains__(self, pid):
+        return pid in self._profiles
+
+    def stats(self):
+        """stats() returns a dict of the index counters.
+        """
+
+        with self._lock:
+            return {
+                "profiles": len(self._profiles),
+                "categories": len(self._terms["category"]),
+                "templates": len(self._terms["template"]),
+                "added": self.added,
+                "removed": self.removed,
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+            }
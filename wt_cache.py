@@ -0,0 +1,593 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_cache.py provides response caches for the WikiTree APPS API interface.
+
+A cache is passed to WT_Apps, which consults it for every request:
+
+    cache = ResponseCache(maxsize=10000, ttls={"getBio": 86400})
+    apps = WT_Apps(cache=cache)
+
+Responses are keyed on the normalized request data and on the
+identity of the logged in user, so anonymous and logged in views
+of the same profile are never mixed.
+
+ResponseCache keeps responses in memory. SQLiteCache keeps them
+in a sqlite database, and revalidates expired profiles using their
+Touched timestamps:
+
+    cache = SQLiteCache("wikitree.sqlite")
+    apps = WT_Apps(cache=cache)
+    ...
+    cache.close()
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import requests
+
+try:  # for Python 3.7+
+    import contextvars
+except ImportError:
+    contextvars = None
+
+
+def _norm_value(name, value):
+    """_norm_value() converts a request parameter value to a
+    canonical string, so equivalent requests share a cache key.
+    """
+
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        value = ",".join("%s" % (v,) for v in value)
+    value = "%s" % (value,)
+    if name == "fields":
+        # order and spacing do not matter in this list
+        value = ",".join(sorted(set(v.strip() for v in value.split(",") if v.strip())))
+    elif name == "keys":
+        # the items of the response follow the order of the keys,
+        # so only the spacing does not matter
+        value = ",".join(v.strip() for v in value.split(",") if v.strip())
+    return value
+
+
+def request_key(data, identity=None):
+    """request_key() returns a hashable key for the request data of
+    the given session identity. Requests which differ only in the
+    spelling of their parameter values, or in the order of their
+    fields, share a key.
+    """
+
+    items = tuple(sorted((k, _norm_value(k, v)) for k, v in data.items()))
+    return (identity or "", items)
+
+
+class _Bypass(object):
+    """_Bypass is a per thread (and per asyncio task) flag.
+    """
+
+    def __init__(self):
+        if contextvars is not None:
+            self._var = contextvars.ContextVar("wt_cache_bypass", default=False)
+        else:
+            self._local = threading.local()
+
+    def get(self):
+        if contextvars is not None:
+            return self._var.get()
+        return getattr(self._local, "value", False)
+
+    def set(self, value):
+        if contextvars is not None:
+            return self._var.set(value)
+        old = self.get()
+        self._local.value = value
+        return old
+
+    def reset(self, token):
+        if contextvars is not None:
+            self._var.reset(token)
+        else:
+            self._local.value = token
+
+
+class ResponseCache(object):
+    """ResponseCache is a thread safe, in-memory, least recently used
+    cache of API responses with a time to live per action.
+    """
+
+    # seconds; actions missing here use the default ttl
+    default_ttls = {
+        "getPrivacyLevels": 86400,
+        "help": 86400,
+        "getWatchlist": 300,
+    }
+
+    # actions which are never cached
+    uncached_actions = frozenset(("login",))
+
+    def __init__(self, maxsize=1024, ttl=3600, ttls=None, clock=None):
+        """__init__() initializes a response cache.
+        maxsize is the maximum number of responses kept; the least
+        recently used response is evicted when it is exceeded.
+        ttl is the default time to live in seconds, and ttls is a
+        dict of per action ttls. A ttl of 0 or None disables caching
+        for that action.
+        clock is the time source, default is time.time.
+        """
+
+        if maxsize < 1:
+            raise ValueError("Invalid maxsize: " + repr(maxsize))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(self.default_ttls)
+        if ttls:
+            self.ttls.update(ttls)
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bypass = _Bypass()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+    def ttl_for(self, action):
+        """ttl_for() returns the time to live of an action,
+        or None if the action is not cached.
+        """
+
+        if action in self.uncached_actions:
+            return None
+        return self.ttls.get(action, self.ttl) or None
+
+    def key(self, data, identity=None):
+        """key() returns the cache key of the request data
+        for the given session identity, or None if the request
+        is not cacheable.
+        """
+
+        if self.ttl_for(data.get("action")) is None:
+            return None
+        return request_key(data, identity)
+
+    @contextmanager
+    def bypass(self):
+        """bypass() is a context manager which makes requests in the
+        current thread or task skip the cache lookup. Fresh responses
+        still replace the cached ones.
+        """
+
+        token = self._bypass.set(True)
+        try:
+            yield self
+        finally:
+            self._bypass.reset(token)
+
+    def get(self, key):
+        """get() returns the cached response for key, or None.
+        """
+
+        if self._bypass.get():
+            with self._lock:
+                self.bypasses += 1
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, response = entry
+                if expires > self._clock():
+                    # most recently used entries go to the end
+                    del self._entries[key]
+                    self._entries[key] = entry
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, key, response, result=None):
+        """put() stores the response for key.
+        result is the wt_result.Result of the response, if it has
+        been decoded, which is stored and returned by get() instead,
+        so that it is not decoded again.
+        """
+
+        action = dict(key[1]).get("action")
+        ttl = self.ttl_for(action)
+        if ttl is None:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._clock() + ttl, response if result is None else result)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """invalidate() removes the response for key, if any.
+        """
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """clear() removes all responses, and resets the counters.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.bypasses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """stats() returns a dict of the cache counters.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses,
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0,
+            }
+
+
+def _persons(j, found):
+    """_persons() collects (Id, Touched) pairs from every person
+    or profile record in a decoded response.
+    """
+
+    if isinstance(j, dict):
+        if "Id" in j and ("Name" in j or "Touched" in j):
+            found.append((j["Id"], j.get("Touched")))
+        for v in j.values():
+            if isinstance(v, (dict, list)):
+                _persons(v, found)
+    elif isinstance(j, list):
+        for v in j:
+            _persons(v, found)
+    return found
+
+
+class SQLiteCache(ResponseCache):
+    """SQLiteCache is a durable, thread safe cache of API responses
+    stored in a sqlite database, so cached profiles survive restarts.
+
+    Each response records the Touched timestamps of the profiles
+    it contains. An expired response is revalidated by fetching the
+    current Touched timestamps, and is kept when none changed.
+    Writes are buffered, and committed in batches.
+    """
+
+    default_ttls = dict(ResponseCache.default_ttls)
+    default_ttls["getWatchlist"] = 0
+
+    # actions whose responses are revalidated using Touched
+    revalidated_actions = frozenset((
+        "getPerson", "getProfile", "getBio", "getAncestors", "getRelatives",
+    ))
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            action TEXT,
+            expires REAL,
+            status INTEGER,
+            url TEXT,
+            encoding TEXT,
+            headers TEXT,
+            content BLOB,
+            deps TEXT
+        );
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY,
+            touched TEXT
+        );
+    """
+
+    def __init__(self, path, ttl=86400, ttls=None, batch_size=100, flush_interval=5.0, clock=None):
+        """__init__() opens, or creates, a cache database at path.
+        ttl and ttls are as for ResponseCache, but the default ttl is
+        one day. Pending writes are committed in one transaction when
+        batch_size responses are pending, or when flush_interval
+        seconds have passed since the last commit.
+        """
+
+        ResponseCache.__init__(self, maxsize=1, ttl=ttl, ttls=ttls, clock=clock)
+        self.maxsize = None
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(self._schema)
+        self._pending = OrderedDict()
+        self._pending_profiles = {}
+        self._last_flush = self._clock()
+        self.revalidated = 0
+        self.changed = 0
+        self.flushes = 0
+
+    def _encode(self, key):
+        return json.dumps(key, separators=(",", ":"))
+
+    def _response(self, row):
+        status, url, encoding, headers, content = row
+        r = requests.models.Response()
+        r.status_code = status
+        r.url = url
+        r.encoding = encoding
+        r.headers = requests.structures.CaseInsensitiveDict(json.loads(headers))
+        r._content = bytes(content)
+        return r
+
+    def _row(self, skey):
+        """_row() returns the stored row for an encoded key,
+        including pending writes, or None.
+        """
+
+        row = self._pending.get(skey)
+        if row is None:
+            row = self._db.execute(
+                "SELECT action, expires, status, url, encoding, headers, content, deps"
+                " FROM responses WHERE key = ?", (skey,)).fetchone()
+        return row
+
+    def get(self, key):
+        """get() returns the unexpired cached response for key, or None.
+        An expired response which can be revalidated is counted as a
+        hit or a miss by revalidate(), so each lookup counts once.
+        """
+
+        if self._bypass.get():
+            with self._lock:
+                self.bypasses += 1
+            return None
+
+        with self._lock:
+            row = self._row(self._encode(key))
+            if row is not None and row[1] > self._clock():
+                self.hits += 1
+                return self._response(row[2:7])
+            if row is None or not row[7]:
+                self.misses += 1
+        return None
+
+    def revalidate(self, key, touched):
+        """revalidate() returns the expired response for key if the
+        Touched timestamps of its profiles have not changed,
+        otherwise None.
+        touched is a function which takes a list of profile ids,
+        and returns a dict of their current Touched timestamps,
+        such as WT_Apps.getTouched. When it fails, the response is
+        treated as changed, so that it is fetched again.
+        """
+
+        if self._bypass.get():
+            return None
+
+        skey = self._encode(key)
+        with self._lock:
+            row = self._row(skey)
+        if row is None or not row[7]:
+            # counted as a miss by get()
+            return None
+
+        ttl = self.ttl_for(row[0])
+        current = None
+        deps = dict((int(k), v) for k, v in json.loads(row[7]))
+        if ttl is not None:
+            try:
+                current = touched(list(deps))
+            except Exception as e:
+                print("WARNING: Touched revalidation failed:", e)
+        with self._lock:
+            if current is not None and all(current.get(k) == v for k, v in deps.items()):
+                self.revalidated += 1
+                self.hits += 1
+                self._store(skey, (row[0], self._clock() + ttl) + tuple(row[2:]))
+                return self._response(row[2:7])
+            self.misses += 1
+            if current is not None:
+                self.changed += 1
+                self._drop(skey)
+        return None
+
+    def refresh(self, touched, batch=100):
+        """refresh() revalidates every expired response, fetching the
+        Touched timestamps of up to batch profiles per request.
+        Responses whose profiles are unchanged are renewed, the
+        others are removed. touched is as for revalidate().
+        Returns the numbers of (renewed, removed) responses.
+        """
+
+        self.flush()
+        now = self._clock()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, action, deps FROM responses WHERE expires <= ?", (now,)).fetchall()
+        ids = set()
+        stale = []
+        for skey, action, deps in rows:
+            deps = json.loads(deps) if deps else []
+            stale.append((skey, action, deps))
+            ids.update(int(k) for k, v in deps)
+
+        ids = sorted(ids)
+        current = {}
+        for i in range(0, len(ids), batch):
+            current.update(touched(ids[i:i + batch]))
+
+        renewed = removed = 0
+        with self._lock:
+            with self._db:
+                for skey, action, deps in stale:
+                    if deps and self.ttl_for(action) is not None and all(current.get(int(k)) == v for k, v in deps):
+                        self._db.execute(
+                            "UPDATE responses SET expires = ? WHERE key = ?",
+                            (now + self.ttl_for(action), skey))
+                        renewed += 1
+                    else:
+                        self._db.execute("DELETE FROM responses WHERE key = ?", (skey,))
+                        removed += 1
+            self.revalidated += renewed
+            self.changed += removed
+        return renewed, removed
+
+    def put(self, key, response, result=None):
+        """put() queues the response for key to be written.
+        result is the wt_result.Result of the response, if it has
+        been decoded, whose payload is used, so that the response is
+        not decoded again. The body is stored, and get() returns a
+        new requests.Response.
+        """
+
+        action = dict(key[1]).get("action")
+        ttl = self.ttl_for(action)
+        if ttl is None:
+            return
+
+        deps = None
+        if action in self.revalidated_actions:
+            deps = self._deps(action, response, None if result is None else result.payload)
+
+        headers = json.dumps(dict(response.headers))
+        row = (action, self._clock() + ttl, response.status_code, response.url,
+               response.encoding, headers, response.content,
+               json.dumps(deps) if deps else None)
+        with self._lock:
+            self._store(self._encode(key), row)
+
+    def _deps(self, action, response, j=None):
+        """_deps() returns the (Id, Touched) pairs of the profiles in a
+        response, whose decoded JSON is j, if known, or None when some
+        Touched timestamp is unknown.
+        """
+
+        if j is None:
+            try:
+                j = response.json()
+            except ValueError:
+                return None
+
+        found = _persons(j, [])
+        if action == "getBio":
+            found = [(item["user_id"], None) for item in j if isinstance(item, dict) and "user_id" in item]
+
+        deps = {}
+        with self._lock:
+            for pid, touched in found:
+                pid = int(pid)
+                if touched:
+                    self._pending_profiles[pid] = touched
+                else:
+                    touched = self._touched(pid)
+                if not touched:
+                    return None
+                deps[pid] = touched
+        return sorted(deps.items()) or None
+
+    def _touched(self, pid):
+        touched = self._pending_profiles.get(pid)
+        if touched is None:
+            row = self._db.execute("SELECT touched FROM profiles WHERE id = ?", (pid,)).fetchone()
+            touched = row and row[0]
+        return touched
+
+    def _store(self, skey, row):
+        self._pending.pop(skey, None)
+        self._pending[skey] = row
+        if len(self._pending) >= self.batch_size or self._clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _drop(self, skey):
+        self._pending.pop(skey, None)
+        with self._db:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (skey,))
+
+    def flush(self):
+        """flush() commits the pending writes in one transaction.
+        """
+
+        with self._lock:
+            if self._pending or self._pending_profiles:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO responses"
+                        " (key, action, expires, status, url, encoding, headers, content, deps)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(k,) + tuple(row) for k, row in self._pending.items()])
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO profiles (id, touched) VALUES (?, ?)",
+                        list(self._pending_profiles.items()))
+                self._pending.clear()
+                self._pending_profiles.clear()
+                self.flushes += 1
+            self._last_flush = self._clock()
+
+    def invalidate(self, key):
+        """invalidate() removes the response for key, if any.
+        """
+
+        with self._lock:
+            self._drop(self._encode(key))
+
+    def clear(self):
+        """clear() removes all responses and profiles, and resets the counters.
+        """
+
+        with self._lock:
+            self._pending.clear()
+            self._pending_profiles.clear()
+            with self._db:
+                self._db.execute("DELETE FROM responses")
+                self._db.execute("DELETE FROM profiles")
+            self.hits = self.misses = self.evictions = self.bypasses = 0
+            self.revalidated = self.changed = self.flushes = 0
+
+    def close(self):
+        """close() commits the pending writes, and closes the database.
+        """
+
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            self.flush()
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        """stats() returns a dict of the cache counters.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "revalidated": self.revalidated,
+                "changed": self.changed,
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,377 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_crawl.py provides crawlers which walk a WikiTree family tree
+further than a single WikiTree APPS API request can reach.
+
+    crawler = AncestorCrawler(apps, max_workers=4)
+    for generation, person in crawler.crawl("Churchill-4", max_depth=20):
+        print(generation, person["Name"])
+    print(crawler.stats())
+
+DescendantCrawler walks down the tree in the same way, using
+multi-key getRelatives requests.
+
+Each person is yielded as soon as the response which contains it
+arrives, however many lines of descent lead to it. AncestorCrawler
+yields a person again, at a lower generation, when a shorter line
+to it arrives later, and expands its ancestors again from there.
+DescendantCrawler requests one generation at a time, so the first
+line to a person is the shortest.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import time
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+
+class _IdSet(object):
+    """_IdSet is a compact set of numeric profile Ids, which uses
+    one bit per Id, up to the largest Id added.
+    """
+
+    def __init__(self):
+        self._bits = array("B")
+        self._len = 0
+
+    def add(self, pid):
+        i, bit = divmod(int(pid), 8)
+        if i >= len(self._bits):
+            self._bits.extend([0] * max(i + 1 - len(self._bits), len(self._bits)))
+        if not self._bits[i] & (1 << bit):
+            self._bits[i] |= 1 << bit
+            self._len += 1
+
+    def __contains__(self, pid):
+        i, bit = divmod(int(pid), 8)
+        return i < len(self._bits) and bool(self._bits[i] & (1 << bit))
+
+    def __len__(self):
+        return self._len
+
+
+class _Crawler(object):
+    """_Crawler holds what the crawlers have in common.
+    """
+
+    def __init__(self, apps, max_workers):
+        if getattr(apps, "_format", "json") != "json":
+            raise ValueError("%s requires the json format" % (type(self).__name__,))
+        if max_workers < 1:
+            raise ValueError("Invalid max_workers: " + repr(max_workers))
+        self.apps = apps
+        self.max_workers = max_workers
+        self._reset()
+
+    def _reset(self):
+        self.requests = 0
+        self.people = 0
+        self.duplicates = 0
+        self.revisited = 0
+        self.errors = 0
+        self.stopped = None
+        self.elapsed = 0.0
+
+    def stats(self):
+        """stats() returns a dict of the counters of the last crawl.
+        duplicates is the number of people received more than once,
+        and revisited the number of people yielded again, at a lower
+        generation.
+        """
+
+        return {
+            "requests": self.requests,
+            "people": self.people,
+            "duplicates": self.duplicates,
+            "revisited": self.revisited,
+            "errors": self.errors,
+            "stopped": self.stopped,
+            "elapsed": self.elapsed,
+        }
+
+
+class AncestorCrawler(_Crawler):
+    """AncestorCrawler expands an ancestry to any depth by calling
+    getAncestors() again from the frontier of each response.
+    """
+
+    def __init__(self, apps, step=5, max_workers=4):
+        """__init__() initializes an ancestor crawler for a WT_Apps
+        instance, whose format must be json.
+        step is the depth of each getAncestors request, at most 10,
+        and max_workers the number of requests made concurrently.
+        """
+
+        if not 1 <= step <= 10:
+            raise ValueError("Invalid step: " + repr(step))
+        self.step = step
+        super(AncestorCrawler, self).__init__(apps, max_workers)
+
+    def _fetch(self, key, depth):
+        """_fetch() returns the ancestors list of one getAncestors request.
+        """
+
+        r = self.apps.getAncestors(key, depth)
+        j = r.json()[0]
+        status = j.get("status", 0)
+        if status not in (0, "0", "", None) or j.get("ancestors") is None:
+            raise ValueError("getAncestors failed for %r: %r" % (key, status,))
+        return j["ancestors"]
+
+    @staticmethod
+    def _generations(ancestors, gen):
+        """_generations() returns (generation, person) pairs for the
+        ancestors of one response, whose first person is at
+        generation gen, in breadth first order. Ancestors which
+        cannot be reached, because a private profile hides its
+        parents, are left out.
+        """
+
+        if not ancestors:
+            return []
+        people = dict((p.get("Id"), p) for p in ancestors)
+        result = []
+        placed = set()
+        queue = deque([(ancestors[0], gen)])
+        while queue:
+            person, g = queue.popleft()
+            pid = person.get("Id")
+            if pid in placed:
+                continue
+            placed.add(pid)
+            result.append((g, person))
+            for parent in (person.get("Father"), person.get("Mother")):
+                if parent in people and parent not in placed:
+                    queue.append((people[parent], g + 1))
+        return result
+
+    def crawl(self, key, max_depth=None, max_people=None, max_time=None):
+        """crawl() is a generator which yields (generation, person)
+        pairs for the ancestors of the person with key, who is at
+        generation 0, until one of the budgets is spent:
+        max_depth generations, max_people people, or max_time
+        seconds. The stopped attribute then tells which budget
+        stopped the crawl, or is None if the ancestry was exhausted.
+        The requests are made concurrently, so a person may first
+        arrive by a longer line: it is then yielded again, at the
+        lower generation, when the shorter line arrives, so the last
+        generation yielded for a person is the lowest one.
+        """
+
+        self._reset()
+        t0 = time.time()
+        seen = {}  # the generation of each person yielded
+        pending = {}  # the generation of each person requested
+        truncated = False
+        futures = {}
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def submit(k, gen):
+            depth = self.step
+            if max_depth is not None:
+                depth = max(1, min(depth, max_depth - gen))
+            futures[pool.submit(self._fetch, k, depth)] = (k, gen)
+            pending[k] = gen
+            self.requests += 1
+
+        submit(key, 0)
+        try:
+            while futures:
+                timeout = None
+                if max_time is not None:
+                    timeout = max_time - (time.time() - t0)
+                    if timeout <= 0:
+                        self.stopped = "time"
+                        return
+                done, not_done = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+                for f in done:
+                    k, gen = futures.pop(f)
+                    try:
+                        ancestors = f.result()
+                    except (requests.RequestException, ValueError) as e:
+                        print("WARNING: skipping ancestors of", repr(k), "after error:", e)
+                        self.errors += 1
+                        continue
+                    ids = set(p.get("Id") for p in ancestors)
+                    for g, person in self._generations(ancestors, gen):
+                        if max_depth is not None and g > max_depth:
+                            continue
+                        pid = person.get("Id")
+                        if pending.get(pid, g) >= g:
+                            pending.pop(pid, None)
+                        if pid in seen:
+                            if seen[pid] <= g:
+                                self.duplicates += 1
+                                continue
+                            # a shorter line: yield it again, and expand
+                            # its ancestors again from there
+                            self.revisited += 1
+                        else:
+                            self.people += 1
+                        seen[pid] = g
+                        yield g, person
+                        if max_people is not None and self.people >= max_people:
+                            self.stopped = "count"
+                            return
+                        if max_depth is not None and g >= max_depth:
+                            truncated = truncated or bool(person.get("Father") or person.get("Mother"))
+                            continue
+                        # expand the parents missing from this response
+                        for parent in (person.get("Father"), person.get("Mother")):
+                            if parent and parent not in ids and min(seen.get(parent, g + 2), pending.get(parent, g + 2)) > g + 1:
+                                submit(parent, g + 1)
+            if truncated:
+                self.stopped = "depth"
+        finally:
+            for f in futures:
+                f.cancel()
+            pool.shutdown(wait=False)
+            self.elapsed = time.time() - t0
+
+
+class DescendantCrawler(_Crawler):
+    """DescendantCrawler walks the descendants of one or more people
+    breadth first, with multi-key getRelatives(getChildren=1)
+    requests made concurrently.
+    """
+
+    def __init__(self, apps, batch_size=100, max_workers=4):
+        """__init__() initializes a descendant crawler for a WT_Apps
+        instance, whose format must be json.
+        batch_size is the number of people expanded by one request,
+        and max_workers the number of requests made concurrently.
+        """
+
+        if batch_size < 1:
+            raise ValueError("Invalid batch_size: " + repr(batch_size))
+        self.batch_size = batch_size
+        super(DescendantCrawler, self).__init__(apps, max_workers)
+
+    def _fetch(self, keys):
+        """_fetch() returns the items of one getRelatives request.
+        """
+
+        r = self.apps.getRelatives(keys, getChildren=True)
+        items = []
+        for j in r.json():
+            status = j.get("status", 0)
+            if status not in (0, "0", "", None):
+                raise ValueError("getRelatives failed: %r" % (status,))
+            items.extend(j.get("items") or [])
+        return items
+
+    def crawl(self, keys, max_depth=None, max_people=None, max_time=None):
+        """crawl() is a generator which yields (generation, person)
+        pairs for the people with keys, at generation 0, and their
+        descendants, until one of the budgets is spent:
+        max_depth generations, max_people people, or max_time
+        seconds. The stopped attribute then tells which budget
+        stopped the crawl, or is None if the descendants were
+        exhausted.
+        People are yielded as soon as the request which finds them
+        completes. The people of a generation are requested in
+        batches, and the next batch is only sent as the results are
+        consumed, so memory use is bounded by the frontier, plus
+        one bit per Id for the people already seen. The next
+        generation is requested once the last one is received, so
+        each person is yielded once, at its lowest generation, but a
+        root which descends from another root is yielded again, at
+        generation 0. The people of generation max_depth are not
+        expanded, and the Children of the people yielded are removed.
+        """
+
+        if not isinstance(keys, (list, tuple, set, frozenset,)):
+            keys = [keys]
+
+        self._reset()
+        t0 = time.time()
+        seen = _IdSet()
+        queue = deque((k, 0) for k in keys)  # (key, generation) to expand
+        roots = set("%s" % (k,) for k in keys)
+        level = 0  # the generation being expanded
+        truncated = False
+        futures = {}
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            while queue or futures:
+                # send the batches of one generation, the next one once
+                # it has been received, so the first line found to a
+                # person is the shortest
+                while queue and len(futures) < self.max_workers and (queue[0][1] == level or not futures):
+                    level = queue[0][1]
+                    batch = {}
+                    while queue and len(batch) < self.batch_size and queue[0][1] == level:
+                        k, gen = queue.popleft()
+                        batch["%s" % (k,)] = gen
+                    futures[pool.submit(self._fetch, list(batch))] = batch
+                    self.requests += 1
+
+                timeout = None
+                if max_time is not None:
+                    timeout = max_time - (time.time() - t0)
+                    if timeout <= 0:
+                        self.stopped = "time"
+                        return
+                done, not_done = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+                for f in done:
+                    batch = futures.pop(f)
+                    try:
+                        items = f.result()
+                    except (requests.RequestException, ValueError) as e:
+                        print("WARNING: skipping children of %d people after error:" % (len(batch),), e)
+                        self.errors += 1
+                        continue
+                    for item in items:
+                        person = item.get("person") or {}
+                        key = "%s" % (item.get("key"),)
+                        gen = batch.get(key, 0)
+                        children = person.pop("Children", None) or {}
+                        if key in roots:
+                            roots.discard(key)
+                            pid = person.get("Id")
+                            if pid in seen:
+                                # a descendant of another root
+                                self.revisited += 1
+                            else:
+                                seen.add(pid)
+                                self.people += 1
+                            yield gen, person
+                            if max_people is not None and self.people >= max_people:
+                                self.stopped = "count"
+                                return
+                        if max_depth is not None and gen >= max_depth:
+                            truncated = truncated or bool(children)
+                            continue
+                        if isinstance(children, dict):
+                            children = children.values()
+                        for child in children:
+                            pid = child.get("Id")
+                            if pid in seen:
+                                self.duplicates += 1
+                                continue
+                            seen.add(pid)
+                            self.people += 1
+                            child.pop("Children", None)
+                            yield gen + 1, child
+                            if max_people is not None and self.people >= max_people:
+                                self.stopped = "count"
+                                return
+                            if max_depth is None or gen + 1 < max_depth:
+                                queue.append((pid, gen + 1))
+                            else:
+                                # whether it has children is unknown
+                                truncated = True
+            if truncated:
+                self.stopped = "depth"
+        finally:
+            for f in futures:
+                f.cancel()
+            pool.shutdown(wait=False)
+            self.elapsed = time.time() - t0
@@ -0,0 +1,388 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_graph.py provides an in-memory family graph, built from the
+responses of the WikiTree APPS API, which answers relationship
+questions without further requests.
+
+    graph = FamilyGraph()
+    graph.add(apps.getAncestors("Churchill-4", 10))
+    graph.add(apps.getRelatives(keys, getChildren=True, getSpouses=True))
+    graph.parents("Churchill-4")
+    graph.generations("Churchill-4", "Spencer-1")
+
+Only the structure of the tree is kept: each person is a small
+integer index into arrays of parents, children and spouses, taking
+about 220 bytes per person, its Name included, against several
+kilobytes for the person dict.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import threading
+from array import array
+from collections import deque
+
+from wt_person import person_dicts
+
+NONE = -1
+
+# what is known about a person
+PARENTS = 1
+CHILDREN = 2
+SPOUSES = 4
+
+try:  # for Python 2
+    _str = basestring
+except NameError:
+    _str = str
+
+
+def _people(relatives):
+    """_people() returns the person dicts of a Parents, Children,
+    Spouses or Siblings field, which is a dict keyed by Id, or a list.
+    """
+
+    if isinstance(relatives, dict):
+        return [p for p in relatives.values() if isinstance(p, dict)]
+    return [p for p in relatives or [] if isinstance(p, dict)]
+
+
+class FamilyGraph(object):
+    """FamilyGraph holds the parents, children and spouses of people,
+    keyed by profile Id. It is thread safe.
+    """
+
+    def __init__(self):
+        """__init__() initializes an empty family graph.
+        """
+
+        self._lock = threading.RLock()
+        self._index = {}  # Id -> index
+        self._names = {}  # Name -> index
+        self._ids = array("l")
+        self._father = array("i")
+        self._mother = array("i")
+        self._known = array("B")
+        # children are linked lists threaded through the children:
+        # the first child of a parent, and the next child of the
+        # same father, and of the same mother
+        self._first_child = array("i")
+        self._next_by_father = array("i")
+        self._next_by_mother = array("i")
+        # spouses are linked lists of edges
+        self._first_spouse = array("i")
+        self._spouse = array("i")
+        self._next_spouse = array("i")
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        """_lookup() returns the index of the person with key, either
+        the numeric Id or the LNAB-#, or None if it is unknown.
+        """
+
+        if isinstance(key, _str):
+            if key.isdigit():
+                return self._index.get(int(key))
+            return self._names.get(key)
+        return self._index.get(key)
+
+    def _node(self, pid):
+        """_node() returns the index of the person with Id pid,
+        adding the person if needed.
+        """
+
+        pid = int(pid)
+        i = self._index.get(pid)
+        if i is None:
+            i = len(self._ids)
+            self._index[pid] = i
+            self._ids.append(pid)
+            self._father.append(NONE)
+            self._mother.append(NONE)
+            self._known.append(0)
+            self._first_child.append(NONE)
+            self._next_by_father.append(NONE)
+            self._next_by_mother.append(NONE)
+            self._first_spouse.append(NONE)
+        return i
+
+    def _unlink_child(self, i, parent):
+        """_unlink_child() removes child i from the children of parent.
+        """
+
+        prev = NONE
+        c = self._first_child[parent]
+        while c != NONE:
+            nxt = self._next_by_father[c] if self._father[c] == parent else self._next_by_mother[c]
+            if c == i:
+                if prev == NONE:
+                    self._first_child[parent] = nxt
+                elif self._father[prev] == parent:
+                    self._next_by_father[prev] = nxt
+                else:
+                    self._next_by_mother[prev] = nxt
+                return
+            prev = c
+            c = nxt
+
+    def _set_parent(self, i, parent, links, nexts):
+        """_set_parent() makes parent, an index or NONE, the father
+        or mother of i, as given by the links and nexts arrays.
+        """
+
+        old = links[i]
+        if old == parent:
+            return
+        if old != NONE:
+            self._unlink_child(i, old)
+        links[i] = parent
+        nexts[i] = NONE
+        if parent != NONE:
+            nexts[i] = self._first_child[parent]
+            self._first_child[parent] = i
+
+    def _add_spouse(self, i, j):
+        e = self._first_spouse[i]
+        while e != NONE:
+            if self._spouse[e] == j:
+                return
+            e = self._next_spouse[e]
+        self._spouse.append(j)
+        self._next_spouse.append(self._first_spouse[i])
+        self._first_spouse[i] = len(self._spouse) - 1
+
+    def _add_person(self, person):
+        """_add_person() adds a person dict, and the relatives it
+        holds, and returns its index, or None if it has no Id.
+        """
+
+        pid = person.get("Id")
+        if not pid:
+            return None
+        i = self._node(pid)
+        name = person.get("Name")
+        if name:
+            self._names[name] = i
+
+        if "Father" in person or "Mother" in person:
+            for field, links, nexts in (("Father", self._father, self._next_by_father),
+                                        ("Mother", self._mother, self._next_by_mother)):
+                if field in person:
+                    p = person.get(field)
+                    self._set_parent(i, self._node(p) if p else NONE, links, nexts)
+            self._known[i] |= PARENTS
+
+        for relative in _people(person.get("Parents")):
+            self._add_person(relative)
+
+        for relative in _people(person.get("Siblings")):
+            self._add_person(relative)
+
+        if "Children" in person:
+            male = person.get("Gender") == "Male"
+            for relative in _people(person.get("Children")):
+                c = self._add_person(relative)
+                if c is None or i in (self._father[c], self._mother[c]):
+                    continue
+                # a private child does not show its parents
+                if male or (person.get("Gender") != "Female" and self._father[c] == NONE):
+                    self._set_parent(c, i, self._father, self._next_by_father)
+                else:
+                    self._set_parent(c, i, self._mother, self._next_by_mother)
+            self._known[i] |= CHILDREN
+
+        if "Spouses" in person:
+            for relative in _people(person.get("Spouses")):
+                s = self._add_person(relative)
+                if s is not None:
+                    self._add_spouse(i, s)
+                    self._add_spouse(s, i)
+            self._known[i] |= SPOUSES
+
+        return i
+
+    def add(self, response):
+        """add() adds the people of a getPerson, getProfile,
+        getAncestors, getRelatives or getWatchlist response, either
+        a requests.Response, or its decoded JSON.
+        Returns the number of people in the graph.
+        """
+
+        with self._lock:
+            for person in person_dicts(response):
+                self._add_person(person)
+            return len(self._ids)
+
+    def add_person(self, person):
+        """add_person() adds a person dict, as returned by the API,
+        with any Parents, Children, Spouses and Siblings it holds.
+        """
+
+        with self._lock:
+            self._add_person(person)
+
+    def id(self, key):
+        """id() returns the Id of the person with key, either the
+        numeric Id or the LNAB-#, or None if it is unknown.
+        """
+
+        i = self._lookup(key)
+        return None if i is None else self._ids[i]
+
+    def known(self, key, what=PARENTS):
+        """known() tells whether the PARENTS, CHILDREN and SPOUSES
+        of a person, as selected by the what bits, have all been
+        added, so need not be requested.
+        """
+
+        i = self._lookup(key)
+        return i is not None and self._known[i] & what == what
+
+    def father(self, key):
+        """father() returns the Id of the father of a person, or None.
+        """
+
+        i = self._lookup(key)
+        if i is None or self._father[i] == NONE:
+            return None
+        return self._ids[self._father[i]]
+
+    def mother(self, key):
+        """mother() returns the Id of the mother of a person, or None.
+        """
+
+        i = self._lookup(key)
+        if i is None or self._mother[i] == NONE:
+            return None
+        return self._ids[self._mother[i]]
+
+    def _parents(self, i):
+        return [p for p in (self._father[i], self._mother[i]) if p != NONE]
+
+    def _children(self, i):
+        result = []
+        c = self._first_child[i]
+        while c != NONE:
+            result.append(c)
+            c = self._next_by_father[c] if self._father[c] == i else self._next_by_mother[c]
+        return result
+
+    def _spouses(self, i):
+        result = []
+        e = self._first_spouse[i]
+        while e != NONE:
+            result.append(self._spouse[e])
+            e = self._next_spouse[e]
+        return result
+
+    def _siblings(self, i):
+        result = set()
+        for p in self._parents(i):
+            result.update(self._children(p))
+        result.discard(i)
+        return sorted(result)
+
+    def _ids_of(self, func, key):
+        i = self._lookup(key)
+        if i is None:
+            return []
+        with self._lock:
+            return [self._ids[j] for j in func(i)]
+
+    def parents(self, key):
+        """parents() returns the Ids of the known parents of a person.
+        """
+
+        return self._ids_of(self._parents, key)
+
+    def children(self, key):
+        """children() returns the Ids of the known children of a person.
+        """
+
+        return self._ids_of(self._children, key)
+
+    def spouses(self, key):
+        """spouses() returns the Ids of the known spouses of a person.
+        """
+
+        return self._ids_of(self._spouses, key)
+
+    def siblings(self, key):
+        """siblings() returns the Ids of the known full and half
+        siblings of a person, who share a known parent.
+        """
+
+        return self._ids_of(self._siblings, key)
+
+    def _walk(self, i, func, depth):
+        """_walk() returns a dict mapping the indexes reached from i
+        by repeated func(), breadth first, to their distance.
+        """
+
+        found = {i: 0}
+        queue = deque([i])
+        while queue:
+            j = queue.popleft()
+            d = found[j]
+            if depth is not None and d >= depth:
+                continue
+            for k in func(j):
+                if k not in found:
+                    found[k] = d + 1
+                    queue.append(k)
+        return found
+
+    def ancestors(self, key, depth=None):
+        """ancestors() returns a dict mapping the Ids of the known
+        ancestors of a person to their generation, up to depth.
+        """
+
+        i = self._lookup(key)
+        if i is None:
+            return {}
+        with self._lock:
+            found = self._walk(i, self._parents, depth)
+            del found[i]
+            return dict((self._ids[j], d) for j, d in found.items())
+
+    def descendants(self, key, depth=None):
+        """descendants() returns a dict mapping the Ids of the known
+        descendants of a person to their generation, down to depth.
+        """
+
+        i = self._lookup(key)
+        if i is None:
+            return {}
+        with self._lock:
+            found = self._walk(i, self._children, depth)
+            del found[i]
+            return dict((self._ids[j], d) for j, d in found.items())
+
+    def generations(self, key, other):
+        """generations() returns the number of generations from a
+        person up to other, their ancestor, or minus the number of
+        generations down to other, their descendant, or None if
+        other is neither. The shortest line counts.
+        """
+
+        i = self._lookup(key)
+        j = self._lookup(other)
+        if i is None or j is None:
+            return None
+        if i == j:
+            return 0
+        with self._lock:
+            d = self._walk(i, self._parents, None).get(j)
+            if d is not None:
+                return d
+            d = self._walk(j, self._parents, None).get(i)
+            if d is not None:
+                return -d
+        return None
@@ -0,0 +1,436 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_jobs.py provides a durable queue of WikiTree APPS API requests,
+and a pool of workers to run them, so that a long crawl survives
+the death of its process, and resumes where it stopped:
+
+    queue = JobQueue("crawl.sqlite")
+    queue.add("getBio", ["Churchill-4", "Spencer-1"])
+    queue.add("getAncestors", ["Churchill-4"], depth=5)
+    runner = JobRunner(apps, queue, workers=4, report=print)
+    runner.run()
+    print(queue.result("getBio", "Churchill-4"))
+    queue.close()
+
+A job is an action, a key and the other parameters of a request.
+Adding a job which is already queued, or done, does nothing. The
+result of each job, its decoded JSON, is recorded with the job, so
+running it again, once it is done, records the same result. A
+failed request is retried later, with exponential backoff, up to
+max_retries times.
+
+Changes are committed at checkpoints, every checkpoint_interval
+seconds, or every checkpoint_jobs jobs. When a crawl is interrupted,
+the jobs finished since the last checkpoint are run again, once
+the queue is opened again. follow() lets the results of a job add
+new jobs, in the same checkpoint, as when crawling the ancestors of
+the people found:
+
+    def follow(job, payload):
+        for person in person_dicts(payload):
+            for parent in (person.get("Father"), person.get("Mother")):
+                if parent:
+                    yield "getBio", parent, {}
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# params is the dict of the parameters of the request, other than
+# the action and key, and attempts the number of failed attempts.
+Job = namedtuple("Job", ("action", "key", "params", "attempts"))
+
+PENDING, RUNNING, DONE, FAILED = 0, 1, 2, 3
+_states = ("pending", "running", "done", "failed")
+
+
+def _params(params):
+    return json.dumps(params or {}, separators=(",", ":"), sort_keys=True)
+
+
+class JobQueue(object):
+    """JobQueue is a durable queue of API requests, and of their
+    results, stored in a sqlite database. It is thread safe.
+    """
+
+    # the actions which can be queued, all of which take a key
+    actions = frozenset((
+        "getPerson", "getProfile", "getBio", "getAncestors", "getRelatives",
+        "getPersonFSConnections",
+    ))
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            action TEXT,
+            key TEXT,
+            params TEXT,
+            state INTEGER,
+            attempts INTEGER,
+            not_before REAL,
+            error TEXT,
+            result TEXT,
+            PRIMARY KEY (action, key, params)
+        );
+        CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            id INTEGER PRIMARY KEY,
+            time REAL,
+            pending INTEGER,
+            done INTEGER,
+            failed INTEGER
+        );
+    """
+
+    def __init__(self, path):
+        """__init__() opens, or creates, a job queue at path.
+        The jobs which were running when the queue was last closed,
+        or its process died, are pending again.
+        """
+
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(self._schema)
+        with self._db:
+            self.resumed = self._db.execute("UPDATE jobs SET state = ? WHERE state = ?", (PENDING, RUNNING)).rowcount
+        self._counts = [0, 0, 0, 0]
+        for state, count in self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+            self._counts[state] = count
+        self.checkpoints = 0
+        self.last_checkpoint = time.time()
+
+    def add(self, action, keys, **params):
+        """add() queues the action for each of keys, with params, and
+        returns the number of jobs which were not already queued.
+        A single key may be given instead of a list.
+        """
+
+        if action not in self.actions:
+            raise ValueError("Invalid action: " + repr(action))
+        if not isinstance(keys, (list, tuple, set)):
+            keys = [keys]
+        p = _params(params)
+        with self._lock:
+            added = 0
+            for key in keys:
+                added += self._db.execute(
+                    "INSERT OR IGNORE INTO jobs (action, key, params, state, attempts, not_before) VALUES (?, ?, ?, ?, 0, 0)",
+                    (action, "%s" % (key,), p, PENDING)).rowcount
+            self._counts[PENDING] += added
+        return added
+
+    def claim(self, n, now=None):
+        """claim() returns up to n pending jobs whose time has come,
+        in the order they were added, and marks them running.
+        """
+
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, action, key, params, attempts FROM jobs WHERE state = ? AND not_before <= ? ORDER BY rowid LIMIT ?",
+                (PENDING, now, n)).fetchall()
+            self._db.executemany("UPDATE jobs SET state = ? WHERE rowid = ?", [(RUNNING, row[0]) for row in rows])
+            self._counts[PENDING] -= len(rows)
+            self._counts[RUNNING] += len(rows)
+        return [Job(action, key, json.loads(params), attempts) for _, action, key, params, attempts in rows]
+
+    def next_retry(self):
+        """next_retry() returns the time the next pending job can be
+        claimed, or None if there is none.
+        """
+
+        with self._lock:
+            return self._db.execute("SELECT MIN(not_before) FROM jobs WHERE state = ?", (PENDING,)).fetchone()[0]
+
+    def done(self, job, payload, follow=()):
+        """done() records the result of a running job, its decoded
+        JSON payload, and queues the jobs follow, a list of (action,
+        key, params).
+        """
+
+        with self._lock:
+            self._db.execute("UPDATE jobs SET state = ?, error = NULL, result = ? WHERE action = ? AND key = ? AND params = ?",
+                             (DONE, json.dumps(payload, separators=(",", ":")), job.action, job.key, _params(job.params)))
+            self._counts[RUNNING] -= 1
+            self._counts[DONE] += 1
+            for action, key, params in follow:
+                self.add(action, key, **(params or {}))
+
+    def failed(self, job, error, retry_at=None):
+        """failed() records the failure of a running job. The job is
+        pending again, from time retry_at, or failed if it is None.
+        """
+
+        state = FAILED if retry_at is None else PENDING
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, not_before = ?, error = ? WHERE action = ? AND key = ? AND params = ?",
+                (state, retry_at or 0, "%s" % (error,), job.action, job.key, _params(job.params)))
+            self._counts[RUNNING] -= 1
+            self._counts[state] += 1
+
+    def retry_failed(self):
+        """retry_failed() makes the failed jobs pending again, with no
+        failed attempts, and returns their number.
+        """
+
+        with self._lock:
+            n = self._db.execute("UPDATE jobs SET state = ?, attempts = 0, not_before = 0 WHERE state = ?",
+                                 (PENDING, FAILED)).rowcount
+            self._counts[FAILED] -= n
+            self._counts[PENDING] += n
+        return n
+
+    def checkpoint(self):
+        """checkpoint() commits the changes since the last checkpoint.
+        """
+
+        with self._lock:
+            self._db.execute("INSERT INTO checkpoints (time, pending, done, failed) VALUES (?, ?, ?, ?)",
+                             (time.time(), self._counts[PENDING] + self._counts[RUNNING],
+                              self._counts[DONE], self._counts[FAILED]))
+            self._db.commit()
+            self.checkpoints += 1
+            self.last_checkpoint = time.time()
+
+    def close(self):
+        """close() checkpoints, and closes the database. The jobs still
+        running will be pending when the queue is opened again.
+        """
+
+        with self._lock:
+            if self._db is not None:
+                self.checkpoint()
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def result(self, action, key, **params):
+        """result() returns the recorded result of a job, or None if
+        it is not done.
+        """
+
+        with self._lock:
+            row = self._db.execute("SELECT result FROM jobs WHERE action = ? AND key = ? AND params = ? AND state = ?",
+                                   (action, "%s" % (key,), _params(params), DONE)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def results(self, action=None, batch=1000):
+        """results() is a generator which yields the (Job, payload) of
+        the jobs done, of action, or of every action if it is None.
+        The results are read batch at a time, so that they are not all
+        in memory at once.
+        """
+
+        sql = "SELECT rowid, action, key, params, attempts, result FROM jobs WHERE state = ? AND rowid > ?"
+        args = ()
+        if action is not None:
+            sql += " AND action = ?"
+            args = (action,)
+        sql += " ORDER BY rowid LIMIT ?"
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(sql, (DONE, last) + args + (batch,)).fetchall()
+            for last, action, key, params, attempts, result in rows:
+                yield Job(action, key, json.loads(params), attempts), json.loads(result)
+            if len(rows) < batch:
+                break
+
+    def failures(self):
+        """failures() returns a list of the (Job, error) of the jobs
+        which failed.
+        """
+
+        with self._lock:
+            rows = self._db.execute("SELECT action, key, params, attempts, error FROM jobs WHERE state = ? ORDER BY rowid",
+                                    (FAILED,)).fetchall()
+        return [(Job(action, key, json.loads(params), attempts), error) for action, key, params, attempts, error in rows]
+
+    def counts(self):
+        """counts() returns a dict of the number of jobs in each state.
+        """
+
+        with self._lock:
+            return dict(zip(_states, self._counts))
+
+
+class JobRunner(object):
+    """JobRunner runs the jobs of a JobQueue with a pool of worker
+    threads sharing one WT_Apps instance.
+    """
+
+    def __init__(self, apps, queue, workers=4, max_retries=3, backoff=1.0, max_backoff=60.0,
+                 checkpoint_interval=30.0, checkpoint_jobs=1000, follow=None, report=None):
+        """__init__() initializes a job runner.
+        workers is the number of requests run at once. A failed job
+        is retried after backoff seconds, doubled after each failed
+        attempt, up to max_backoff, and fails after max_retries
+        retries. A checkpoint is made every checkpoint_interval
+        seconds, or every checkpoint_jobs jobs. follow(job, payload)
+        returns the jobs to add, as (action, key, params), once a job
+        is done. report(stats) is called at every checkpoint.
+        """
+
+        if workers < 1:
+            raise ValueError("Invalid workers: " + repr(workers))
+        self.apps = apps
+        self.queue = queue
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_jobs = checkpoint_jobs
+        self.follow = follow
+        self.report = report
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.stopped = None
+
+    def _call(self, job):
+        """_call() runs one job, in a worker thread, and returns its
+        decoded payload.
+        """
+
+        r = getattr(self.apps, job.action)(job.key, **job.params)
+        if not getattr(r, "ok", True):
+            raise RuntimeError("HTTP status %s" % (r.status_code,))
+        return r.json()
+
+    def _record(self, job, future):
+        """_record() records the outcome of a job.
+        """
+
+        try:
+            payload = future.result()
+        except Exception as e:
+            if job.attempts < self.max_retries:
+                delay = min(self.backoff * 2 ** job.attempts, self.max_backoff)
+                self.queue.failed(job, e, retry_at=time.time() + delay)
+                with self._lock:
+                    self.retries += 1
+            else:
+                self.queue.failed(job, e)
+                with self._lock:
+                    self.failed += 1
+            return
+        follow = list(self.follow(job, payload) or ()) if self.follow is not None else ()
+        self.queue.done(job, payload, follow)
+        with self._lock:
+            self.completed += 1
+
+    def stop(self):
+        """stop() asks run() to return, once the jobs running finish.
+        It may be called from any thread.
+        """
+
+        self._stop.set()
+
+    def run(self, max_jobs=None, max_time=None):
+        """run() runs the pending jobs, until there are none, or
+        max_jobs jobs have been run, or max_time seconds have passed,
+        or stop() is called, and returns the reason: "done", "count",
+        "time" or "stop", which is also the stopped attribute.
+        """
+
+        self._stop.clear()
+        self._started = start = time.time()
+        claimed = 0
+        since = 0
+        futures = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.stopped = None
+        try:
+            while True:
+                now = time.time()
+                if self.stopped is None:
+                    if self._stop.is_set():
+                        self.stopped = "stop"
+                    elif max_time is not None and now - start >= max_time:
+                        self.stopped = "time"
+                    elif max_jobs is not None and claimed >= max_jobs:
+                        self.stopped = "count"
+
+                if self.stopped is None and len(futures) < self.workers:
+                    n = self.workers - len(futures)
+                    if max_jobs is not None:
+                        n = min(n, max_jobs - claimed)
+                    for job in self.queue.claim(n, now):
+                        futures[executor.submit(self._call, job)] = job
+                        claimed += 1
+
+                if not futures:
+                    if self.stopped is not None:
+                        break
+                    retry = self.queue.next_retry()
+                    if retry is None:
+                        self.stopped = "done"
+                        break
+                    self._stop.wait(min(max(retry - now, 0.01), 1.0))
+                    continue
+
+                with self._lock:
+                    self.in_flight = len(futures)
+                finished, _ = wait(list(futures), timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._record(futures.pop(future), future)
+                since += len(finished)
+                with self._lock:
+                    self.in_flight = len(futures)
+
+                if since >= self.checkpoint_jobs or time.time() - self.queue.last_checkpoint >= self.checkpoint_interval:
+                    self._checkpoint()
+                    since = 0
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+            with self._lock:
+                self.in_flight = 0
+            self._checkpoint()
+        return self.stopped
+
+    def _checkpoint(self):
+        self.queue.checkpoint()
+        if self.report is not None:
+            self.report(self.stats())
+
+    def stats(self):
+        """stats() returns a dict of the counters of the runner and of
+        the queue. It may be called from any thread.
+        """
+
+        counts = self.queue.counts()
+        with self._lock:
+            elapsed = time.time() - self._started if self._started is not None else 0.0
+            return {
+                "pending": counts["pending"],
+                "running": self.in_flight,
+                "done": counts["done"],
+                "failed": counts["failed"],
+                "completed": self.completed,
+                "failures": self.failed,
+                "retries": self.retries,
+                "elapsed": elapsed,
+                "jobs_per_second": self.completed / elapsed if elapsed > 0 else 0.0,
+                "checkpoints": self.queue.checkpoints,
+            }
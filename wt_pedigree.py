@@ -0,0 +1,219 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_pedigree.py provides Ahnentafel numbered pedigrees of WikiTree
+profiles.
+
+    pedigree = Pedigree(apps.getAncestors("Churchill-4", 10))
+    pedigree[1]         # the Id of the subject
+    pedigree[2], pedigree[3]  # the Ids of the father and mother
+    pedigree.person(5)  # the person dict of the father's mother
+    pedigree.collapse   # {Id: (slot, slot, ...)} for implex
+    pedigree.implex()   # pedigree collapse per generation
+
+Slot 1 is the subject, and the parents of slot n are in slots 2n and
+2n + 1, so generation g is slots 2**g to 2**(g + 1) - 1. The slots
+are one array, so positional lookups, such as for a fan chart, take
+constant time. Note that g generations take 2**(g + 1) slots, so a
+pedigree has at most max_generations generations. A parent who is
+already a descendant in the same line, an ancestry cycle, is left
+out, and its slot is listed in cycles.
+"""
+
+from __future__ import print_function, unicode_literals
+
+from array import array
+
+from wt_person import person_dicts
+
+
+class Pedigree(object):
+    """Pedigree is an Ahnentafel numbered array of the Ids of the
+    ancestors of a subject, with an index of pedigree collapse.
+    """
+
+    # 2**25 slots, 256 MiB
+    max_generations = 24
+
+    def __init__(self, ancestors=None, subject=None, generations=None):
+        """__init__() initializes a pedigree from a getAncestors
+        response, either a requests.Response, a wt_result.Result,
+        the decoded JSON, or a list of person dicts.
+        subject is the Id or Name of the subject, default is the
+        first person of the response. generations is the number of
+        generations above the subject, default is as many as are
+        known, up to max_generations.
+        """
+
+        self._people = {}
+        self._names = {}
+        if ancestors is not None:
+            if isinstance(ancestors, list) and ancestors and "Id" in ancestors[0]:
+                people = ancestors
+            else:
+                people = list(person_dicts(ancestors))
+            for p in people:
+                pid = p.get("Id")
+                if pid:
+                    self._people[pid] = p
+                    if p.get("Name"):
+                        self._names[p["Name"]] = pid
+            if subject is None and people:
+                subject = people[0].get("Id")
+
+        def parents(pid):
+            p = self._people.get(pid) or {}
+            return p.get("Father") or 0, p.get("Mother") or 0
+
+        self._build(self._id(subject), parents, generations)
+
+    @classmethod
+    def from_graph(cls, graph, key, generations=None):
+        """from_graph() returns the pedigree of the person with key,
+        from a wt_graph.FamilyGraph. person() then returns None.
+        """
+
+        pedigree = cls()
+
+        def parents(pid):
+            return graph.father(pid) or 0, graph.mother(pid) or 0
+
+        pedigree._build(graph.id(key), parents, generations)
+        return pedigree
+
+    def _id(self, key):
+        if key is None:
+            return 0
+        if key in self._names:
+            return self._names[key]
+        try:
+            return int(key)
+        except ValueError:
+            raise ValueError("Unknown subject: " + repr(key))
+
+    def _build(self, subject, parents, generations):
+        """_build() fills the slots, one generation at a time, using
+        parents(Id), which returns the Ids of the father and mother,
+        or 0.
+        """
+
+        if generations is None:
+            generations = self.max_generations
+        elif generations > self.max_generations:
+            raise ValueError("Invalid generations: " + repr(generations))
+        self.ids = array("l", [0, subject or 0])
+        self.cycles = []
+        self.generations = 0
+        level = 1
+        while self.generations < generations:
+            first = level
+            level *= 2
+            nxt = array("l", [0]) * level
+            found = False
+            for n in range(first, level):
+                pid = self.ids[n]
+                if not pid:
+                    continue
+                for i, parent in enumerate(parents(pid)):
+                    m = 2 * n + i
+                    if parent and self._descendant(m, parent):
+                        self.cycles.append(m)
+                        parent = 0
+                    nxt[m - level] = parent
+                    found = found or parent
+            if not found:
+                break
+            self.ids.extend(nxt)
+            self.generations += 1
+
+        slots = {}
+        for n in range(1, len(self.ids)):
+            pid = self.ids[n]
+            if pid:
+                if pid in slots:
+                    slots[pid].append(n)
+                else:
+                    slots[pid] = [n]
+        self._slots = slots
+        self.collapse = dict((pid, tuple(ns)) for pid, ns in slots.items() if len(ns) > 1)
+
+    def _descendant(self, n, pid):
+        """_descendant() tells whether pid is in a slot of the line
+        from slot n down to the subject, not including n.
+        """
+
+        n //= 2
+        while n:
+            if self.ids[n] == pid:
+                return True
+            n //= 2
+        return False
+
+    def __len__(self):
+        """__len__() returns the number of slots, including the
+        unknown ones.
+        """
+
+        return len(self.ids) - 1
+
+    def __getitem__(self, n):
+        """[n] returns the Id in slot n, or None if it is unknown.
+        """
+
+        if n < 1 or n >= len(self.ids):
+            return None
+        return self.ids[n] or None
+
+    def person(self, n):
+        """person() returns the person dict in slot n, or None.
+        """
+
+        return self._people.get(self[n])
+
+    def slots(self, key):
+        """slots() returns the slots of the person with key, either
+        the Id, as an int or a string of digits, or the Name, in
+        increasing order.
+        """
+
+        try:
+            pid = int(self._names.get(key, key))
+        except (TypeError, ValueError):
+            return []
+        return list(self._slots.get(pid, ()))
+
+    @staticmethod
+    def generation(n):
+        """generation() returns the generation of slot n,
+        0 for the subject.
+        """
+
+        return n.bit_length() - 1
+
+    def fan(self, g):
+        """fan() returns the Ids of generation g, from the father's
+        father's line to the mother's mother's line, 0 if unknown.
+        """
+
+        return self.ids[2 ** g:2 ** (g + 1)].tolist()
+
+    def implex(self):
+        """implex() returns a list of dicts with, for each
+        generation, the number of slots, the slots known, the
+        distinct people in them, and the pedigree collapse, the
+        share of known slots filled by repeated people.
+        """
+
+        result = []
+        for g in range(self.generations + 1):
+            ids = [pid for pid in self.fan(g) if pid]
+            distinct = set(ids)
+            result.append({
+                "generation": g,
+                "slots": 2 ** g,
+                "known": len(ids),
+                "distinct": len(distinct),
+                "collapse": 1.0 - float(len(distinct)) / len(ids) if ids else 0.0,
+            })
+        return result
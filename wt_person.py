@@ -0,0 +1,237 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_person.py provides compact person records for the responses of
+the WikiTree APPS API.
+
+A person dict, as decoded from a response, has about 40 keys, and
+costs several kilobytes. A Person keeps the commonly used fields in
+slots, the privacy level a small int, and the boolean fields packed
+into one int. The other fields are kept as a compact JSON list of
+their values, decoded on access, with their names interned, in a
+tuple shared by the records which have the same fields:
+
+    for person in people(apps.getAncestors("Churchill-4", 10)):
+        print(person.Name, person.BirthDate, person.IsLiving)
+        print(person.get("Nicknames"))  # a rarely used field
+
+Reading a field which the API does not return as an attribute gives
+None, but reading an unknown name raises AttributeError.
+
+See benchmarks/bench_person.py for the memory saved.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import sys
+
+if sys.version_info[0] >= 3:
+    _intern = sys.intern
+else:  # intern() only accepts byte strings in Python 2
+    def _intern(s):
+        return s
+
+# fields which are kept as attributes
+_slot_fields = (
+    "Id", "Name", "FirstName", "MiddleName", "LastNameAtBirth", "LastNameCurrent",
+    "Gender", "BirthDate", "DeathDate", "BirthLocation", "DeathLocation",
+    "Father", "Mother", "Privacy", "Touched",
+)
+
+# boolean fields, which are packed into one int:
+# bit 2 * k tells whether field k is present, bit 2 * k + 1 is its value
+_flag_fields = (
+    "IsLiving", "IsPerson", "IsRedirect", "HasChildren", "NoChildren",
+    "Privacy_IsAtLeastPublic", "Privacy_IsOpen", "Privacy_IsPrivate",
+    "Privacy_IsPublic", "Privacy_IsSemiPrivate", "Privacy_IsSemiPrivateBio",
+)
+_flag_bits = dict((name, 2 * k) for k, name in enumerate(_flag_fields))
+
+# the other person fields of the API, read as None when absent
+_api_fields = frozenset((
+    "PageId", "MiddleInitial", "Nicknames", "LastNameOther", "RealName",
+    "Prefix", "Suffix", "BirthDateDecade", "DeathDateDecade", "Photo",
+    "PhotoData", "Created", "Manager", "Managers", "Creator", "DataStatus",
+    "Connected", "ShortName", "BirthName", "BirthNamePrivate", "LongName",
+    "LongNamePrivate", "Bio", "Parents", "Children", "Spouses", "Siblings",
+    "Categories", "Templates",
+)) | frozenset(_slot_fields) | frozenset(_flag_fields)
+
+# the interned names of the rare fields of each layout,
+# shared by the records which have the same rare fields
+_layouts = {}
+_layouts_max = 1000
+
+
+def _layout(names):
+    layout = _layouts.get(names)
+    if layout is None:
+        if len(_layouts) >= _layouts_max:
+            _layouts.clear()
+        layout = _layouts[names] = tuple(_intern(name) for name in names)
+    return layout
+
+
+_absent = object()
+
+
+class Person(object):
+    """Person is a compact, read only record of a WikiTree person.
+    Fields are read as attributes, or as with a dict.
+    """
+
+    __slots__ = _slot_fields + ("_flags", "_rare_names", "_rare")
+
+    def __init__(self, person):
+        """__init__() initializes a Person from a person dict.
+        """
+
+        flags = 0
+        names = []
+        values = []
+        for name, value in person.items():
+            if name in _flag_bits:
+                if value is not None:
+                    bit = _flag_bits[name]
+                    flags |= 1 << bit
+                    if value and value != "0":
+                        flags |= 2 << bit
+                continue
+            if name not in _slot_fields:
+                names.append(name)
+                values.append(value)
+        for name in _slot_fields:
+            value = person.get(name)
+            if name == "Privacy" and value is not None:
+                value = int(value)
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_flags", flags)
+        object.__setattr__(self, "_rare_names", _layout(tuple(names)))
+        object.__setattr__(self, "_rare", json.dumps(values, separators=(",", ":")).encode("utf-8") if values else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Person is read only")
+
+    def _rare_fields(self):
+        if self._rare is None:
+            return {}
+        return dict(zip(self._rare_names, json.loads(self._rare.decode("utf-8"))))
+
+    def _get(self, name):
+        if name in _flag_bits:
+            bit = _flag_bits[name]
+            if not self._flags & (1 << bit):
+                return _absent
+            return bool(self._flags & (2 << bit))
+        if name in _slot_fields:
+            value = getattr(self, name)
+            return _absent if value is None else value
+        if name not in self._rare_names:
+            return _absent
+        return json.loads(self._rare.decode("utf-8"))[self._rare_names.index(name)]
+
+    def __getattr__(self, name):
+        # only called for the flag and rare fields
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = self._get(name)
+        if value is _absent:
+            if name not in _api_fields:
+                raise AttributeError("Person has no field " + repr(name))
+            return None
+        return value
+
+    def __getitem__(self, name):
+        value = self._get(name)
+        if value is _absent:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        """get() returns the value of a field, or default.
+        """
+
+        value = self._get(name)
+        return default if value is _absent else value
+
+    def __contains__(self, name):
+        return self._get(name) is not _absent
+
+    def keys(self):
+        """keys() returns the names of the fields present.
+        """
+
+        return list(self.to_dict())
+
+    def to_dict(self):
+        """to_dict() returns the person dict the Person was made from,
+        without the null attribute fields, and with bool flags.
+        """
+
+        d = self._rare_fields()
+        for name in _slot_fields:
+            value = getattr(self, name)
+            if value is not None:
+                d[name] = value
+        for name, bit in _flag_bits.items():
+            if self._flags & (1 << bit):
+                d[name] = bool(self._flags & (2 << bit))
+        return d
+
+    def relatives(self, name):
+        """relatives() returns the Parents, Children, Spouses or
+        Siblings of the person as a list of Person.
+        """
+
+        relatives = self.get(name) or []
+        if isinstance(relatives, dict):
+            relatives = list(relatives.values())
+        return [Person(p) for p in relatives if isinstance(p, dict)]
+
+    def __eq__(self, other):
+        return isinstance(other, Person) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (Person, (self.to_dict(),))
+
+    def __repr__(self):
+        return "Person(%r, %r)" % (self.Id, self.Name,)
+
+
+def person_dicts(response):
+    """person_dicts() is a generator which yields the person dicts
+    of a getPerson, getProfile, getAncestors, getRelatives or
+    getWatchlist response, either a requests.Response, or its
+    decoded JSON.
+    """
+
+    j = response.json() if hasattr(response, "json") else response
+    if isinstance(j, dict):
+        j = [j]
+    for result in j or []:
+        if not isinstance(result, dict):
+            continue
+        for field in ("person", "profile"):
+            if isinstance(result.get(field), dict):
+                yield result[field]
+        for field in ("ancestors", "watchlist"):
+            for person in result.get(field) or []:
+                yield person
+        for item in result.get("items") or []:
+            if isinstance(item.get("person"), dict):
+                yield item["person"]
+
+
+def people(response):
+    """people() returns the people of a response as a list of Person.
+    See person_dicts().
+    """
+
+    return [Person(p) for p in person_dicts(response)]
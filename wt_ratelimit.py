@@ -0,0 +1,185 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_ratelimit.py provides a token bucket rate limiter with priority
+classes for the WikiTree APPS API interface.
+
+    limiter = RateLimiter(rate=5, burst=10)
+    apps = WT_Apps(rate_limiter=limiter)
+
+Every request waits for a token. When several requests are waiting,
+the one with the highest priority class gets the next token, so
+interactive lookups jump ahead of bulk crawls, which use whatever
+capacity is left. By default, an action's class is taken from
+RateLimiter.action_priorities; use priority() to override it:
+
+    with limiter.priority(LOW):
+        apps.getPerson(key)  # part of a background sweep
+"""
+
+from __future__ import print_function, unicode_literals
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+try:  # for Python 3.7+
+    import contextvars
+except ImportError:
+    contextvars = None
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+_names = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+
+class RateLimiter(object):
+    """RateLimiter is a thread safe token bucket, whose waiting
+    requests are served in priority order.
+    """
+
+    action_priorities = {
+        "login": HIGH,
+        "help": HIGH,
+        "getPrivacyLevels": HIGH,
+        "getPerson": HIGH,
+        "getProfile": HIGH,
+        "getBio": HIGH,
+        "getPersonFSConnections": HIGH,
+        "getRelatives": NORMAL,
+        "getAncestors": LOW,
+        "getWatchlist": LOW,
+    }
+
+    def __init__(self, rate=5.0, burst=None, clock=None):
+        """__init__() initializes a rate limiter allowing rate requests
+        per second on average, and bursts of up to burst requests,
+        default is one second of requests.
+        """
+
+        if rate <= 0:
+            raise ValueError("Invalid rate: " + repr(rate))
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._clock = clock or time.time
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._last = self._clock()
+        self._waiters = []
+        self._seq = itertools.count()
+        if contextvars is not None:
+            self._override = contextvars.ContextVar("wt_ratelimit_priority", default=None)
+        else:
+            self._local = threading.local()
+        self.granted = dict((p, 0) for p in _names)
+        self.waited = dict((p, 0.0) for p in _names)
+        self.max_wait = dict((p, 0.0) for p in _names)
+
+    def _get_override(self):
+        if contextvars is not None:
+            return self._override.get()
+        return getattr(self._local, "value", None)
+
+    @contextmanager
+    def priority(self, priority):
+        """priority() is a context manager which sets the priority
+        class of the requests made in the current thread or task.
+        """
+
+        if priority not in _names:
+            raise ValueError("Invalid priority: " + repr(priority))
+        if contextvars is not None:
+            token = self._override.set(priority)
+        else:
+            token = self._get_override()
+            self._local.value = priority
+        try:
+            yield self
+        finally:
+            if contextvars is not None:
+                self._override.reset(token)
+            else:
+                self._local.value = token
+
+    def priority_for(self, action):
+        """priority_for() returns the priority class of a request
+        for action in the current thread or task.
+        """
+
+        priority = self._get_override()
+        if priority is None:
+            priority = self.action_priorities.get(action, NORMAL)
+        return priority
+
+    def _refill(self):
+        now = self._clock()
+        if now > self._last:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+    def acquire(self, priority=NORMAL):
+        """acquire() waits for a token, behind any waiting requests
+        of the same or a higher priority class.
+        Returns the number of seconds waited.
+        """
+
+        t0 = self._clock()
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            while True:
+                self._refill()
+                if self._waiters[0] == entry:
+                    if self._tokens >= 1:
+                        break
+                    timeout = (1 - self._tokens) / self.rate
+                else:
+                    timeout = 1.0 / self.rate
+                self._cond.wait(timeout)
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            wait = self._clock() - t0
+            self.granted[priority] += 1
+            self.waited[priority] += wait
+            self.max_wait[priority] = max(self.max_wait[priority], wait)
+            self._cond.notify_all()
+        return wait
+
+    def queue_depth(self, priority=None):
+        """queue_depth() returns the number of requests waiting
+        in a priority class, or in all classes.
+        """
+
+        with self._cond:
+            if priority is None:
+                return len(self._waiters)
+            return sum(1 for p, seq in self._waiters if p == priority)
+
+    def stats(self):
+        """stats() returns a dict of the limiter counters, with
+        the queue depth and waits of each priority class.
+        """
+
+        with self._cond:
+            self._refill()
+            classes = {}
+            for p, name in _names.items():
+                n = self.granted[p]
+                classes[name] = {
+                    "queued": sum(1 for q, seq in self._waiters if q == p),
+                    "granted": n,
+                    "mean_wait": self.waited[p] / n if n else 0.0,
+                    "max_wait": self.max_wait[p],
+                }
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": self._tokens,
+                "queued": len(self._waiters),
+                "classes": classes,
+            }
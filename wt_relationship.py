@@ -0,0 +1,157 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_relationship.py finds how two WikiTree profiles are related.
+
+    finder = RelationshipFinder(apps)
+    r = finder.find("Churchill-4", "Spencer-1")
+    if r is not None:
+        print(r.path, r.steps, r.calls)
+
+The search expands both people at once, breadth first, through
+parents and children, and optionally spouses, and stops when the
+two searches meet. Each step expands the smaller of the two
+frontiers, with multi-key getRelatives requests, and people already
+in the FamilyGraph are not requested again, so the number of API
+calls is kept low.
+"""
+
+from __future__ import print_function, unicode_literals
+
+from collections import namedtuple
+
+from wt_graph import CHILDREN, PARENTS, SPOUSES, FamilyGraph
+
+# path is the list of Ids from the first person to the second one,
+# steps the relation of each person of the path to the previous one,
+# "parent", "child" or "spouse", and calls the number of API calls.
+Relationship = namedtuple("Relationship", ("path", "steps", "calls"))
+
+
+class RelationshipFinder(object):
+    """RelationshipFinder finds the shortest relationship between two
+    people, using and extending a FamilyGraph.
+    """
+
+    def __init__(self, apps, graph=None, batch_size=100, spouses=False):
+        """__init__() initializes a relationship finder for a WT_Apps
+        instance, whose format must be json.
+        graph is the FamilyGraph to use, default is a new one.
+        batch_size is the maximum number of people expanded by one
+        getRelatives request. When spouses is True, marriages are
+        links of a relationship as well as parents and children.
+        """
+
+        if getattr(apps, "_format", "json") != "json":
+            raise ValueError("RelationshipFinder requires the json format")
+        if batch_size < 1:
+            raise ValueError("Invalid batch_size: " + repr(batch_size))
+        self.apps = apps
+        self.graph = FamilyGraph() if graph is None else graph
+        self.batch_size = batch_size
+        self.spouses = spouses
+        self._what = PARENTS | CHILDREN | (SPOUSES if spouses else 0)
+        self.calls = 0
+
+    def _load(self, keys):
+        """_load() adds the relatives of the people with keys, who are
+        not already in the graph, and returns the number of calls.
+        """
+
+        missing = [k for k in keys if not self.graph.known(k, self._what)]
+        calls = 0
+        for i in range(0, len(missing), self.batch_size):
+            options = {"getParents": True, "getChildren": True}
+            if self.spouses:
+                options["getSpouses"] = True
+            self.graph.add(self.apps.getRelatives(missing[i:i + self.batch_size], **options))
+            calls += 1
+        self.calls += calls
+        return calls
+
+    def _neighbours(self, pid):
+        for p in self.graph.parents(pid):
+            yield p, "parent"
+        for c in self.graph.children(pid):
+            yield c, "child"
+        if self.spouses:
+            for s in self.graph.spouses(pid):
+                yield s, "spouse"
+
+    def find(self, key, other, max_depth=None, max_calls=None):
+        """find() returns the shortest Relationship between the people
+        with key and other, either the LNAB-# or numeric id, or None
+        if there is none within max_depth steps, or the search would
+        make more than max_calls API calls.
+        """
+
+        calls = self._load([k for k in (key, other) if self.graph.id(k) is None])
+        start, goal = self.graph.id(key), self.graph.id(other)
+        for k, pid in ((key, start), (other, goal)):
+            if pid is None:
+                raise ValueError("Unknown profile: " + repr(k))
+        if start == goal:
+            return Relationship([start], [], calls)
+
+        # for each side: the way back to its origin, the distance,
+        # and the frontier of the last level
+        back = ({start: None}, {goal: None})
+        dist = ({start: 0}, {goal: 0})
+        frontier = ([start], [goal])
+        while frontier[0] and frontier[1]:
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            level = frontier[side]
+            depth = dist[side][level[0]] + 1
+            if max_depth is not None and depth + min(dist[1 - side][p] for p in frontier[1 - side]) > max_depth:
+                return None
+            if max_calls is not None and calls + self._need(level) > max_calls:
+                return None
+            calls += self._load(level)
+
+            nxt = []
+            meet = None
+            for pid in level:
+                for r, step in self._neighbours(pid):
+                    if r in back[side]:
+                        continue
+                    back[side][r] = (pid, step)
+                    dist[side][r] = depth
+                    nxt.append(r)
+                    if r in dist[1 - side]:
+                        length = depth + dist[1 - side][r]
+                        if meet is None or length < meet[0]:
+                            meet = (length, r)
+            if meet is not None:
+                if max_depth is not None and meet[0] > max_depth:
+                    return None
+                return self._relationship(back, meet[1], calls)
+            frontier[side][:] = nxt
+        return None
+
+    def _need(self, level):
+        """_need() returns the number of calls to expand a level.
+        """
+
+        missing = sum(1 for pid in level if not self.graph.known(pid, self._what))
+        return (missing + self.batch_size - 1) // self.batch_size
+
+    @staticmethod
+    def _relationship(back, meet, calls):
+        """_relationship() builds the Relationship through meet.
+        """
+
+        inverse = {"parent": "child", "child": "parent", "spouse": "spouse"}
+        path, steps = [meet], []
+        pid = meet
+        while back[0][pid] is not None:
+            pid, step = back[0][pid]
+            path.insert(0, pid)
+            steps.insert(0, step)
+        pid = meet
+        while back[1][pid] is not None:
+            prev, step = back[1][pid]
+            path.append(prev)
+            steps.append(inverse[step])
+            pid = prev
+        return Relationship(path, steps, calls)
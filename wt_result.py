@@ -0,0 +1,213 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_result.py provides parse-once result objects for the WikiTree
+APPS API interface, decoded by a pluggable JSON decoder.
+
+By default, the API methods return the requests.Response, and each
+call of its json() method decodes the body again. With a
+ResultDecoder, the body is decoded once, by the fastest JSON library
+installed, or the one chosen, and the methods return a Result:
+
+    apps = WT_Apps(decoder=ResultDecoder())  # or ResultDecoder("json")
+    r = apps.getAncestors("Churchill-4", 10)
+    r.status, r.elapsed, r.decode_time
+    r.payload is r.json()
+
+See benchmarks/bench_decode.py for the decoding throughput.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import datetime
+import json
+import threading
+import time
+
+from wt_stream import xml_loads
+
+
+def _orjson_loads():
+    import orjson
+    return orjson.loads
+
+
+def _ujson_loads():
+    import ujson
+    return ujson.loads
+
+
+def _simplejson_loads():
+    import simplejson
+    return simplejson.loads
+
+
+def _json_loads():
+    return json.loads
+
+
+# decoders, fastest first
+_decoders = (
+    ("orjson", _orjson_loads),
+    ("ujson", _ujson_loads),
+    ("json", _json_loads),
+    ("simplejson", _simplejson_loads),
+)
+
+
+def available_decoders():
+    """available_decoders() returns the names of the JSON decoders
+    which are installed, fastest first.
+    """
+
+    names = []
+    for name, loader in _decoders:
+        try:
+            loader()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+class Result(object):
+    """Result is a decoded API response.
+    payload is the decoded JSON, which json() returns as well,
+    status_code the HTTP status, status the API status, if any,
+    elapsed the datetime.timedelta from sending the request to
+    receiving the response headers, as for a requests.Response,
+    decode_time the seconds spent decoding, and size the length of
+    the body in bytes.
+    """
+
+    __slots__ = ("action", "status_code", "url", "headers", "payload", "elapsed", "decode_time", "size")
+
+    def __init__(self, payload, action=None, status_code=200, url=None, headers=None,
+                 elapsed=None, decode_time=0.0, size=0):
+        self.payload = payload
+        self.action = action
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers or {}
+        self.elapsed = datetime.timedelta(0) if elapsed is None else elapsed
+        self.decode_time = decode_time
+        self.size = size
+
+    def json(self):
+        """json() returns the payload. It is not decoded again, nor
+        copied, so changes to it are seen by every caller.
+        """
+
+        return self.payload
+
+    @property
+    def ok(self):
+        """ok tells whether the HTTP status is not an error.
+        """
+
+        return self.status_code < 400
+
+    @property
+    def status(self):
+        """status is the API status of the first result, 0 when it
+        succeeded, or an error message, or None if there is none.
+        """
+
+        j = self.payload
+        if isinstance(j, list) and j and isinstance(j[0], dict):
+            return j[0].get("status")
+        if isinstance(j, dict):
+            return j.get("status")
+        return None
+
+    def __repr__(self):
+        return "<Result %s [%d] %d bytes>" % (self.action, self.status_code, self.size,)
+
+
+class ResultDecoder(object):
+    """ResultDecoder turns responses into Result objects.
+    It is thread safe.
+    """
+
+    def __init__(self, decoder="auto"):
+        """__init__() initializes a result decoder.
+        decoder is "auto", for the fastest JSON library installed,
+        or the name of one of them, "orjson", "ujson", "json" or
+        "simplejson", or a function decoding a bytes string.
+        "xml" decodes the xmlfm format, into the same structure.
+        """
+
+        self.formats = ("json",)
+        if decoder == "xml":
+            self.name = decoder
+            self.loads = xml_loads
+            self.formats = ("xmlfm",)
+        elif callable(decoder):
+            self.name = getattr(decoder, "__module__", None) or "custom"
+            self.loads = decoder
+        else:
+            loaders = dict(_decoders)
+            if decoder != "auto" and decoder not in loaders:
+                raise ValueError("Invalid decoder: " + repr(decoder))
+            self.name = self.loads = None
+            for name, loader in _decoders:
+                if decoder not in ("auto", name):
+                    continue
+                try:
+                    self.loads = loader()
+                except ImportError:
+                    continue
+                self.name = name
+                break
+            if self.loads is None:
+                raise ValueError("JSON decoder is not installed: " + repr(decoder))
+        self._lock = threading.Lock()
+        self.decoded = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def decode(self, content):
+        """decode() returns the decoded JSON body content.
+        """
+
+        t0 = time.time()
+        payload = self.loads(content)
+        elapsed = time.time() - t0
+        with self._lock:
+            self.decoded += 1
+            self.bytes += len(content)
+            self.seconds += elapsed
+        return payload, elapsed
+
+    def result(self, r, action=None):
+        """result() returns the Result of the requests.Response r.
+        """
+
+        content = r.content
+        payload, elapsed = self.decode(content)
+        return Result(payload, action=action, status_code=r.status_code, url=r.url, headers=r.headers,
+                      elapsed=r.elapsed, decode_time=elapsed, size=len(content))
+
+    def combine(self, rs, payload):
+        """combine() returns the Result of several requests, such as
+        the chunks of a getRelatives request, whose merged payload
+        is given.
+        """
+
+        return Result(payload, action=rs[0].action, status_code=rs[0].status_code, url=rs[0].url,
+                      headers=rs[0].headers, elapsed=max(r.elapsed for r in rs),
+                      decode_time=sum(r.decode_time for r in rs), size=sum(r.size for r in rs))
+
+    def stats(self):
+        """stats() returns a dict of the decoding counters.
+        """
+
+        with self._lock:
+            return {
+                "decoder": self.name,
+                "decoded": self.decoded,
+                "bytes": self.bytes,
+                "seconds": self.seconds,
+                "mb_per_second": self.bytes / self.seconds / 1e6 if self.seconds else 0.0,
+            }
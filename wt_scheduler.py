@@ -0,0 +1,254 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_scheduler.py provides a request scheduler for the WikiTree APPS API
+interface, which keeps throughput within the limits of the server.
+
+    scheduler = RequestScheduler(max_concurrency=16)
+    apps = WT_Apps(scheduler=scheduler, pool_size=16)
+    ...
+    print(scheduler.stats())
+
+The scheduler
+    retries idempotent requests which failed with a transient error,
+    after a jittered exponential backoff, or the Retry-After delay;
+    adapts the number of concurrent requests, adding one slot per
+    window of successful requests, and halving the slots on errors
+    or when latency grows well beyond the best latency observed;
+    opens a circuit breaker after consecutive failures, failing
+    requests fast until a probe request succeeds.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import random
+import threading
+import time
+
+import requests
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """CircuitOpenError is raised, without making a request,
+    while the circuit breaker is open.
+    """
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class RequestScheduler(object):
+    """RequestScheduler runs requests with retries, adaptive
+    concurrency and a circuit breaker. It is thread safe.
+    """
+
+    # HTTP status codes which are worth retrying
+    retry_statuses = frozenset((429, 500, 502, 503, 504))
+
+    # actions which must not be repeated
+    unretried_actions = frozenset(("login",))
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0,
+                 min_concurrency=1, max_concurrency=16, concurrency=None,
+                 latency_tolerance=3.0, failure_threshold=5, reset_timeout=30.0,
+                 clock=None, sleep=None):
+        """__init__() initializes a request scheduler.
+        max_retries is the number of retries of a failed request.
+        backoff is the base of the exponential backoff in seconds,
+        and max_backoff its maximum.
+        The concurrency limit starts at concurrency, default is
+        max_concurrency, and stays between min_concurrency and
+        max_concurrency. It is halved when a request fails, or takes
+        more than latency_tolerance times the best latency seen.
+        The circuit opens after failure_threshold consecutive
+        failures, and allows a probe request after reset_timeout
+        seconds.
+        """
+
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError("Invalid concurrency bounds: %r, %r" % (min_concurrency, max_concurrency,))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock or time.time
+        self._sleep = sleep or time.sleep
+        self._cond = threading.Condition()
+        self._limit = float(concurrency or max_concurrency)
+        self._limit = min(max(self._limit, min_concurrency), max_concurrency)
+        self._in_flight = 0
+        self._last_decrease = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._consecutive_failures = 0
+        self.min_latency = None
+        self.latency = None  # moving average
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        """state is the circuit breaker state,
+        "closed", "open" or "half-open".
+        """
+
+        with self._cond:
+            return self._circuit()
+
+    @property
+    def limit(self):
+        """limit is the current number of concurrent requests allowed.
+        """
+
+        return int(self._limit)
+
+    def _circuit(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def _acquire(self):
+        """_acquire() waits for a concurrency slot, and checks the
+        circuit breaker. Returns True when the request is a probe.
+        """
+
+        with self._cond:
+            while True:
+                state = self._circuit()
+                if state == OPEN or (state == HALF_OPEN and self._probing):
+                    self.rejected += 1
+                    raise CircuitOpenError("WikiTree API circuit breaker is open")
+                if self._in_flight < int(self._limit):
+                    break
+                self._cond.wait()
+            self._in_flight += 1
+            self.requests += 1
+            if state == HALF_OPEN:
+                self._probing = True
+                return True
+            return False
+
+    def _release(self, probe, latency, ok):
+        with self._cond:
+            self._in_flight -= 1
+            if probe:
+                self._probing = False
+            if ok:
+                self.successes += 1
+                self._consecutive_failures = 0
+                if self._state == HALF_OPEN:
+                    self._state = CLOSED
+                self._observe(latency)
+            else:
+                self.failures += 1
+                self._consecutive_failures += 1
+                self._decrease()
+                if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                    self._state = OPEN
+                    self._opened_at = self._clock()
+            self._cond.notify_all()
+
+    def _observe(self, latency):
+        """_observe() adapts the concurrency limit to a successful
+        request which took latency seconds.
+        """
+
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+        if latency > self.latency_tolerance * max(self.min_latency, 0.001):
+            self._decrease()
+        else:
+            # additive increase: one slot per window of successes
+            self._limit = min(self._limit + 1.0 / self._limit, self.max_concurrency)
+
+    def _decrease(self):
+        # multiplicative decrease, at most once per window of requests
+        if self._last_decrease == 0 or self.requests - self._last_decrease >= int(self._limit):
+            self._limit = max(self._limit / 2.0, self.min_concurrency)
+            self._last_decrease = self.requests
+
+    def _retryable(self, e):
+        if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(e, requests.HTTPError) and e.response is not None:
+            return e.response.status_code in self.retry_statuses
+        return False
+
+    def _delay(self, attempt, e):
+        """_delay() returns the seconds to wait before retry attempt,
+        honouring a Retry-After header.
+        """
+
+        response = getattr(e, "response", None)
+        if response is not None:
+            try:
+                return min(float(response.headers.get("Retry-After")), self.max_backoff)
+            except (TypeError, ValueError):
+                pass
+        # full jitter
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def call(self, action, func, *args, **kwargs):
+        """call() returns func(*args), which performs a request for
+        action, retrying transient failures of idempotent actions.
+        wait, if given, is called before each attempt, before it
+        takes a concurrency slot, and outside of its latency, such as
+        to wait for a rate limiter token.
+        """
+
+        wait = kwargs.pop("wait", None)
+        if kwargs:
+            raise TypeError("Invalid arguments: " + repr(sorted(kwargs)))
+        retries = 0 if action in self.unretried_actions else self.max_retries
+        attempt = 0
+        while True:
+            if wait is not None:
+                wait()
+            probe = self._acquire()
+            t0 = self._clock()
+            try:
+                r = func(*args)
+            except Exception as e:
+                transient = self._retryable(e)
+                self._release(probe, self._clock() - t0, not transient)
+                if not transient or attempt >= retries:
+                    raise
+                delay = self._delay(attempt, e)
+                with self._cond:
+                    self.retries += 1
+                attempt += 1
+                self._sleep(delay)
+                continue
+            self._release(probe, self._clock() - t0, True)
+            return r
+
+    def stats(self):
+        """stats() returns a dict of the scheduler state and counters.
+        """
+
+        with self._cond:
+            return {
+                "state": self._circuit(),
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "requests": self.requests,
+                "successes": self.successes,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "latency": self.latency,
+                "min_latency": self.min_latency,
+            }
@@ -0,0 +1,497 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_search.py provides a local full-text index of the biographies of
+WikiTree profiles, so that those downloaded can be searched by
+names, places and phrases:
+
+    index = TextIndex("search.sqlite")
+    index.add_response(apps.getBio("Churchill-4"))
+    for hit in index.search('Blenheim "prime minister"', limit=10):
+        print(hit.name, hit.score)
+    index.close()
+
+Words are matched ignoring case, and a phrase in double quotes
+matches its words in sequence. Every word and phrase of a query must
+match, and hits are ranked by BM25.
+
+The index is stored in a sqlite database, or in memory when it has
+no path. The biographies added are written in blocks, with one row
+of postings per word per block: the Ids of the profiles with the
+word, deflated, and the positions of the word in each of them, delta
+encoded as variable length integers, mostly one byte each. Adding a profile
+again writes it to a new block, unless its biography is unchanged,
+so the index follows the biographies as they change, and the
+postings of the old block are skipped. compact() merges the blocks,
+and drops the postings skipped. See benchmarks/bench_search.py for
+the indexing throughput, the size, and the query latency.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import math
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+from collections import defaultdict, namedtuple
+from operator import sub
+
+try:
+    from itertools import accumulate
+except ImportError:  # Python 2
+    def accumulate(numbers):
+        total = 0
+        for n in numbers:
+            total += n
+            yield total
+
+from wt_bio import bios
+
+# id is the numeric Id of the profile, name its LNAB-#, if known
+Hit = namedtuple("Hit", ("id", "name", "score"))
+
+_words = re.compile(r"\w+", re.UNICODE)
+_query = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    """tokenize() returns the words of text, in lower case.
+    """
+
+    return _words.findall((text or "").lower())
+
+
+# the encodings of the numbers below 128, the most common case
+_small = [bytes(bytearray([n])) for n in range(0x80)]
+
+
+def _encode(numbers):
+    """_encode() returns the increasing numbers, delta encoded, as
+    variable length integers, 7 bits per byte.
+    """
+
+    if len(numbers) == 1 and numbers[0] < 0x80:
+        return _small[numbers[0]]
+    numbers = list(numbers)
+    deltas = list(map(sub, numbers, [0] + numbers[:-1]))
+    if max(deltas) < 0x80:
+        return bytes(bytearray(deltas))
+    out = bytearray()
+    for d in deltas:
+        while d >= 0x80:
+            out.append(d & 0x7f | 0x80)
+            d >>= 7
+        out.append(d)
+    return bytes(out)
+
+
+def _tobytes(a):
+    return a.tobytes() if hasattr(a, "tobytes") else a.tostring()
+
+
+def _pack(postings):
+    """_pack() returns the header and the positions of a row of
+    postings, from a list of (Id, tf, encoded positions), in
+    increasing order of Id. The header is the deltas of the Ids, the
+    tfs, and the lengths of the positions, as arrays, deflated.
+    """
+
+    ids, tfs, positions = zip(*postings)
+    deltas = array("i", map(sub, ids, (0,) + ids[:-1]))
+    tfs = array("H", [min(tf, 0xffff) for tf in tfs])
+    lengths = array("I", [len(p) for p in positions])
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+    header = deflate.compress(_tobytes(deltas) + _tobytes(tfs) + _tobytes(lengths)) + deflate.flush()
+    return sqlite3.Binary(header), sqlite3.Binary(b"".join(positions))
+
+
+# the bytes of an Id delta, a tf, and a positions length in a header
+_id_size, _tf_size, _length_size = array("i").itemsize, array("H").itemsize, array("I").itemsize
+
+
+def _unpack(header):
+    """_unpack() returns the Ids, the tfs, and the ends of the positions
+    of a row of postings, from its header.
+    """
+
+    raw = zlib.decompress(bytes(header), -15)
+    n = len(raw) // (_id_size + _tf_size + _length_size)
+    tfs = n * _id_size
+    lengths = tfs + n * _tf_size
+    return (array("i", accumulate(array("i", raw[:tfs]))), array("H", raw[tfs:lengths]),
+            array("I", accumulate(array("I", raw[lengths:]))))
+
+
+def _decode(blob):
+    """_decode() returns the numbers encoded by _encode().
+    """
+
+    numbers = []
+    n = shift = 0
+    prev = 0
+    for b in bytearray(blob):
+        n |= (b & 0x7f) << shift
+        if b & 0x80:
+            shift += 7
+            continue
+        prev += n
+        numbers.append(prev)
+        n = shift = 0
+    return numbers
+
+
+class TextIndex(object):
+    """TextIndex is a positional full-text index of biographies.
+    It is thread safe.
+    """
+
+    # the BM25 parameters
+    k1 = 1.2
+    b = 0.75
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS text_docs (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            length INTEGER,
+            checksum INTEGER,
+            block INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS text_terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS text_postings (
+            term INTEGER,
+            block INTEGER,
+            header BLOB,
+            positions BLOB,
+            PRIMARY KEY (term, block)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path=None, batch_size=1000):
+        """__init__() opens, or creates, an index stored in a sqlite
+        database at path, or in memory if path is None.
+        The profiles added are written as one block, in one
+        transaction, when batch_size profiles have changed, and by
+        flush(), search() and close().
+        """
+
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.executescript(self._schema)
+        self._load_terms()
+        # the (block, length, checksum) of each profile, by Id
+        self._docs = dict((pid, (block, length, checksum)) for pid, block, length, checksum in self._db.execute(
+            "SELECT id, block, length, checksum FROM text_docs"))
+        self._length = sum(doc[1] for doc in self._docs.values())
+        self._next_block = self._db.execute("SELECT COALESCE(MAX(block), 0) + 1 FROM text_postings").fetchone()[0]
+        self._pending = {}
+        self.added = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.flushes = 0
+
+    def _load_terms(self):
+        self._term_ids = dict((term, tid) for tid, term in self._db.execute("SELECT id, term FROM text_terms"))
+
+    def _checksum(self, pid):
+        """_checksum() returns the checksum of the indexed biography of
+        a profile, or None if it is not indexed.
+        """
+
+        if pid in self._pending:
+            pending = self._pending[pid]
+            return None if pending is None else pending[1]
+        doc = self._docs.get(pid)
+        return None if doc is None else doc[2]
+
+    def add(self, pid, text, name=None):
+        """add() indexes, or indexes again, the biography text of the
+        profile with the numeric Id pid. name is the LNAB-# of the
+        profile, if known. Returns False if the text is unchanged.
+        """
+
+        pid = int(pid)
+        checksum = zlib.crc32(text.encode("utf-8")) & 0xffffffff
+        with self._lock:
+            if self._checksum(pid) == checksum:
+                self.unchanged += 1
+                return False
+            self._pending[pid] = (name, checksum, tokenize(text))
+            self.added += 1
+            self._changed()
+        return True
+
+    def add_response(self, response):
+        """add_response() indexes the biographies of a getBio response,
+        see wt_bio.bios(), and returns the number of profiles indexed
+        which were new or changed.
+        """
+
+        count = 0
+        for pid, name, text in bios(response):
+            count += self.add(pid, text, name=name)
+        return count
+
+    def remove(self, pid):
+        """remove() removes a profile from the index.
+        """
+
+        pid = int(pid)
+        with self._lock:
+            if self._checksum(pid) is not None:
+                self._pending[pid] = None
+                self.removed += 1
+                self._changed()
+
+    def _changed(self):
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _term_id(self, term):
+        tid = self._term_ids.get(term)
+        if tid is None:
+            tid = self._db.execute("INSERT INTO text_terms (term) VALUES (?)", (term,)).lastrowid
+            self._term_ids[term] = tid
+        return tid
+
+    def flush(self):
+        """flush() writes the pending changes as a new block, in one
+        transaction.
+        """
+
+        with self._lock:
+            if not self._pending:
+                return
+            docs = dict((pid, self._docs.get(pid)) for pid in self._pending)
+            length = self._length
+            try:
+                self._write(self._next_block)
+            except BaseException:
+                # the transaction was rolled back, and so are the terms
+                # it added, and the changes of the profiles
+                self._load_terms()
+                for pid, doc in docs.items():
+                    if doc is None:
+                        self._docs.pop(pid, None)
+                    else:
+                        self._docs[pid] = doc
+                self._length = length
+                raise
+            self._next_block += 1
+            self._pending.clear()
+            self.flushes += 1
+
+    def _write(self, block):
+        """_write() writes the pending changes as block, in one
+        transaction.
+        """
+
+        db = self._db
+        with db:
+            postings = {}
+            for pid in sorted(self._pending):
+                pending = self._pending[pid]
+                old = self._docs.pop(pid, None)
+                if old is not None:
+                    self._length -= old[1]
+                if pending is None:
+                    db.execute("DELETE FROM text_docs WHERE id = ?", (pid,))
+                    continue
+
+                name, checksum, words = pending
+                positions = defaultdict(list)
+                for i, word in enumerate(words):
+                    positions[word].append(i)
+                term_ids = self._term_ids
+                for word, ps in positions.items():
+                    posting = (pid, len(ps), _encode(ps))
+                    tid = term_ids.get(word) or self._term_id(word)
+                    if tid in postings:
+                        postings[tid].append(posting)
+                    else:
+                        postings[tid] = [posting]
+                db.execute("INSERT OR REPLACE INTO text_docs (id, name, length, checksum, block) VALUES (?, ?, ?, ?, ?)",
+                           (pid, name, len(words), checksum, block))
+                self._docs[pid] = (block, len(words), checksum)
+                self._length += len(words)
+            db.executemany(
+                "INSERT INTO text_postings (term, block, header, positions) VALUES (?, ?, ?, ?)",
+                ((tid, block) + _pack(ps) for tid, ps in sorted(postings.items())))
+
+    def compact(self):
+        """compact() merges the postings of each word into one row, and
+        drops those of the profiles changed or removed since they
+        were written, and the words no longer used.
+        """
+
+        with self._lock:
+            self.flush()
+            db = self._db
+            block = self._next_block
+            unused = []
+            with db:
+                for term, tid in list(self._term_ids.items()):
+                    live = self._live(tid)
+                    db.execute("DELETE FROM text_postings WHERE term = ?", (tid,))
+                    if not live:
+                        db.execute("DELETE FROM text_terms WHERE id = ?", (tid,))
+                        unused.append(term)
+                        continue
+                    postings = [(pid,) + live[pid][:1] + (live[pid][1][live[pid][2]:live[pid][3]],) for pid in sorted(live)]
+                    db.execute("INSERT INTO text_postings (term, block, header, positions) VALUES (?, ?, ?, ?)",
+                               (tid, block) + _pack(postings))
+                db.execute("UPDATE text_docs SET block = ?", (block,))
+            # only once the transaction is committed
+            for term in unused:
+                del self._term_ids[term]
+            for pid, doc in self._docs.items():
+                self._docs[pid] = (block,) + doc[1:]
+            self._next_block += 1
+            db.execute("VACUUM")
+
+    def close(self):
+        """close() writes the pending changes, and closes the database.
+        """
+
+        with self._lock:
+            if self._db is not None:
+                self.flush()
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _live(self, tid):
+        """_live() returns a dict of the (tf, positions blob, start,
+        end) of the current postings of a word, by the Ids of the
+        profiles.
+        """
+
+        docs = self._docs
+        live = {}
+        for block, header, positions in self._db.execute(
+                "SELECT block, header, positions FROM text_postings WHERE term = ?", (tid,)):
+            ids, tfs, ends = _unpack(header)
+            positions = bytes(positions)
+            start = 0
+            for i, pid in enumerate(ids):
+                doc = docs.get(pid)
+                if doc is not None and doc[0] == block:
+                    live[pid] = (tfs[i], positions, start, ends[i])
+                start = ends[i]
+        return live
+
+    def search(self, query, limit=None):
+        """search() returns the Hits of the profiles whose biographies
+        match every word and "quoted phrase" of query, best first, at
+        most limit of them.
+        """
+
+        phrases = []
+        for m in _query.finditer(query):
+            words = tokenize(m.group(1) if m.group(1) is not None else m.group(2))
+            if words:
+                phrases.append(words)
+        if not phrases:
+            return []
+
+        with self._lock:
+            self.flush()
+            postings = {}
+            for word in set(w for words in phrases for w in words):
+                tid = self._term_ids.get(word)
+                postings[word] = {} if tid is None else self._live(tid)
+                if not postings[word]:
+                    return []
+
+            # the profiles with every word, from the rarest one
+            rarest = sorted(postings.values(), key=len)
+            docs = set(rarest[0])
+            for p in rarest[1:]:
+                docs.intersection_update(p)
+            for words in phrases:
+                if len(words) > 1:
+                    docs = set(d for d in docs if self._phrase(d, words, postings))
+            if not docs:
+                return []
+
+            scores = sorted(self._scores(docs, postings).items(), key=lambda s: (-s[1], s[0]))
+            if limit is not None:
+                scores = scores[:limit]
+            names = self._names([pid for pid, _ in scores])
+        return [Hit(pid, names.get(pid), score) for pid, score in scores]
+
+    @staticmethod
+    def _phrase(doc, words, postings):
+        """_phrase() tells whether the words are in sequence in doc.
+        """
+
+        def positions(word):
+            _, blob, start, end = postings[word][doc]
+            return _decode(blob[start:end])
+
+        starts = set(positions(words[0]))
+        for offset, word in enumerate(words[1:], 1):
+            starts.intersection_update(p - offset for p in positions(word))
+            if not starts:
+                return False
+        return True
+
+    def _names(self, ids):
+        """_names() returns a dict of the names of the profiles, by Id.
+        """
+
+        names = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            names.update(self._db.execute(
+                "SELECT id, name FROM text_docs WHERE id IN (%s)" % (",".join("?" * len(chunk)),), chunk))
+        return names
+
+    def _scores(self, docs, postings):
+        """_scores() returns the BM25 scores of docs, by Id.
+        """
+
+        count = len(self._docs)
+        average = float(self._length) / count if count else 1.0
+        norms = dict((d, self.k1 * (1.0 - self.b + self.b * self._docs[d][1] / average)) for d in docs)
+        scores = dict.fromkeys(docs, 0.0)
+        for p in postings.values():
+            idf = math.log(1.0 + (count - len(p) + 0.5) / (len(p) + 0.5)) * (self.k1 + 1.0)
+            for d in docs:
+                tf = p[d][0]
+                scores[d] += idf * tf / (tf + norms[d])
+        return scores
+
+    def __len__(self):
+        with self._lock:
+            self.flush()
+            return len(self._docs)
+
+    def stats(self):
+        """stats() returns a dict of the index counters.
+        """
+
+        with self._lock:
+            return {
+                "profiles": len(self._docs),
+                "terms": len(self._term_ids),
+                "words": self._length,
+                "added": self.added,
+                "unchanged": self.unchanged,
+                "removed": self.removed,
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+            }
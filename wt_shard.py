@@ -0,0 +1,366 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_shard.py runs WikiTree APPS API requests in a pool of worker
+processes, so that decoding the responses, and processing their
+records, use more than one core:
+
+    with ShardedCrawler(apps, processes=4, transform=summary) as crawler:
+        for record in crawler.records("getAncestors", keys, depth=10):
+            print(record)
+        for record in crawler.watchlist(getPerson=1):
+            print(record)
+
+The keys are split into one shard per process, by a hash of the key,
+so the same key always goes to the same process. Each process has
+its own WT_Apps session, logged in as apps is, and requests the keys
+of its shard with threads threads, a bounded number of requests at a
+time. The rate limiter and the scheduler of apps are copied into each
+process, with the rate, burst and concurrency split between the
+processes, so together they stay within the budget of apps. A
+wt_cache.ResponseCache is copied empty, other caches are not used by
+the processes. Each process decodes each response, calls
+transform() on each person dict, and sends the records returned to
+the parent in batches. A batch is pickled once, and written as one
+message to a pipe, and the parent merges the batches of every
+process, as they arrive, into one stream.
+
+transform() is called in the worker processes, so it must be defined
+at the top level of a module. Returning only the fields needed, as a
+tuple, costs much less to send than the person dict, and returning
+None drops the record. Records are not deduplicated across keys.
+
+See benchmarks/bench_shard.py for the scaling with the number of
+processes.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import multiprocessing
+import pickle
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from wt_apps import WT_Apps
+from wt_cache import ResponseCache
+from wt_person import person_dicts
+from wt_ratelimit import RateLimiter
+from wt_result import ResultDecoder
+from wt_scheduler import RequestScheduler
+
+try:  # for Python 3.3+
+    from multiprocessing.connection import wait
+except ImportError:  # Python 2
+    import select
+
+    def wait(connections):
+        """wait() returns the connections ready to be read,
+        waiting for one of them.
+        """
+
+        return select.select(connections, [], [])[0]
+
+# the CPU time of the process, time.clock() in Python 2
+_process_time = getattr(time, "process_time", None) or time.clock
+
+
+def shard_of(key, shards):
+    """shard_of() returns the shard of a key, from 0 to shards - 1.
+    """
+
+    return (zlib.crc32(("%s" % (key,)).encode("utf-8")) & 0xffffffff) % shards
+
+
+def _send(conn, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    conn.send_bytes(data)
+    return len(data)
+
+
+def _settings(apps, processes):
+    """_settings() returns the settings of the rate limiter, the
+    scheduler and the cache of apps, for the config of one of
+    processes worker processes, whose share of the rate, burst and
+    concurrency they are.
+    """
+
+    settings = {"chunk_size": apps._chunk_size}
+    limiter = apps._rate_limiter
+    if limiter is not None:
+        settings["rate_limiter"] = {"rate": limiter.rate / processes, "burst": max(limiter.burst / processes, 1.0)}
+        settings["action_priorities"] = dict(limiter.action_priorities)
+    scheduler = apps._scheduler
+    if scheduler is not None:
+        concurrency = max(scheduler.max_concurrency // processes, 1)
+        settings["scheduler"] = {
+            "max_retries": scheduler.max_retries,
+            "backoff": scheduler.backoff,
+            "max_backoff": scheduler.max_backoff,
+            "min_concurrency": min(scheduler.min_concurrency, concurrency),
+            "max_concurrency": concurrency,
+            "latency_tolerance": scheduler.latency_tolerance,
+            "failure_threshold": scheduler.failure_threshold,
+            "reset_timeout": scheduler.reset_timeout,
+        }
+    cache = apps._cache
+    if type(cache) is ResponseCache:
+        settings["cache"] = {"maxsize": cache.maxsize, "ttl": cache.ttl, "ttls": dict(cache.ttls)}
+    return settings
+
+
+def _worker_apps(config, threads):
+    """_worker_apps() returns the WT_Apps instance of a worker process.
+    """
+
+    kwargs = {}
+    if "rate_limiter" in config:
+        limiter = kwargs["rate_limiter"] = RateLimiter(**config["rate_limiter"])
+        limiter.action_priorities = config["action_priorities"]
+    if "scheduler" in config:
+        kwargs["scheduler"] = RequestScheduler(**config["scheduler"])
+    if "cache" in config:
+        kwargs["cache"] = ResponseCache(**config["cache"])
+    apps = WT_Apps(url=config["url"], decoder=ResultDecoder(), pool_size=threads,
+                   chunk_size=config["chunk_size"], **kwargs)
+    apps._get_session().cookies.update(config["cookies"])
+    apps._identity = config["identity"]
+    return apps
+
+
+def _worker(conn, config, transform, threads, batch_size):
+    """_worker() is the main function of a worker process. It runs
+    the tasks received on conn, until it receives None.
+    """
+
+    apps = _worker_apps(config, threads)
+    executor = ThreadPoolExecutor(max_workers=threads)
+
+    def call(action, kwargs):
+        try:
+            return getattr(apps, action)(**kwargs), None
+        except Exception as e:
+            return None, "%s: %s" % (type(e).__name__, e)
+
+    def results(action, calls, params):
+        # submit at most 2 * threads calls ahead of the one received,
+        # so that a large shard does not hold every response at once
+        window = deque()
+        for kwargs in calls:
+            if len(window) >= 2 * threads:
+                submitted, f = window.popleft()
+                yield submitted, f.result()
+            window.append((kwargs, executor.submit(call, action, dict(params, **kwargs))))
+        while window:
+            submitted, f = window.popleft()
+            yield submitted, f.result()
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        action, calls, params = task
+        t0, cpu0, decode0 = time.time(), _process_time(), apps._decoder.stats()["seconds"]
+        stats = {"requests": 0, "records": 0, "batches": 0, "bytes": 0, "errors": 0}
+        batch = []
+        for kwargs, (r, error) in results(action, calls, params):
+            stats["requests"] += 1
+            if error is not None:
+                stats["errors"] += 1
+                stats["bytes"] += _send(conn, ("error", kwargs, error))
+                continue
+            for person in person_dicts(r):
+                record = person if transform is None else transform(person)
+                if record is not None:
+                    batch.append(record)
+            if len(batch) >= batch_size:
+                stats["records"] += len(batch)
+                stats["batches"] += 1
+                stats["bytes"] += _send(conn, ("records", batch))
+                batch = []
+        if batch:
+            stats["records"] += len(batch)
+            stats["batches"] += 1
+            stats["bytes"] += _send(conn, ("records", batch))
+        stats["seconds"] = time.time() - t0
+        stats["cpu_seconds"] = _process_time() - cpu0
+        stats["decode_seconds"] = apps._decoder.stats()["seconds"] - decode0
+        _send(conn, ("done", stats))
+    executor.shutdown()
+    conn.close()
+
+
+class ShardedCrawler(object):
+    """ShardedCrawler requests the records of many keys with a pool
+    of worker processes, and yields them as one stream.
+    It is not thread safe: use one stream at a time.
+    """
+
+    # the actions whose records are streamed, by key
+    actions = frozenset(("getPerson", "getProfile", "getAncestors", "getRelatives"))
+
+    def __init__(self, apps, processes=None, threads=4, transform=None, batch_size=500, urls=None):
+        """__init__() initializes a sharded crawler, copying the URL and
+        the login session of the WT_Apps instance apps, whose format
+        must be json.
+        processes is the number of worker processes, default is the
+        number of CPUs, and threads the number of requests each of
+        them runs at once. transform(person) returns the record
+        streamed for a person dict, default is the dict itself.
+        Records are sent in batches of batch_size records.
+        urls is a list of API URLs, used by the processes in turn,
+        default is the URL of apps.
+        """
+
+        if getattr(apps, "_format", "json") != "json":
+            raise ValueError("ShardedCrawler requires the json format")
+        self.apps = apps
+        self.processes = processes or multiprocessing.cpu_count()
+        if self.processes < 1:
+            raise ValueError("Invalid processes: " + repr(processes))
+        self.threads = threads
+        self.transform = transform
+        self.batch_size = batch_size
+        self.urls = list(urls or [apps._url])
+        self._workers = []
+        self._streaming = False
+        self.errors = []
+        self._stats = []
+
+    def _start(self):
+        if self._workers:
+            return
+        cookies = requests.utils.dict_from_cookiejar(self.apps._get_session().cookies)
+        settings = _settings(self.apps, self.processes)
+        for i in range(self.processes):
+            config = dict(settings, url=self.urls[i % len(self.urls)], cookies=cookies, identity=self.apps.identity)
+            conn, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, name="ShardedCrawler-%d" % (i,),
+                                              args=(child, config, self.transform, self.threads, self.batch_size))
+            process.daemon = True
+            process.start()
+            child.close()
+            self._workers.append((process, conn))
+
+    def _stop(self, terminate=False):
+        for process, conn in self._workers:
+            if terminate:
+                process.terminate()
+            else:
+                try:
+                    conn.send(None)
+                except (IOError, OSError):
+                    pass
+        for process, conn in self._workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._workers = []
+
+    def close(self):
+        """close() stops the worker processes.
+        """
+
+        self._stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _stream(self, action, shards, params):
+        """_stream() is a generator which sends the calls of each shard
+        to its process, and yields the records of every process as
+        they arrive.
+        """
+
+        if self._streaming:
+            raise RuntimeError("ShardedCrawler is already streaming")
+        self._streaming = True
+        self._start()
+        self.errors = []
+        self._stats = []
+        active = {}
+        try:
+            for (process, conn), calls in zip(self._workers, shards):
+                conn.send((action, calls, params))
+                active[conn] = process
+            while active:
+                for conn in wait(list(active)):
+                    try:
+                        message = pickle.loads(conn.recv_bytes())
+                    except EOFError:
+                        raise RuntimeError("ShardedCrawler process died: " + active[conn].name)
+                    kind = message[0]
+                    if kind == "records":
+                        for record in message[1]:
+                            yield record
+                    elif kind == "error":
+                        self.errors.append(message[1:])
+                    else:
+                        self._stats.append(message[1])
+                        del active[conn]
+        finally:
+            self._streaming = False
+            if active:
+                # the stream was abandoned, or failed: stop the
+                # processes still sending, which restart when needed
+                self._stop(terminate=True)
+
+    def records(self, action, keys, **params):
+        """records() is a generator which yields the records of the
+        people of the responses of action, "getPerson", "getProfile",
+        "getAncestors" or "getRelatives", for each of keys, with the
+        other parameters params. getRelatives requests are sent for
+        up to the chunk size of apps keys at a time.
+        The errors of the requests are in the errors attribute,
+        as (kwargs, message), once the stream ends.
+        """
+
+        if action not in self.actions:
+            raise ValueError("Invalid action: " + repr(action))
+        shards = [[] for _ in range(self.processes)]
+        for key in keys:
+            shards[shard_of(key, self.processes)].append(key)
+        if action == "getRelatives":
+            size = self.apps._chunk_size
+            calls = [[{"keys": s[i:i + size]} for i in range(0, len(s), size)] for s in shards]
+        else:
+            calls = [[{"key": key} for key in s] for s in shards]
+        return self._stream(action, calls, params)
+
+    def watchlist(self, limit=None, page_size=1000, **params):
+        """watchlist() is a generator which yields the records of the
+        watchlist of the logged in user, up to limit of them, default
+        is all of them, requested in pages of page_size, shared by
+        the processes. params are the other getWatchlist options.
+        """
+
+        if limit is None:
+            r = self.apps.getWatchlist(limit=1, **params)
+            limit = r.json()[0]["watchlistCount"]
+        calls = [[] for _ in range(self.processes)]
+        for n, offset in enumerate(range(0, limit, page_size)):
+            calls[n % self.processes].append({"offset": offset, "limit": min(page_size, limit - offset)})
+        return self._stream("getWatchlist", calls, params)
+
+    def stats(self):
+        """stats() returns a dict of the counters of the last stream,
+        summed over the processes, with the slowest process seconds.
+        """
+
+        totals = {"processes": len(self._stats), "requests": 0, "records": 0, "batches": 0, "bytes": 0,
+                  "errors": 0, "cpu_seconds": 0.0, "decode_seconds": 0.0, "seconds": 0.0}
+        for stats in self._stats:
+            for name, value in stats.items():
+                if name == "seconds":
+                    totals[name] = max(totals[name], value)
+                else:
+                    totals[name] += value
+        return totals
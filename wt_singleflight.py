@@ -0,0 +1,113 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_singleflight.py provides single flight deduplication of identical
+requests to the WikiTree APPS API.
+
+When several threads make the same request at the same time, only
+the first one is sent; the others wait for it and share its result:
+
+    flight = SingleFlight()
+    apps = WT_Apps(singleflight=flight)
+    ...
+    print(flight.stats())
+"""
+
+from __future__ import print_function, unicode_literals
+
+import threading
+
+from wt_cache import request_key
+
+
+class _Call(object):
+    """_Call is a request in flight, and its outcome.
+    """
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """SingleFlight coalesces concurrent calls which have the same key
+    into one call, whose result, or exception, is shared by all callers.
+    """
+
+    # actions which are never coalesced
+    uncoalesced_actions = frozenset(("login",))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def key(self, data, identity=None):
+        """key() returns the coalescing key of the request data
+        for the given session identity, or None if the request
+        must not be coalesced.
+        """
+
+        if data.get("action") in self.uncoalesced_actions:
+            return None
+        return request_key(data, identity)
+
+    def do(self, key, func, *args):
+        """do() returns func(*args), unless a call with the same key
+        is already in flight, in which case it waits for that call,
+        and returns its result.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.calls += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+        except BaseException as e:
+            # such as KeyboardInterrupt, which the waiters raise as well
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    @property
+    def in_flight(self):
+        """in_flight is the number of distinct calls in flight.
+        """
+
+        return len(self._calls)
+
+    def stats(self):
+        """stats() returns a dict of the single flight counters.
+        """
+
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
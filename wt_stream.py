@@ -0,0 +1,332 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_stream.py provides incremental parsing of large WikiTree APPS API
+responses, so that the records of a response are used as they
+arrive, instead of once the whole body has been buffered and decoded:
+
+    for person in apps.streamWatchlist(getPerson=1, limit=50000):
+        print(person["Name"])
+
+A RecordStream reads the body in chunks, and decodes one record of
+the "ancestors", "watchlist" or "items" list at a time, so peak
+memory is proportional to one record and one chunk, rather than to
+the whole response. The other fields of each result, such as status
+and watchlistCount, are collected in its meta attribute, with the
+number of records of each list.
+
+XMLRecordStream does the same for responses in the xmlfm format,
+and xml_loads() decodes a whole one. The xmlfm format is not
+documented, so the parser assumes the layout below, where each value
+is an element, the entries of a list are <item> elements, and those
+of a dict are named by their key, or are <item key="..."> elements
+when the key is not an XML name. The document element is <api>:
+
+    <api type="list"><item type="dict">
+      <ancestors type="list"><item type="dict"><Id type="int">1</Id>...
+      <status type="int">0</status>
+    </item></api>
+
+When each element has a type attribute, "list", "dict", "int",
+"float", "bool" or "null", or none for a string, the result is the
+same structure as the JSON response. Without type attributes, an
+element whose children are all <item> elements without a key is a
+list, any other element with children is a dict, and the other
+values are strings, so numbers, booleans and null are not restored,
+and an empty list or dict is an empty string.
+
+See benchmarks/bench_stream.py and benchmarks/bench_xml.py for the
+memory saved, and the speed of each format.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import codecs
+import json
+import re
+from xml.etree import ElementTree
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+class RecordStream(object):
+    """RecordStream is an iterator over the records of a JSON
+    response body, given as an iterable of byte chunks.
+    """
+
+    # the fields of a result which hold lists of records
+    record_fields = ("ancestors", "watchlist", "items")
+
+    def __init__(self, chunks, response=None):
+        """__init__() initializes a record stream over chunks.
+        response is the streamed requests.Response the chunks come
+        from, which is closed when the stream ends, or is closed.
+        """
+
+        self._chunks = iter(chunks)
+        self._response = response
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._iter = None
+        self.meta = []
+        self.records = 0
+        self.bytes = 0
+
+    def _more(self):
+        """_more() appends the next chunk to the buffer, dropping the
+        text already parsed. Returns False at the end of the body.
+        """
+
+        if self._eof:
+            return False
+        text = ""
+        while not text:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                text = self._text.decode(b"", final=True)
+                break
+            self.bytes += len(chunk)
+            text = self._text.decode(chunk)
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return bool(text) or not self._eof
+
+    def _peek(self):
+        """_peek() skips white space, and returns the next character,
+        or None at the end of the body.
+        """
+
+        while True:
+            self._pos = _whitespace.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                return None
+
+    def _expect(self, chars):
+        c = self._peek()
+        if c is None or c not in chars:
+            raise ValueError("Expected one of %r at offset %d, found %r" % (chars, self.bytes, c,))
+        self._pos += 1
+        return c
+
+    def _value(self):
+        """_value() decodes the next JSON value, reading more chunks
+        until it is complete.
+        """
+
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if not self._more():
+                    raise
+                continue
+            # a number at the end of the buffer may be incomplete
+            if end < len(self._buf) or self._eof:
+                self._pos = end
+                return value
+            self._more()
+
+    def _records(self):
+        c = self._expect("[{")
+        if c == "{":
+            # a single result, as from login
+            for record in self._result():
+                yield record
+            return
+        if self._peek() == "]":
+            return
+        while True:
+            self._expect("{")
+            for record in self._result():
+                yield record
+            if self._expect(",]") == "]":
+                return
+
+    def _result(self):
+        """_result() yields the records of one result object, whose
+        opening brace has been read, and collects its other fields.
+        """
+
+        meta = {}
+        self.meta.append(meta)
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key in self.record_fields and self._peek() == "[":
+                self._pos += 1
+                meta[key] = 0
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        record = self._value()
+                        meta[key] += 1
+                        self.records += 1
+                        yield record
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                meta[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iter is None:
+            self._iter = self._records()
+        try:
+            return next(self._iter)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception:
+            self.close()
+            raise
+
+    next = __next__  # for Python 2
+
+    def close(self):
+        """close() stops reading, and releases the connection.
+        """
+
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        self._chunks = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _xml_container(elem):
+    """_xml_container() returns the type of an untyped element
+    with children, "list" or "dict".
+    """
+
+    if all(child.tag == "item" and child.get("key") is None for child in elem):
+        return "list"
+    return "dict"
+
+
+def _xml_value(elem):
+    """_xml_value() returns the value of an element.
+    """
+
+    t = elem.get("type")
+    if t is None and len(elem):
+        t = _xml_container(elem)
+    if t == "list":
+        return [_xml_value(child) for child in elem]
+    if t == "dict":
+        return dict((child.get("key", child.tag), _xml_value(child)) for child in elem)
+    text = elem.text or ""
+    if t is None:
+        return text
+    if t == "int":
+        return int(text)
+    if t == "float":
+        return float(text)
+    if t == "bool":
+        return text.strip() in ("true", "1")
+    if t == "null":
+        return None
+    raise ValueError("Invalid type of XML element %r: %r" % (elem.tag, t,))
+
+
+def xml_loads(content):
+    """xml_loads() decodes a whole response in the xmlfm format,
+    into the same structure as the JSON response.
+    """
+
+    return _xml_value(ElementTree.fromstring(content))
+
+
+class _ChunkReader(object):
+    """_ChunkReader is a file-like object reading byte chunks.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buf = b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            try:
+                chunk = next(self._stream._chunks)
+            except StopIteration:
+                break
+            self._stream.bytes += len(chunk)
+            self._buf += chunk
+        if size < 0:
+            data, self._buf = self._buf, b""
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+class XMLRecordStream(RecordStream):
+    """XMLRecordStream is an iterator over the records of an xmlfm
+    response body, given as an iterable of byte chunks. Elements are
+    dropped once decoded, so memory use stays flat.
+    """
+
+    def _records(self):
+        stack = []
+        result_depth = None
+        meta = None
+        for event, elem in ElementTree.iterparse(_ChunkReader(self), events=("start", "end")):
+            if event == "start":
+                if result_depth is None and stack:
+                    # an untyped document element is a list of results
+                    # when its first child is an <item> without a key
+                    result_depth = 1 if elem.tag == "item" and elem.get("key") is None else 0
+                    if result_depth == 0:
+                        meta = {}
+                        self.meta.append(meta)
+                elif result_depth is None and elem.get("type") is not None:
+                    result_depth = 1 if elem.get("type") == "list" else 0
+                if len(stack) == result_depth:
+                    meta = {}
+                    self.meta.append(meta)
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if result_depth is None:
+                # an untyped document element without children
+                continue
+            depth = len(stack)
+            parent = stack[-1] if stack else None
+            key = None if parent is None else parent.get("key", parent.tag)
+            if depth == result_depth + 2 and parent.get("type") in ("list", None) and key in self.record_fields:
+                value = _xml_value(elem)
+                stack[-1].remove(elem)
+                meta[key] = meta.get(key, 0) + 1
+                self.records += 1
+                yield value
+            elif depth == result_depth + 1:
+                key = elem.get("key", elem.tag)
+                if key in self.record_fields and elem.get("type") in ("list", None) and not (elem.text or "").strip():
+                    meta.setdefault(key, 0)
+                else:
+                    meta[key] = _xml_value(elem)
+                stack[-1].remove(elem)
+            elif depth == result_depth and depth > 0:
+                stack[-1].remove(elem)
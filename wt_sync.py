@@ -0,0 +1,135 @@
+#! python3
+# -*- coding:utf-8 -*-
+
+"""
+wt_sync.py provides incremental synchronization of a WikiTree watchlist.
+
+Instead of downloading the whole watchlist every night, WatchlistSync
+walks it in page_touched order, most recently touched first, and stops
+at the first profile which has not been touched since the last sync:
+
+    sync = WatchlistSync(apps, "watchlist_sync.json")
+    for entry in sync.changes():
+        update(entry)
+
+The high-water mark of each user is saved in a JSON state file when
+changes() is exhausted, so an interrupted sync is simply repeated.
+Watchlist pages must not come from a response cache: use a cache
+whose getWatchlist ttl is 0, such as wt_cache.SQLiteCache, or none.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import os
+
+
+class WatchlistSync(object):
+    """WatchlistSync yields the watchlist entries which changed since
+    the previous sync of the logged in user.
+    """
+
+    def __init__(self, apps, path, page_size=100, prefetch=1, descending=True, **kwargs):
+        """__init__() initializes a watchlist sync for a WT_Apps
+        instance, keeping its state in the JSON file at path.
+        page_size and prefetch are as for WT_Apps.iterWatchlist().
+        descending tells whether the API returns page_touched order
+        most recently touched first; when it is False, the whole
+        watchlist is walked, and only changed entries are yielded.
+        Other keyword parameters are getWatchlist() options,
+        default is getPerson=True.
+        """
+
+        self.apps = apps
+        self.path = path
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.descending = descending
+        kwargs.setdefault("getPerson", True)
+        kwargs.pop("order", None)
+        self.options = kwargs
+        self.scanned = 0
+        self.changed = 0
+
+    @property
+    def user(self):
+        """user is the key of the state of the current user.
+        """
+
+        return self.apps.identity or "anonymous"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _save(self, state):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)  # for Python 2 on Windows
+        os.rename(tmp, self.path)
+
+    def mark(self):
+        """mark() returns the high-water mark of the current user,
+        the latest Touched timestamp synced, or None.
+        """
+
+        return self._load().get(self.user, {}).get("touched")
+
+    def reset(self):
+        """reset() forgets the high-water mark of the current user,
+        so the next sync yields the whole watchlist.
+        """
+
+        state = self._load()
+        if state.pop(self.user, None) is not None:
+            self._save(state)
+
+    def changes(self):
+        """changes() is a generator which yields the watchlist entries
+        touched since the previous sync, and records the new
+        high-water mark once every change has been yielded.
+        """
+
+        state = self._load()
+        user = self.user
+        previous = state.get(user, {})
+        mark = previous.get("touched")
+        # profiles touched in the same second as the mark were synced
+        at_mark = set(previous.get("ids") or [])
+
+        self.scanned = self.changed = 0
+        new_mark = mark
+        new_ids = set(at_mark)
+
+        entries = self.apps.iterWatchlist(page_size=self.page_size, prefetch=self.prefetch,
+                                          order="page_touched", **self.options)
+        try:
+            for entry in entries:
+                self.scanned += 1
+                touched = entry.get("Touched")
+                if touched is None:
+                    continue
+                touched = "%s" % (touched,)
+                if mark is not None:
+                    if touched < mark and self.descending:
+                        break
+                    if touched < mark or (touched == mark and entry.get("Id") in at_mark):
+                        continue
+                if new_mark is None or touched > new_mark:
+                    new_mark = touched
+                    new_ids = set()
+                if touched == new_mark:
+                    new_ids.add(entry.get("Id"))
+                self.changed += 1
+                yield entry
+        finally:
+            entries.close()
+
+        if new_mark is not None:
+            state = self._load()
+            state[user] = {"touched": new_mark, "ids": sorted(new_ids)}
+            self._save(state)